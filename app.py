@@ -1,16 +1,27 @@
 import streamlit as st
 from auth.auth import login_user
-from database.db import create_tables, seed_main_admin
+from database.db import bootstrap
+from database.archive import ensure_archive_schedule
+from database.backup import ensure_backup_schedule
+from database.retention import ensure_retention_schedule
+from database.tracing import trace_page_view
+from mailer.worker import ensure_worker_started
 
 # Configuração da página deve ser o primeiro comando
 st.set_page_config(
     page_title="Sistema de Compras - Login",
     layout="centered"
 )
+trace_page_view("Login")
 
-# Garante que o banco de dados e o admin existam
-create_tables()
-seed_main_admin()
+# Garante que o banco de dados e o admin existam (uma vez por processo)
+bootstrap()
+
+# Inicia (uma vez por processo) o envio em segundo plano dos e-mails da fila
+ensure_worker_started()
+ensure_backup_schedule()
+ensure_retention_schedule()
+ensure_archive_schedule()
 
 # --- Lógica de Login ---
 
@@ -1,6 +1,9 @@
 import sqlite3
 import hashlib
 import streamlit as st
+from database.connection import fetch_one, write_transaction
+from database import queries
+from database.cache import invalidate_users
 
 def hash_password(password):
     """Gera o hash de uma senha usando SHA256."""
@@ -14,23 +17,20 @@ def create_user(username, password, role, email):
     """Cria um novo usuário no banco de dados."""
     hashed_pass = hash_password(password)
     try:
-        with sqlite3.connect('database/compras.db') as conn:
+        with write_transaction() as conn:
             cursor = conn.cursor()
             # Garante que novos usuários sejam criados como ativos (is_active = 1)
             cursor.execute(
                 "INSERT INTO users (username, password, role, email, is_active) VALUES (?, ?, ?, ?, 1)",
                 (username, hashed_pass, role, email)
             )
-            conn.commit()
+        invalidate_users()
     except sqlite3.IntegrityError:
         st.error("Erro: Nome de usuário já existe.")
 
 def login_user(username, password):
     """Autentica um usuário e retorna o status e uma mensagem."""
-    with sqlite3.connect('database/compras.db') as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, password, role, is_active FROM users WHERE username = ?", (username,))
-        user_data = cursor.fetchone()
+    user_data = fetch_one(queries.USER_FOR_LOGIN, (username,))
 
     if user_data:
         user_id, hashed_password, role, is_active = user_data
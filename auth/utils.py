@@ -1,6 +1,9 @@
 import streamlit as st
 import sqlite3
 import hashlib
+from database.cache import invalidate_users
+from database.connection import fetch_one, write_transaction
+from database.notifications import fetch_unread, mark_read, unread_count
 
 def hash_password(password):
     """Cria um hash SHA256 para a senha fornecida."""
@@ -12,21 +15,14 @@ def check_password(hashed_password, user_password):
 
 def create_user(username, password, role):
     """Cria um novo usuário no banco de dados."""
-    conn = sqlite3.connect('database/compras.db')
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', (username, hash_password(password), role))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        conn.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', (username, hash_password(password), role))
+    invalidate_users()
 
 def login_user(username, password):
     """Autentica um usuário e armazena seus dados na sessão."""
-    conn = sqlite3.connect('database/compras.db')
-    cursor = conn.cursor()
-    
     # CORREÇÃO: Busca o id, password e role do usuário
-    cursor.execute('SELECT id, password, role FROM users WHERE username = ?', (username,))
-    data = cursor.fetchone()
-    conn.close()
+    data = fetch_one('SELECT id, password, role FROM users WHERE username = ?', (username,))
     
     if data:
         # CORREÇÃO: Desempacota os três valores (id, hash, role)
@@ -56,13 +52,13 @@ def handle_notifications():
     if not user_id:
         return
 
+    role = st.session_state.get('role')
     try:
-        conn = sqlite3.connect('database/compras.db')
-        cursor = conn.cursor()
+        # Verificação barata (contagem em cache); só busca a lista se houver algo novo
+        if not unread_count(user_id, role):
+            return
 
-        # Busca todas as notificações não lidas
-        cursor.execute("SELECT id, message FROM notifications WHERE user_id = ? AND is_read = ?", (user_id, False))
-        unread_notifications = cursor.fetchall()
+        unread_notifications = fetch_unread(user_id, role)
 
         if unread_notifications:
             # Define o conteúdo do pop-up
@@ -73,11 +69,7 @@ def handle_notifications():
                 
                 if st.button("Fechar", use_container_width=True):
                     # Marca todas as notificações exibidas como lidas
-                    with sqlite3.connect('database/compras.db') as conn_inner:
-                        cursor_inner = conn_inner.cursor()
-                        for notif_id, _ in unread_notifications:
-                            cursor_inner.execute("UPDATE notifications SET is_read = ? WHERE id = ?", (True, notif_id))
-                        conn_inner.commit()
+                    mark_read(user_id, max(notif_id for notif_id, _ in unread_notifications))
                     st.rerun()
 
             # Chama o pop-up
@@ -86,6 +78,3 @@ def handle_notifications():
     except sqlite3.Error:
         # Ignora erros de banco de dados silenciosamente
         pass
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
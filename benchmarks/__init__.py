@@ -0,0 +1,2 @@
+# Scripts de benchmark do sistema de compras.
+# Cada script cria um banco temporário; nenhum deles toca em database/compras.db.
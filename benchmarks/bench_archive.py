@@ -0,0 +1,130 @@
+"""
+Mede o arquivamento dos pedidos encerrados (database/archive.py).
+
+Gera um banco sintético (benchmarks/datagen.py, três anos de histórico) em um
+diretório temporário e mede, antes e depois de run_archival(): o tamanho do
+banco quente, o tempo de um snapshot (database/backup.py) e as leituras das
+páginas com um período recente (só o banco quente) e com o histórico inteiro
+(banco quente e arquivo). Durante o arquivamento, uma thread faz gravações
+pequenas, como as sessões do Streamlit, para mostrar que os lotes curtos não
+seguram o banco.
+
+Uso: python -m benchmarks.bench_archive [--orders N] [--months N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(timings)
+
+
+def _latency(values):
+    values = sorted(values)
+    return (f"p50 {values[len(values) // 2] * 1e3:6.2f} ms  p95 {values[int(len(values) * 0.95)] * 1e3:6.2f} ms  "
+            f"máx. {values[-1] * 1e3:6.2f} ms")
+
+
+def _reads(repeat):
+    """Leituras das páginas: (rótulo, milissegundos)."""
+    from database.orders import count_orders, list_orders, summarize_orders
+    from database.search import search_orders
+    from reports.export import iter_order_rows
+
+    recent = {'date_from': date.today() - timedelta(days=90)}
+    readings = [
+        ("primeira página, 90 dias", lambda: list_orders(limit=50, **recent)),
+        ("contagem com filtro, 90 dias", lambda: count_orders(status='aprovado', **recent)),
+        ("totais por fornecedor, 90 dias", lambda: summarize_orders(supplier='Kalunga', **recent)),
+        ("busca 'toner', 90 dias", lambda: search_orders('toner', **recent)),
+        ("relatório CSV, 90 dias", lambda: sum(1 for _ in iter_order_rows(recent))),
+        ("primeira página, histórico inteiro", lambda: list_orders(limit=50)),
+        ("totais por fornecedor, histórico", lambda: summarize_orders(supplier='Kalunga')),
+        ("busca 'toner', histórico", lambda: search_orders('toner')),
+    ]
+    return [(label, _median_ms(func, repeat)) for label, func in readings]
+
+
+def _snapshot_seconds(backup_dir):
+    from database.backup import create_snapshot
+
+    start = time.perf_counter()
+    path = create_snapshot(backup_dir)
+    return time.perf_counter() - start, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--months', type=int, default=12, help="meses desde a decisão para arquivar")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    directory = tempfile.mkdtemp()
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(directory, 'bench.db')
+    os.environ['COMPRAS_BACKUP_DIR'] = os.path.join(directory, 'backups')
+    from benchmarks.datagen import generate
+    from database.archive import archive_status, run_archival
+    from database.connection import get_pool
+    from database.notifications import mark_read
+
+    start = time.perf_counter()
+    counts = generate(args.orders)
+    # Como um banco em uso, já convertido pela compactação periódica (database/retention.py)
+    with get_pool().writer_connection() as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    print(f"{counts['purchase_orders']:,} pedidos, {counts['order_items']:,} itens gerados em {time.perf_counter() - start:.1f} s")
+
+    before_status = archive_status()
+    before_snapshot = _snapshot_seconds(os.path.join(directory, 'backups'))
+    before_reads = _reads(args.repeat)
+
+    rng = random.Random(42)
+    latencies = []
+    done = threading.Event()
+
+    def session_writes():
+        # Gravação pequena e frequente, como marcar notificações como lidas
+        while not done.is_set():
+            started = time.perf_counter()
+            mark_read(rng.randint(1, 50), 0)
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.002)
+
+    writer = threading.Thread(target=session_writes)
+    writer.start()
+    result = run_archival(args.months)
+    done.set()
+    writer.join()
+
+    after_status = archive_status()
+    after_snapshot = _snapshot_seconds(os.path.join(directory, 'backups'))
+    after_reads = _reads(args.repeat)
+
+    print(f"\nrun_archival ({args.months} meses): {result['seconds']:.2f} s, {result['orders']:,} pedidos, "
+          f"{result['items']:,} itens e {result['approvals']:,} aprovações movidos")
+    print(f"  gravações das sessões durante o arquivamento ({len(latencies):,}): {_latency(latencies)}")
+    print(f"\n{'':36} {'antes':>12} {'depois':>12}")
+    print(f"{'banco quente (MB)':36} {before_status['hot_size'] / 1024 / 1024:12.1f} {after_status['hot_size'] / 1024 / 1024:12.1f}")
+    print(f"{'arquivo (MB)':36} {before_status['archive_size'] / 1024 / 1024:12.1f} {after_status['archive_size'] / 1024 / 1024:12.1f}")
+    print(f"{'snapshot do banco quente (s)':36} {before_snapshot[0]:12.2f} {after_snapshot[0]:12.2f}")
+    print(f"{'snapshot compactado (MB)':36} {before_snapshot[1] / 1024 / 1024:12.1f} {after_snapshot[1] / 1024 / 1024:12.1f}")
+    for (label, before_ms), (_, after_ms) in zip(before_reads, after_reads):
+        print(f"{label + ' (ms)':36} {before_ms:12.2f} {after_ms:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Mede a decisão em lote da fila de aprovação (database/approvals.py).
+
+Gera um banco sintético (benchmarks/datagen.py) em um diretório temporário,
+devolve à fila conjuntos de pedidos ainda sem decisões e compara, pela fila de
+escrita (database/writer.py, como a página 04): um clique por pedido
+(record_decision, uma transação por pedido) contra uma única chamada de
+record_decisions para o conjunto inteiro, aprovando e reprovando. Mostra
+também os eventos e as notificações gravados.
+
+Uso: python -m benchmarks.bench_bulk_approvals [--orders N] [--selected N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# Devolve à fila os pedidos da lista: pendentes, sem decisões e com quórum de um aprovador
+_RESET_ORDERS = """
+    UPDATE purchase_orders SET status = 'pendente', approvals_count = 0, rejections_count = 0, required_approvals = 1
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--selected', type=int, default=500, help="pedidos decididos de uma vez")
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from benchmarks.datagen import generate
+    from database.approvals import record_decision, record_decisions
+    from database.connection import get_connection, write_transaction
+    from database.writer import run_write
+
+    generate(args.orders)
+    conn = get_connection()
+    approver_id = conn.execute("SELECT id FROM users WHERE role = 'aprovador' ORDER BY id LIMIT 1").fetchone()[0]
+    ids = [row[0] for row in conn.execute("SELECT id FROM purchase_orders ORDER BY id DESC LIMIT ?", (args.selected * 3,))]
+    if len(ids) < args.selected * 3:
+        parser.error("--orders precisa ser pelo menos 3 vezes --selected")
+    with write_transaction() as w:
+        w.execute(_RESET_ORDERS, (json.dumps(ids),))
+        w.execute("DELETE FROM approvals WHERE order_id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+    one_by_one, bulk_approve, bulk_reject = (ids[i::3] for i in range(3))
+
+    def counters():
+        return tuple(conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                     for table in ('order_events', 'notifications'))
+
+    def measure(label, func):
+        events, notifications = counters()
+        start = time.perf_counter()
+        decided = func()
+        elapsed = (time.perf_counter() - start) * 1e3
+        after_events, after_notifications = counters()
+        print(f"{label:36} {elapsed:10.2f} ms  {decided:5} pedidos  "
+              f"{after_events - events:5} eventos  {after_notifications - notifications:5} notificações")
+
+    print(f"{args.orders:,} pedidos gerados; {args.selected} pedidos por decisão\n")
+    measure("um clique por pedido (aprovar)",
+            lambda: sum(1 for order_id in one_by_one if run_write(record_decision, order_id, approver_id, True)))
+    measure("em lote (aprovar)", lambda: len(run_write(record_decisions, bulk_approve, approver_id, True)))
+    measure("em lote (reprovar)", lambda: len(run_write(record_decisions, bulk_reject, approver_id, False)))
+    # Repetir a decisão não grava nada: os pedidos já saíram da fila
+    measure("em lote, pedidos já decididos", lambda: len(run_write(record_decisions, bulk_approve, approver_id, True)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Mede a montagem dos e-mails de novos pedidos e dos resumos periódicos.
+
+Compara a tabela de itens gerada antes (DataFrame.to_html com os estilos
+aplicados por str.replace) com o modelo pré-compilado de mailer/templates.py,
+mede resumos de até 10 mil pedidos (limitados a DIGEST_MAX_ORDERS linhas e
+completos) e, em um banco temporário, a geração de um resumo a partir da fila
+email_digest_queue (enqueue_due_digests, como o worker faz a cada ciclo).
+
+Uso: python -m benchmarks.bench_email [--iterations N] [--digest-orders 100 1000 10000] [--queued N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def _timeit(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+def _legacy_items_table(items_df):
+    """Tabela de itens como era montada antes, a cada mensagem."""
+    return items_df.to_html(index=False, justify='center', border=0).replace(
+        '<table', '<table style="width:100%; border-collapse: collapse; font-family: Arial, sans-serif;"'
+    ).replace(
+        '<thead>', '<thead style="background-color: #f2f2f2;">'
+    ).replace(
+        '<th>', '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">'
+    ).replace(
+        '<td>', '<td style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">'
+    )
+
+
+def _order_details():
+    return {
+        'po_number': '000123/2026', 'requester': 'solicitante', 'total_value': 12345.67,
+        'justification': 'Reposição de estoque', 'supplier_name': 'Fornecedor Ltda',
+        'supplier_cnpj': '00.000.000/0001-00', 'supplier_contact': 'contato@fornecedor.com',
+        'payment_method': 'Boleto', 'bank_details': '', 'delivery_date': '2026-01-31',
+        'delivery_address': 'Rua A, 100\nCentro',
+    }
+
+
+def _bench_new_order(iterations):
+    import pandas as pd
+    from mailer.templates import render_new_order_email
+
+    columns = ['Qtde', 'Unidade', 'Descrição', 'Valor Un.', 'Valor Total']
+    print("E-mail de novo pedido (por mensagem):")
+    for count in (5, 50):
+        rows = [(index % 7 + 1, 'UNI', f"Item {index}", 10.0 + index, (index % 7 + 1) * (10.0 + index)) for index in range(count)]
+        items_df = pd.DataFrame(rows, columns=columns)
+        before = _timeit(lambda: _legacy_items_table(items_df), iterations)
+        after = _timeit(lambda: render_new_order_email(_order_details(), rows), iterations)
+        print(f"  {count:3d} itens: antes (só a tabela, to_html) {before:7.3f} ms   depois (e-mail completo) {after:7.3f} ms")
+
+
+def _bench_digest_render(sizes, iterations):
+    from mailer.templates import DIGEST_MAX_ORDERS, render_digest_email
+
+    print(f"\nResumo periódico (listando até {DIGEST_MAX_ORDERS} pedidos / todos):")
+    for size in sizes:
+        orders = [
+            {'po_number': f"{index:06d}/2026", 'requester': f"solicitante{index % 50}",
+             'created_at': '2026-01-15 10:00:00', 'total_value': 100.0 + index, 'justification': f"Pedido {index}"}
+            for index in range(size)
+        ]
+        repeat = max(iterations // max(size // 100, 1), 3)
+        capped = _timeit(lambda: render_digest_email(orders), repeat)
+        full = _timeit(lambda: render_digest_email(orders, max_orders=None), repeat)
+        capped_kb = len(render_digest_email(orders)[1]) / 1024
+        full_kb = len(render_digest_email(orders, max_orders=None)[1]) / 1024
+        print(f"  {size:6,d} pedidos: limitado {capped:8.2f} ms ({capped_kb:7.0f} KB)   completo {full:8.2f} ms ({full_kb:7.0f} KB)")
+
+
+def _bench_digest_queue(queued):
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_email.db')
+    from database.connection import get_connection, write_transaction
+    from database.migrations import migrate
+    from mailer.digest import enqueue_due_digests
+
+    migrate()
+    with write_transaction() as conn:
+        conn.execute("INSERT INTO users (id, username, password, role) VALUES (1, 'solicitante', 'x', 'Solicitante')")
+        conn.execute(
+            "INSERT INTO users (id, username, password, role, email, email_delivery, digest_minutes) "
+            "VALUES (2, 'aprovador', 'x', 'aprovador', 'aprovador@example.com', 'resumo', 30)"
+        )
+        conn.executemany(
+            "INSERT INTO purchase_orders (id, user_id, requester, po_number, justification, total_value, status) "
+            "VALUES (?, 1, 'solicitante', ?, 'Teste', ?, 'pendente')",
+            [(order_id, f"{order_id:06d}/2026", 100.0 + order_id) for order_id in range(1, queued + 1)]
+        )
+        # Entradas com a janela já vencida
+        conn.executemany(
+            "INSERT INTO email_digest_queue (user_id, order_id, created_at) VALUES (2, ?, datetime('now', '-1 day'))",
+            [(order_id,) for order_id in range(1, queued + 1)]
+        )
+
+    start = time.perf_counter()
+    digests = enqueue_due_digests()
+    elapsed = (time.perf_counter() - start) * 1e3
+    conn = get_connection()
+    outbox = conn.execute("SELECT COUNT(*) FROM email_outbox").fetchone()[0]
+    left = conn.execute("SELECT COUNT(*) FROM email_digest_queue").fetchone()[0]
+    print(f"\nResumo a partir da fila ({queued:,} pedidos pendentes para um aprovador):")
+    print(f"  enqueue_due_digests: {elapsed:8.2f} ms, {digests} resumo(s) gravado(s), "
+          f"{outbox} e-mail(s) no outbox, {left} entrada(s) restantes na fila")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--digest-orders', type=int, nargs='+', default=[100, 1_000, 10_000])
+    parser.add_argument('--queued', type=int, default=10_000, help="pedidos na fila do resumo")
+    args = parser.parse_args()
+
+    _bench_new_order(args.iterations)
+    _bench_digest_render(args.digest_orders, args.iterations)
+    _bench_digest_queue(args.queued)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Mede a vazão (linhas por segundo) da importação em lote de pedidos (importer/orders.py).
+
+Gera arquivos CSV sintéticos com o número de itens pedido e importa cada um em
+um banco temporário (cada arquivo com seus próprios números de pedido). Para
+os arquivos menores, compara com a gravação antiga, um INSERT por linha via
+DataFrame.iterrows().
+
+Uso: python -m benchmarks.bench_import [--items 10000 1000000] [--items-per-order N] [--baseline-limit N]
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+
+def _write_csv(path, items, items_per_order, rng, prefix):
+    with open(path, 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp, delimiter=';')
+        writer.writerow(['Nº Pedido', 'Solicitante', 'Data', 'Status', 'Fornecedor', 'CNPJ',
+                         'Qtde', 'Unidade', 'Descrição', 'Valor Un.'])
+        for i in range(items):
+            order = i // items_per_order
+            writer.writerow([
+                f"{prefix}-{order}", f"usuario{order % 50}", f"{1 + order % 28:02d}/{1 + order % 12:02d}/2023",
+                rng.choice(['aprovado', 'rejeitado', 'pendente']), f"Fornecedor {order % 300}",
+                f"{order % 99:02d}.{order % 999:03d}.000/0001-00",
+                rng.randint(1, 50), 'UNI', f"Item {i}", f"{rng.uniform(1, 500):.2f}".replace('.', ','),
+            ])
+
+
+def _baseline(path):
+    """Gravação antiga: lê o arquivo inteiro e insere item por item."""
+    import pandas as pd
+    from database.connection import write_transaction
+
+    frame = pd.read_csv(path, sep=';', dtype=str)
+    start = time.perf_counter()
+    with write_transaction() as conn:
+        cursor = conn.cursor()
+        order_ids = {}
+        for _, row in frame.iterrows():
+            order_id = order_ids.get(row['Nº Pedido'])
+            if order_id is None:
+                cursor.execute(
+                    "INSERT INTO purchase_orders (requester, po_number, status, total_value) VALUES (?, ?, ?, 0)",
+                    (row['Solicitante'], row['Nº Pedido'], row['Status'])
+                )
+                order_id = order_ids[row['Nº Pedido']] = cursor.lastrowid
+            quantity = int(row['Qtde'])
+            unit_value = float(row['Valor Un.'].replace(',', '.'))
+            cursor.execute(
+                "INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, ?, ?, ?, ?, ?)",
+                (order_id, quantity, row['Unidade'], row['Descrição'], unit_value, quantity * unit_value)
+            )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--items-per-order', type=int, default=20)
+    parser.add_argument('--baseline-limit', type=int, default=100_000,
+                        help="só mede a gravação antiga em arquivos com até N itens")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(directory, 'bench.db')
+    from database.migrations import migrate
+    from importer.orders import import_orders
+
+    migrate()
+
+    rng = random.Random(42)
+    for items in args.items:
+        path = os.path.join(directory, f"pedidos_{items}.csv")
+        _write_csv(path, items, args.items_per_order, rng, prefix=f"H{items}")
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"\n{items:,} itens ({items // args.items_per_order:,} pedidos, {size_mb:.1f} MB):")
+
+        with open(path, 'rb') as fp:
+            result = import_orders(fp, path, 'benchmark')
+        assert result['items'] == items and not result['error_count'], result['errors'][:5]
+        print(f"  importação em lote:  {result['seconds']:8.2f} s  {items / result['seconds']:>12,.0f} linhas/s")
+
+        if items <= args.baseline_limit:
+            seconds = _baseline(path)
+            print(f"  um INSERT por linha: {seconds:8.2f} s  {items / seconds:>12,.0f} linhas/s")
+
+
+if __name__ == '__main__':
+    main()
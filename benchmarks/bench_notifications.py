@@ -0,0 +1,125 @@
+"""
+Mede o custo das notificações: gravação por novo pedido e verificação por rerun.
+
+Compara a gravação de uma cópia da notificação por aprovador (como era feito)
+com a mensagem única para o papel, em tempo e em linhas na tabela; mede a
+verificação feita a cada rerun (handle_notifications) com e sem o cache do
+processo, a leitura das não lidas pelo cursor, a marcação como lidas e o
+histórico da página Notificações (inteiro, como era lido, e paginado).
+
+Uso: python -m benchmarks.bench_notifications [--users N] [--approvers N] [--notifications N] [--orders N] [--iterations N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def _timeit(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--approvers', type=int, default=50)
+    parser.add_argument('--notifications', type=int, default=200_000, help="notificações diretas já gravadas")
+    parser.add_argument('--orders', type=int, default=2_000, help="novos pedidos gravados no teste de escrita")
+    parser.add_argument('--iterations', type=int, default=2_000)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from database import queries
+    from database.connection import get_connection, write_transaction
+    from database.migrations import migrate
+    from database.notifications import fetch_history, fetch_unread, mark_read, notify_role, unread_count
+
+    migrate()
+    rng = random.Random(42)
+    approver_ids = list(range(1, args.approvers + 1))
+    with write_transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, password, role) VALUES (?, ?, 'x', ?)",
+            [(uid, f"user{uid}", 'aprovador' if uid in approver_ids else 'Solicitante') for uid in range(1, args.users + 1)]
+        )
+        conn.executemany(
+            "INSERT INTO notifications (user_id, message) VALUES (?, ?)",
+            ((rng.randint(1, args.users), f"Notificação {i}") for i in range(args.notifications))
+        )
+        # Tudo lido até aqui
+        conn.execute("UPDATE notification_cursors SET last_read_id = (SELECT MAX(id) FROM notifications)")
+
+    print(f"{args.notifications:,} notificações, {args.users} usuários ({args.approvers} aprovadores)")
+
+    print(f"\nAviso de {args.orders:,} novos pedidos aos aprovadores (um commit por pedido):")
+    before_rows = get_connection().execute("SELECT COUNT(*) FROM notifications").fetchone()[0]
+    start = time.perf_counter()
+    for order_id in range(args.orders):
+        with write_transaction() as conn:
+            conn.executemany(
+                "INSERT INTO notifications (user_id, message) VALUES (?, ?)",
+                [(approver_id, f"Novo pedido de compra #{order_id}") for approver_id in approver_ids]
+            )
+    fan_out_ms = (time.perf_counter() - start) / args.orders * 1e3
+    fan_out_rows = get_connection().execute("SELECT COUNT(*) FROM notifications").fetchone()[0] - before_rows
+    with write_transaction() as conn:
+        conn.execute("DELETE FROM notifications WHERE id > ?", (before_rows,))
+
+    before_rows = get_connection().execute("SELECT COUNT(*) FROM notifications").fetchone()[0]
+    start = time.perf_counter()
+    for order_id in range(args.orders):
+        with write_transaction() as conn:
+            notify_role(conn, 'aprovador', f"Novo pedido de compra #{order_id}")
+    broadcast_ms = (time.perf_counter() - start) / args.orders * 1e3
+    broadcast_rows = get_connection().execute("SELECT COUNT(*) FROM notifications").fetchone()[0] - before_rows
+    print(f"  antes  (uma linha por aprovador): {fan_out_ms:8.3f} ms por pedido, {fan_out_rows:,} linhas")
+    print(f"  depois (uma linha para o papel):  {broadcast_ms:8.3f} ms por pedido, {broadcast_rows:,} linhas")
+
+    idle_user = args.approvers + 1
+    print("\nVerificação por rerun (solicitante sem notificações novas):")
+    cached = _timeit(lambda: unread_count(idle_user, 'Solicitante'), args.iterations)
+    connection = get_connection()
+    uncached = _timeit(
+        lambda: connection.execute(queries.UNREAD_COUNT, {'user_id': idle_user, 'role': 'Solicitante'}).fetchone(),
+        args.iterations
+    )
+    print(f"  contagem pelo cursor:          {uncached:8.1f} µs")
+    print(f"  com o cache do processo:       {cached:8.1f} µs")
+
+    approver = approver_ids[0]
+    print(f"\nAprovador com {broadcast_rows:,} avisos de novos pedidos não lidos:")
+    count = _timeit(lambda: connection.execute(queries.UNREAD_COUNT, {'user_id': approver, 'role': 'aprovador'}).fetchone(), 200)
+    unread = fetch_unread(approver, 'aprovador')
+    listing = _timeit(lambda: fetch_unread(approver, 'aprovador'), 50)
+    start = time.perf_counter()
+    mark_read(approver, max(notif_id for notif_id, _ in unread))
+    mark_ms = (time.perf_counter() - start) * 1e3
+    print(f"  contagem:                      {count:8.1f} µs ({len(unread):,} não lidas)")
+    print(f"  lista das não lidas:           {listing / 1e3:8.2f} ms")
+    print(f"  marcar todas como lidas:       {mark_ms:8.2f} ms (uma linha do cursor)")
+    print(f"  não lidas depois:              {unread_count(approver, 'aprovador'):8d}")
+
+    history = len(fetch_history(approver, 'aprovador', limit=10 ** 9)[0])
+    print(f"\nHistórico do aprovador ({history:,} notificações):")
+    full = _timeit(lambda: connection.execute(
+        "SELECT message, user_id IS NULL FROM notifications WHERE user_id = ? OR target_role = 'aprovador' ORDER BY id DESC",
+        (approver,)
+    ).fetchall(), 20)
+    first_page, cursor = fetch_history(approver, 'aprovador', limit=25)
+    for _ in range(history // 25 // 2):
+        _, middle = fetch_history(approver, 'aprovador', cursor, 25)
+        cursor = middle or cursor
+    first = _timeit(lambda: fetch_history(approver, 'aprovador', limit=25), 200)
+    deep = _timeit(lambda: fetch_history(approver, 'aprovador', cursor, 25), 200)
+    print(f"  antes  (histórico inteiro):    {full / 1e3:8.2f} ms")
+    print(f"  depois (primeira página, 25):  {first / 1e3:8.2f} ms")
+    print(f"  depois (página do meio, 25):   {deep / 1e3:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
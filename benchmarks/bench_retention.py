@@ -0,0 +1,101 @@
+"""
+Mede a limpeza periódica (database/retention.py) em um banco com histórico.
+
+Grava notificações antigas e lidas (e algumas não lidas, que devem ficar),
+eventos de pedidos antigos e e-mails enviados em um banco temporário e roda
+run_retention() enquanto uma thread faz gravações pequenas, como as sessões
+do Streamlit: mostra o tempo da limpeza, a latência dessas gravações durante
+ela (os lotes curtos não devem segurar o banco), o que foi apagado e o
+tamanho do arquivo antes e depois da compactação.
+
+Uso: python -m benchmarks.bench_retention [--notifications N] [--events N] [--emails N] [--users N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+def _latency(values):
+    values = sorted(values)
+    return (f"p50 {values[len(values) // 2] * 1e3:6.2f} ms  p95 {values[int(len(values) * 0.95)] * 1e3:6.2f} ms  "
+            f"máx. {values[-1] * 1e3:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--notifications', type=int, default=500_000)
+    parser.add_argument('--events', type=int, default=200_000)
+    parser.add_argument('--emails', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['COMPRAS_DB_PATH'] = db_path
+    from database.connection import get_connection, write_transaction
+    from database.migrations import migrate
+    from database.notifications import mark_read
+    from database.retention import NOTIFICATION_RETENTION_DAYS, run_retention
+
+    migrate()
+    rng = random.Random(42)
+    old = f"datetime('now', '-{NOTIFICATION_RETENTION_DAYS + 30} days')"
+    with write_transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, password, role) VALUES (?, ?, 'x', ?)",
+            [(uid, f"user{uid}", 'aprovador' if uid <= 10 else 'Solicitante') for uid in range(1, args.users + 1)]
+        )
+        conn.executemany(
+            f"INSERT INTO notifications (user_id, message, created_at) VALUES (?, ?, {old})",
+            ((rng.randint(1, args.users), f"Notificação antiga {i}") for i in range(args.notifications))
+        )
+        conn.execute("UPDATE notification_cursors SET last_read_id = (SELECT MAX(id) FROM notifications)")
+        # Antigas, mas ainda não lidas: precisam continuar no banco
+        conn.executemany(
+            f"INSERT INTO notifications (user_id, message, created_at) VALUES (?, 'Ainda não lida', {old})",
+            [(uid,) for uid in range(1, args.users + 1)]
+        )
+        conn.executemany(
+            "INSERT INTO order_events (order_id, event, created_at) VALUES (?, 'editado', datetime('now', '-30 days'))",
+            ((i,) for i in range(args.events))
+        )
+        conn.executemany(
+            "INSERT INTO email_outbox (recipients, subject, body_html, status, created_at) "
+            "VALUES ('[]', 'Assunto', ?, 'enviado', datetime('now', '-60 days'))",
+            (("<p>" + "corpo do e-mail " * 200 + "</p>",) for _ in range(args.emails))
+        )
+
+    print(f"{args.notifications:,} notificações lidas, {args.events:,} eventos e {args.emails:,} e-mails enviados antigos")
+    latencies = []
+    done = threading.Event()
+
+    def session_writes():
+        # Gravação pequena e frequente, como marcar notificações como lidas
+        while not done.is_set():
+            start = time.perf_counter()
+            mark_read(rng.randint(1, args.users), 0)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.002)
+
+    writer = threading.Thread(target=session_writes)
+    writer.start()
+    result = run_retention()
+    done.set()
+    writer.join()
+
+    conn = get_connection()
+    print(f"\nrun_retention: {result['seconds']:.2f} s")
+    print(f"  apagados: {result['notifications']:,} notificações, {result['order_events']:,} eventos, "
+          f"{result['sent_emails']:,} e-mails")
+    print(f"  restantes: {conn.execute('SELECT COUNT(*) FROM notifications').fetchone()[0]:,} notificações (não lidas), "
+          f"{conn.execute('SELECT COUNT(*) FROM order_events').fetchone()[0]:,} evento(s)")
+    print(f"  arquivo: {result['size_before'] / 1024 / 1024:,.1f} MB -> {result['size_after'] / 1024 / 1024:,.1f} MB "
+          f"({result['released_pages']:,} páginas liberadas)")
+    print(f"  gravações das sessões durante a limpeza ({len(latencies):,}): {_latency(latencies)}")
+
+
+if __name__ == '__main__':
+    main()
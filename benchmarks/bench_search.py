@@ -0,0 +1,99 @@
+"""
+Mede a latência da busca textual (database/search.py) em um banco grande.
+
+Gera pedidos e itens sintéticos (1M itens por padrão) em um banco temporário,
+com os índices FTS5 mantidos pelas triggers, e mede cada busca (mediana de
+várias execuções), comparando com um LIKE '%termo%' sobre as descrições que
+devolve os 50 pedidos mais recentes (o que obriga a ler todos os itens).
+
+Uso: python -m benchmarks.bench_search [--items N] [--items-per-order N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+PRODUCTS = ['Toner HP 85A', 'Papel A4 resma', 'Caneta azul', 'Cabo de rede Cat6', 'Parafuso sextavado',
+            'Luva de segurança', 'Cimento CP-II', 'Notebook Dell', 'Cartucho Epson', 'Fita isolante',
+            'Disjuntor 20A', 'Tinta acrílica branca', 'Mouse sem fio', 'Capacete de obra', 'Detergente neutro']
+SUPPLIERS = ['Papelaria Açaí', 'Kalunga', 'Leroy Merlin', 'Dell Computadores', 'Casa do Construtor',
+             'Elétrica Paulista', 'Distribuidora Norte', 'Atacadão Limpeza']
+
+# (rótulo, texto buscado, filtros)
+SEARCHES = [
+    ("duas palavras", "notebook dell", {}),
+    ("prefixo curto", "cart", {}),
+    ("termo comum", "papel", {}),
+    ("fornecedor com acento", "acai", {}),
+    ("CNPJ parcial", "12.345", {}),
+    ("termo comum, só pendentes", "toner", {'status': 'pendente'}),
+    ("sem resultado", "inexistente", {}),
+]
+
+
+def _populate(items, items_per_order, rng):
+    from database.connection import write_transaction
+    from database.search import deferred_search_index
+
+    orders = items // items_per_order
+    with write_transaction() as conn, deferred_search_index(conn):
+        conn.executemany(
+            "INSERT INTO purchase_orders (id, user_id, requester, po_number, status, total_value, justification, supplier_name, supplier_cnpj) "
+            "VALUES (?, 1, 'bench', ?, ?, 100, ?, ?, ?)",
+            (
+                (order_id, str(order_id), rng.choice(['pendente', 'aprovado', 'rejeitado']),
+                 f"Reposição de estoque do setor {order_id % 40}", rng.choice(SUPPLIERS),
+                 f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}")
+                for order_id in range(1, orders + 1)
+            )
+        )
+        conn.executemany(
+            "INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, 1, 'UNI', ?, 5, 5)",
+            ((1 + i // items_per_order, f"{rng.choice(PRODUCTS)} lote {i % 1000}") for i in range(items))
+        )
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1_000_000)
+    parser.add_argument('--items-per-order', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from database.connection import get_connection
+    from database.migrations import migrate
+    from database.search import search_orders
+
+    migrate()
+    start = time.perf_counter()
+    _populate(args.items, args.items_per_order, random.Random(42))
+    print(f"{args.items:,} itens em {args.items // args.items_per_order:,} pedidos "
+          f"(gerados e indexados em {time.perf_counter() - start:.1f} s)\n")
+
+    print(f"  {'busca':<28} {'FTS5':>10} {'resultados':>11}   {'LIKE':>10}")
+    conn = get_connection()
+    for label, text, filters in SEARCHES:
+        fts_ms, rows = _median_ms(lambda: search_orders(text, limit=50, **filters), args.repeat)
+        first_word = text.split()[0]
+        like_ms, _ = _median_ms(lambda: conn.execute(
+            "SELECT order_id FROM order_items WHERE description LIKE ? GROUP BY order_id ORDER BY order_id DESC LIMIT 50",
+            (f"%{first_word}%",)
+        ).fetchall(), max(1, args.repeat // 10))
+        print(f"  {label:<28} {fts_ms:8.2f} ms {len(rows):>11}   {like_ms:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
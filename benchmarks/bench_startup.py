@@ -0,0 +1,107 @@
+"""
+Mede o custo de abrir cada página em um processo novo (partida a frio) e de
+um rerun em seguida.
+
+Cada medição roda em um subprocesso limpo, com o AppTest do Streamlit sobre um
+banco gerado por benchmarks.datagen: o primeiro run inclui a importação dos
+módulos da página (o que o primeiro usuário espera após um deploy) e o
+segundo é um rerun comum. Também informa se a página carregou pandas e
+plotly, e o custo de importar cada um sozinho.
+
+Uso: python -m benchmarks.bench_startup [--repeat N] [--orders N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = [
+    'app.py',
+    'pages/01_Painel_de_Controle.py',
+    'pages/02_Administrador_do_Sistema.py',
+    'pages/03_Novo_Pedido_de_Compra.py',
+    'pages/04_Aprovar_Pedidos.py',
+    'pages/05_Notificacoes.py',
+]
+
+HEAVY_MODULES = ['pandas', 'plotly.express']
+
+
+def _child_page(page):
+    """Executado no subprocesso: abre a página duas vezes e imprime os tempos em JSON."""
+    start = time.perf_counter()
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+    streamlit_seconds = time.perf_counter() - start
+    set_log_level('error')
+
+    app = AppTest.from_file(os.path.abspath(page), default_timeout=120)
+    if page != 'app.py':
+        app.session_state['logged_in'] = True
+        app.session_state['user_id'] = 1
+        app.session_state['username'] = 'admin'
+        app.session_state['role'] = 'administrador'
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    print(json.dumps({
+        'streamlit': streamlit_seconds, 'first_run': timings[0], 'rerun': timings[1],
+        'loaded': [module for module in HEAVY_MODULES if module in sys.modules],
+    }))
+
+
+def _child_import(module):
+    start = time.perf_counter()
+    __import__(module)
+    print(json.dumps({'import': time.perf_counter() - start}))
+
+
+def _run_child(args, env):
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', *args], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--orders', type=int, default=1_000)
+    parser.add_argument('--child-page', help=argparse.SUPPRESS)
+    parser.add_argument('--child-import', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_page:
+        return _child_page(args.child_page)
+    if args.child_import:
+        return _child_import(args.child_import)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    env = dict(os.environ, COMPRAS_DB_PATH=db_path)
+    # Gera o banco em um subprocesso, para que este processo não importe nada do sistema
+    subprocess.run([sys.executable, '-m', 'benchmarks.datagen', '--orders', str(args.orders), '--output', db_path],
+                   env=env, capture_output=True, check=True)
+
+    print(f"Importação isolada (mediana de {args.repeat}):")
+    for module in HEAVY_MODULES:
+        seconds = statistics.median(_run_child(['--child-import', module], env)['import'] for _ in range(args.repeat))
+        print(f"  {module:<16} {seconds * 1e3:8.0f} ms")
+
+    print(f"\nPáginas em processo novo (mediana de {args.repeat}; 'import streamlit' à parte):")
+    print(f"  {'página':<40} {'1º run':>9} {'rerun':>9}   módulos pesados")
+    for page in PAGES:
+        results = [_run_child(['--child-page', page], env) for _ in range(args.repeat)]
+        first_run = statistics.median(result['first_run'] for result in results)
+        rerun = statistics.median(result['rerun'] for result in results)
+        print(f"  {page:<40} {first_run * 1e3:6.0f} ms {rerun * 1e3:6.0f} ms   {', '.join(results[0]['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Mede o custo da instrumentação de SQL (database/tracing.py).
+
+Em um banco gerado por benchmarks.datagen, executa as mesmas operações com a
+instrumentação desligada e ligada: uma leitura por chave primária (o caso em
+que o custo fixo por consulta mais pesa), uma página da listagem, os detalhes
+em lote de 50 pedidos e a leitura de todos os pedidos linha a linha, como no
+relatório.
+
+Uso: python -m benchmarks.bench_tracing [--orders N] [--iterations N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _per_call_us(func, iterations):
+    func()
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--iterations', type=int, default=2_000)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from benchmarks.datagen import generate
+    from database.connection import fetch_all, fetch_one
+    from database.orders import fetch_order_bundles, list_orders
+    from database.tracing import sql_tracer
+
+    generate(args.orders)
+    page_ids = [order['id'] for order in list_orders(limit=50)[0]]
+    operations = [
+        ("leitura por chave primária", lambda: fetch_one("SELECT status FROM purchase_orders WHERE id = ?", (1,)), args.iterations),
+        ("página da listagem (50)", lambda: list_orders(limit=50), args.iterations // 4),
+        ("detalhes em lote (50)", lambda: fetch_order_bundles(page_ids), args.iterations // 20),
+        (f"todos os pedidos ({args.orders:,})", lambda: fetch_all("SELECT * FROM purchase_orders"), 3),
+    ]
+
+    print(f"{args.orders:,} pedidos\n")
+    print(f"  {'operação':<30} {'desligada':>12} {'ligada':>12} {'custo':>10}")
+    for label, func, iterations in operations:
+        sql_tracer.enabled = False
+        off = _per_call_us(func, max(iterations, 1))
+        sql_tracer.enabled = True
+        on = _per_call_us(func, max(iterations, 1))
+        print(f"  {label:<30} {off:9.1f} µs {on:9.1f} µs {on / off - 1:9.1%}")
+    summary = sql_tracer.summary()
+    print(f"\n{summary['count']:,} consultas registradas, p50 {summary['p50_ms']:.3f} ms, p95 {summary['p95_ms']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Verificação de ponta a ponta do envio de e-mails (mailer/worker.py).
+
+Roda OutboxWorker.process_once() contra o servidor SMTP local
+(mailer/devserver.py), com a fila (mailer/outbox.py) em um banco temporário,
+e confere:
+
+- entrega: as mensagens da fila chegam ao servidor e ficam como 'enviado';
+- reaproveitamento da conexão: novas rodadas usam a mesma conexão (NOOP);
+- nova tentativa: uma falha de envio reagenda o e-mail com espera exponencial
+  (next_attempt_at) e ele é entregue quando a espera vence;
+- limite de tentativas: a falha de número MAX_ATTEMPTS marca 'falhou';
+- lease: um e-mail preso em 'enviando' (worker que caiu) volta a ser enviado
+  quando a reserva vence, mas não antes.
+
+Termina com código 1 em caso de falha.
+
+Uso: python -m benchmarks.check_mailer
+"""
+import os
+import sys
+import tempfile
+
+
+def main():
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'mailer.db')
+    from database.connection import get_connection, write_transaction
+    from database.migrations import migrate
+    from mailer.devserver import LocalSMTPServer
+    from mailer.outbox import BACKOFF_BASE_SECONDS, CLAIM_LEASE_SECONDS, MAX_ATTEMPTS, enqueue_email
+    from mailer.worker import OutboxWorker
+
+    migrate()
+    conn = get_connection()
+    problems = []
+
+    def check(label, ok, detail=''):
+        print(f"  {'OK   ' if ok else 'FALHA'} {label}{f' ({detail})' if detail else ''}")
+        if not ok:
+            problems.append(label)
+
+    def enqueue(*subjects):
+        with write_transaction() as w:
+            return [enqueue_email(w, ['aprovador@example.com'], subject, f"<p>{subject}</p>") for subject in subjects]
+
+    def row(email_id):
+        return conn.execute(
+            "SELECT status, attempts, (julianday(next_attempt_at) - julianday('now')) * 86400 "
+            "FROM email_outbox WHERE id = ?", (email_id,)
+        ).fetchone()
+
+    def make_due(email_id, **columns):
+        # Antecipa a próxima tentativa (e ajusta colunas) sem esperar o relógio
+        assignments = ''.join(f", {column} = ?" for column in columns)
+        with write_transaction() as w:
+            w.execute(f"UPDATE email_outbox SET next_attempt_at = datetime('now', '-1 second'){assignments} WHERE id = ?",
+                      (*columns.values(), email_id))
+
+    server = LocalSMTPServer(port=0).start()
+    settings = {'sender_email': 'compras@localhost', 'sender_password': '', 'smtp_server': 'localhost',
+                'smtp_port': server.server_address[1], 'use_ssl': False}
+    worker = OutboxWorker(settings)
+
+    # Porta sem servidor: toda conexão é recusada
+    closed = LocalSMTPServer(port=0)
+    failing = OutboxWorker(dict(settings, smtp_port=closed.server_address[1]))
+    closed.server_close()
+
+    print("Entrega e reaproveitamento da conexão")
+    ids = enqueue('Pedido 1', 'Pedido 2', 'Pedido 3')
+    result = worker.process_once()
+    check("3 e-mails enviados na primeira rodada", result == (3, 0), f"enviados, falhas = {result}")
+    check("mensagens recebidas pelo servidor",
+          [message['to'] for message in server.messages] == [['<aprovador@example.com>']] * 3
+          and all(f"Subject: Pedido {n}" in message['data'] for n, message in enumerate(server.messages, 1)),
+          f"{len(server.messages)} mensagem(ns)")
+    check("fila marcada como 'enviado'", all(row(email_id)[:2] == ('enviado', 1) for email_id in ids))
+    enqueue('Pedido 4', 'Pedido 5')
+    result = worker.process_once()
+    check("2 e-mails enviados na segunda rodada", result == (2, 0), f"enviados, falhas = {result}")
+    check("uma única conexão SMTP nas duas rodadas", server.connections == 1, f"{server.connections} conexão(ões)")
+
+    print("Nova tentativa com espera exponencial")
+    [retry_id] = enqueue('Pedido 6')
+    result = failing.process_once()
+    status, attempts, wait = row(retry_id)
+    check("falha de envio reagendada como 'pendente'", result == (0, 1) and (status, attempts) == ('pendente', 1),
+          f"{status}, {attempts} tentativa(s)")
+    check(f"próxima tentativa em ~{BACKOFF_BASE_SECONDS} s", abs(wait - BACKOFF_BASE_SECONDS) < 5, f"{wait:.1f} s")
+    result = worker.process_once()
+    check("nada é enviado antes da espera vencer", result == (0, 0) and row(retry_id)[0] == 'pendente')
+    make_due(retry_id)
+    result = failing.process_once()
+    status, attempts, wait = row(retry_id)
+    check("segunda falha dobra a espera", (status, attempts) == ('pendente', 2)
+          and abs(wait - 2 * BACKOFF_BASE_SECONDS) < 5, f"{wait:.1f} s")
+    make_due(retry_id)
+    result = worker.process_once()
+    check("entregue quando a espera vence", result == (1, 0) and row(retry_id)[:2] == ('enviado', 3),
+          f"{row(retry_id)[0]}, {row(retry_id)[1]} tentativa(s)")
+
+    print("Limite de tentativas")
+    [failed_id] = enqueue('Pedido 7')
+    make_due(failed_id, attempts=MAX_ATTEMPTS - 1)
+    result = failing.process_once()
+    check(f"falha de número {MAX_ATTEMPTS} marca 'falhou'", result == (0, 1)
+          and row(failed_id)[:2] == ('falhou', MAX_ATTEMPTS), f"{row(failed_id)[0]}, {row(failed_id)[1]} tentativa(s)")
+    make_due(failed_id)
+    result = worker.process_once()
+    check("e-mail 'falhou' não volta para a fila", result == (0, 0) and row(failed_id)[0] == 'falhou')
+
+    print("Recuperação da reserva (lease)")
+    expired_id, leased_id = enqueue('Pedido 8', 'Pedido 9')
+    with write_transaction() as w:
+        # Dois e-mails reservados por um worker que caiu: um com a reserva vencida, outro ainda dentro dela
+        w.execute("UPDATE email_outbox SET status = 'enviando', next_attempt_at = datetime('now', '-1 second') WHERE id = ?",
+                  (expired_id,))
+        w.execute("UPDATE email_outbox SET status = 'enviando', next_attempt_at = datetime('now', ?) WHERE id = ?",
+                  (f'+{CLAIM_LEASE_SECONDS} seconds', leased_id))
+    result = worker.process_once()
+    check("reserva vencida volta a ser enviada", result == (1, 0) and row(expired_id)[:2] == ('enviado', 1),
+          f"{row(expired_id)[0]}")
+    check("reserva dentro do prazo continua em 'enviando'", row(leased_id)[:2] == ('enviando', 0), f"{row(leased_id)[0]}")
+    check("total de mensagens recebidas", len(server.messages) == 7, f"{len(server.messages)}")
+
+    worker.sender.close()
+    server.stop()
+    if problems:
+        print(f"\nFALHA: {len(problems)} verificação(ões)")
+        sys.exit(1)
+    print("\nOK: entrega, reaproveitamento da conexão, novas tentativas, limite e lease conferem.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Gera bancos sintéticos com o mesmo esquema de database/compras.db.
+
+O banco é criado pelas migrações (mesmas tabelas, índices e triggers) e
+preenchido com usuários, pedidos, itens, aprovações e notificações em
+proporções parecidas com as de produção: a maioria dos pedidos já decidida
+pelo quórum de aprovadores, uma fila de pendentes com aprovações parciais e
+uma notificação por pedido decidido, com as mais recentes ainda não lidas.
+Com a mesma semente, o conteúdo gerado é sempre o mesmo.
+
+Uso: python -m benchmarks.datagen --orders 100000 --output /tmp/compras_100k.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Senha de todos os usuários gerados (para medir o login)
+PASSWORD = 'benchmark'
+
+PRODUCTS = ['Toner HP 85A', 'Papel A4 resma', 'Caneta azul', 'Cabo de rede Cat6', 'Parafuso sextavado',
+            'Luva de segurança', 'Cimento CP-II', 'Notebook Dell', 'Cartucho Epson', 'Fita isolante',
+            'Disjuntor 20A', 'Tinta acrílica branca', 'Mouse sem fio', 'Capacete de obra', 'Detergente neutro']
+SUPPLIERS = ['Papelaria Açaí', 'Kalunga', 'Leroy Merlin', 'Dell Computadores', 'Casa do Construtor',
+             'Elétrica Paulista', 'Distribuidora Norte', 'Atacadão Limpeza']
+UNITS = ['UNI', 'CX', 'PCT', 'KG', 'M']
+
+# Proporção de pedidos por status
+STATUS_WEIGHTS = {'aprovado': 0.7, 'rejeitado': 0.2, 'pendente': 0.1}
+
+# Período coberto pelos pedidos (terminando agora)
+HISTORY_DAYS = 3 * 365
+
+# Notificações mais recentes de cada solicitante que ficam como não lidas
+UNREAD_PER_USER = 3
+
+
+def _users(requesters, approvers):
+    """(id, username, role) dos usuários gerados: um administrador, aprovadores e solicitantes."""
+    users = [(1, 'admin', 'administrador')]
+    users += [(1 + n, f"aprovador{n}", 'aprovador') for n in range(1, approvers + 1)]
+    users += [(1 + approvers + n, f"solicitante{n}", 'Solicitante') for n in range(1, requesters + 1)]
+    return users
+
+
+def _orders(count, requester_ids, approver_ids, items_per_order, rng):
+    """
+    Gera (pedido, itens, aprovações) em ordem de criação. Os valores do pedido
+    seguem as colunas de _INSERT_ORDER.
+    """
+    now = datetime.now().replace(microsecond=0)
+    step = timedelta(days=HISTORY_DAYS) / max(count, 1)
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    quorum = len(approver_ids)
+
+    for order_id in range(1, count + 1):
+        created_at = now - step * (count - order_id)
+        status = rng.choices(statuses, weights)[0]
+        user_id = rng.choice(requester_ids)
+
+        items = []
+        for _ in range(max(1, round(rng.gauss(items_per_order, items_per_order / 3)))):
+            quantity = rng.randint(1, 50)
+            unit_value = round(rng.uniform(1, 500), 2)
+            items.append((order_id, quantity, rng.choice(UNITS),
+                          f"{rng.choice(PRODUCTS)} lote {rng.randint(1, 999)}", unit_value, quantity * unit_value))
+
+        if status == 'aprovado':
+            voters = [(approver, 'aprovado') for approver in approver_ids]
+        elif status == 'rejeitado':
+            voters = [(approver, 'aprovado') for approver in rng.sample(approver_ids, rng.randint(0, quorum - 1))]
+            voters.append((next(a for a in approver_ids if a not in {v for v, _ in voters}), 'rejeitado'))
+        else:
+            voters = [(approver, 'aprovado') for approver in rng.sample(approver_ids, rng.randint(0, quorum - 1))]
+        approvals = [(order_id, approver, decision, (created_at + timedelta(hours=1 + n)).isoformat(' '))
+                     for n, (approver, decision) in enumerate(voters)]
+
+        order = (
+            order_id, user_id, f"solicitante{user_id - 1 - quorum}", str(order_id), status, created_at.isoformat(' '),
+            sum(item[5] for item in items), f"Reposição do setor {order_id % 40}",
+            rng.choice(SUPPLIERS),
+            f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}",
+            (created_at + timedelta(days=15)).date().isoformat(),
+            sum(1 for _, decision in voters if decision == 'aprovado'),
+            sum(1 for _, decision in voters if decision == 'rejeitado'),
+            quorum,
+        )
+        yield order, items, approvals
+
+
+_INSERT_ORDER = """
+    INSERT INTO purchase_orders (id, user_id, requester, po_number, status, created_at, total_value,
+        justification, supplier_name, supplier_cnpj, delivery_date, approvals_count, rejections_count, required_approvals)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def generate(orders, items_per_order=5, requesters=50, approvers=3, seed=42, batch_size=20_000):
+    """
+    Preenche o banco do pool compartilhado (COMPRAS_DB_PATH), que deve estar
+    vazio. Retorna a quantidade de linhas gravadas por tabela.
+    """
+    from database.connection import write_transaction
+    from database.db import hash_password
+    from database.migrations import migrate
+    from database.search import deferred_search_index
+
+    migrate()
+    rng = random.Random(seed)
+    users = _users(requesters, approvers)
+    approver_ids = [uid for uid, _, role in users if role == 'aprovador']
+    requester_ids = [uid for uid, _, role in users if role == 'Solicitante']
+    password = hash_password(PASSWORD)
+
+    with write_transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, password, role, email, is_active) VALUES (?, ?, ?, ?, ?, 1)",
+            [(uid, username, password, role, f"{username}@example.com") for uid, username, role in users]
+        )
+
+    counts = {'users': len(users), 'purchase_orders': 0, 'order_items': 0, 'approvals': 0, 'notifications': 0}
+    generated = _orders(orders, requester_ids, approver_ids, items_per_order, rng)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), generated)]
+        if not batch:
+            break
+        # Uma transação por lote, com a indexação da busca feita de uma vez no fim de cada uma
+        with write_transaction() as conn, deferred_search_index(conn):
+            conn.executemany(_INSERT_ORDER, (order for order, _, _ in batch))
+            conn.executemany(
+                "INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, ?, ?, ?, ?, ?)",
+                (item for _, items, _ in batch for item in items)
+            )
+            conn.executemany(
+                "INSERT INTO approvals (order_id, user_id, status, approved_at) VALUES (?, ?, ?, ?)",
+                (approval for _, _, approvals in batch for approval in approvals)
+            )
+            conn.executemany(
+                "INSERT INTO notifications (user_id, message, created_at) VALUES (?, ?, ?)",
+                ((order[1], f"Seu pedido #{order[0]} foi {order[4]}.", order[5])
+                 for order, _, _ in batch if order[4] != 'pendente')
+            )
+        counts['purchase_orders'] += len(batch)
+        counts['order_items'] += sum(len(items) for _, items, _ in batch)
+        counts['approvals'] += sum(len(approvals) for _, _, approvals in batch)
+        counts['notifications'] += sum(1 for order, _, _ in batch if order[4] != 'pendente')
+
+    with write_transaction() as conn:
+        # As notificações mais recentes de cada solicitante ficam por ler: o cursor
+        # de leitura para logo antes delas
+        conn.execute("""
+            UPDATE notification_cursors SET last_read_id = COALESCE((
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY id DESC) AS position
+                    FROM notifications WHERE user_id = notification_cursors.user_id
+                ) WHERE position = ?
+            ), 0)
+        """, (UNREAD_PER_USER + 1,))
+        conn.execute(
+            "INSERT OR REPLACE INTO po_sequences (series, last_value) VALUES ('geral', ?)", (orders,)
+        )
+    with write_transaction() as conn:
+        conn.execute("ANALYZE")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--items-per-order', type=int, default=5)
+    parser.add_argument('--requesters', type=int, default=50)
+    parser.add_argument('--approvers', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True, help="arquivo do banco a criar (não pode existir)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        parser.error(f"{args.output} já existe")
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = args.output
+
+    start = time.perf_counter()
+    counts = generate(args.orders, args.items_per_order, args.requesters, args.approvers, args.seed)
+    print(f"Banco gerado em {time.perf_counter() - start:.1f} s: {args.output}")
+    for table, count in counts.items():
+        print(f"  {table:<16} {count:>12,}")
+    print(f"Senha de todos os usuários: {PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Teste de estresse do registro de aprovações (database/approvals.py).
+
+Vários processos (cada um com seu próprio pool de conexões) e várias threads
+por processo decidem, ao mesmo tempo e com cliques duplicados, sobre os mesmos
+pedidos. Ao final verifica que cada pedido mudou de status uma única vez, que
+o solicitante recebeu exatamente uma notificação por pedido e que os
+contadores batem com as decisões gravadas.
+
+Uso: python -m benchmarks.stress_approvals [--approvers N] [--orders N] [--processes N] [--reject-rate X]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+REQUESTER_ID = 1
+
+
+def _decide_all(approver_ids, order_ids, reject_rate, seed):
+    """Executado em cada processo: uma thread por aprovador, cada uma clicando duas vezes por pedido."""
+    from database.approvals import record_decision
+
+    results = {'decisions': 0, 'refused': 0}
+    lock = threading.Lock()
+
+    def run(approver_id):
+        rng = random.Random(seed * 1000 + approver_id)
+        orders = list(order_ids)
+        rng.shuffle(orders)
+        decisions = refused = 0
+        for order_id in orders:
+            approved = rng.random() >= reject_rate
+            for _ in range(2):
+                try:
+                    record_decision(order_id, approver_id, approved)
+                    decisions += 1
+                except ValueError:
+                    refused += 1
+        with lock:
+            results['decisions'] += decisions
+            results['refused'] += refused
+
+    threads = [threading.Thread(target=run, args=(approver_id,)) for approver_id in approver_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _check(conn, approvers):
+    """Retorna a lista de inconsistências encontradas (vazia se tudo estiver certo)."""
+    problems = []
+    decided = {}
+    for order_id, status, count in conn.execute(
+        "SELECT order_id, status, COUNT(*) FROM approvals GROUP BY order_id, status"
+    ):
+        decided[(order_id, status)] = count
+
+    notified = {}
+    for (message,) in conn.execute("SELECT message FROM notifications WHERE user_id = ?", (REQUESTER_ID,)):
+        order_id = int(re.search(r"#(\d+)", message).group(1))
+        notified[order_id] = notified.get(order_id, 0) + 1
+
+    orders = conn.execute(
+        "SELECT id, status, approvals_count, rejections_count, required_approvals FROM purchase_orders"
+    ).fetchall()
+    for order_id, status, approvals, rejections, required in orders:
+        if approvals != decided.get((order_id, 'aprovado'), 0) or rejections != decided.get((order_id, 'rejeitado'), 0):
+            problems.append(f"pedido {order_id}: contadores divergem das decisões gravadas")
+        if status == 'aprovado' and (approvals != required or rejections):
+            problems.append(f"pedido {order_id}: aprovado com {approvals}/{required} aprovações e {rejections} rejeições")
+        elif status == 'rejeitado' and rejections != 1:
+            problems.append(f"pedido {order_id}: rejeitado com {rejections} rejeições")
+        elif status == 'pendente':
+            problems.append(f"pedido {order_id}: continua pendente após {approvers} aprovadores decidirem")
+        if notified.get(order_id, 0) != 1:
+            problems.append(f"pedido {order_id}: {notified.get(order_id, 0)} notificações ao solicitante")
+    return problems, len(orders)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--approvers', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--reject-rate', type=float, default=0.02)
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    # (os processos filhos herdam a variável de ambiente)
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    from database.connection import get_connection, write_transaction
+    from database.migrations import migrate
+
+    migrate()
+    approver_ids = list(range(REQUESTER_ID + 1, REQUESTER_ID + 1 + args.approvers))
+    with write_transaction() as conn:
+        conn.execute("INSERT INTO users (id, username, password, role) VALUES (?, 'solicitante', 'x', 'Solicitante')", (REQUESTER_ID,))
+        conn.executemany(
+            "INSERT INTO users (id, username, password, role) VALUES (?, ?, 'x', 'aprovador')",
+            [(uid, f"aprovador{uid}") for uid in approver_ids]
+        )
+        conn.executemany(
+            "INSERT INTO purchase_orders (user_id, requester, po_number, total_value, required_approvals) VALUES (?, 'solicitante', ?, 100, ?)",
+            [(REQUESTER_ID, f"PC-{i}", args.approvers) for i in range(args.orders)]
+        )
+    order_ids = [row[0] for row in get_connection().execute("SELECT id FROM purchase_orders")]
+
+    print(f"{args.orders} pedidos, {args.approvers} aprovadores em {args.processes} processos, cliques duplicados")
+    context = multiprocessing.get_context('spawn')
+    groups = [approver_ids[i::args.processes] for i in range(args.processes)]
+    start = time.perf_counter()
+    with context.Pool(args.processes) as pool:
+        results = pool.starmap(
+            _decide_all,
+            [(group, order_ids, args.reject_rate, seed) for seed, group in enumerate(groups) if group]
+        )
+    elapsed = time.perf_counter() - start
+
+    decisions = sum(result['decisions'] for result in results)
+    refused = sum(result['refused'] for result in results)
+    print(f"  {decisions} decisões gravadas, {refused} recusadas em {elapsed:.2f} s "
+          f"({(decisions + refused) / elapsed:,.0f} cliques/s)")
+
+    problems, total = _check(get_connection(), args.approvers)
+    statuses = dict(get_connection().execute("SELECT status, COUNT(*) FROM purchase_orders GROUP BY status").fetchall())
+    print(f"  status finais: {statuses}")
+    if problems:
+        print(f"FALHA: {len(problems)} inconsistências em {total} pedidos")
+        for problem in problems[:20]:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print(f"OK: cada um dos {total} pedidos mudou de status uma vez e gerou uma notificação.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Teste de concorrência da numeração dos pedidos (database/po_numbers.py).
+
+Vários processos (cada um com seu próprio pool de conexões) e várias threads
+por processo gravam pedidos ao mesmo tempo, reservando o número na mesma
+transação do INSERT, como faz o formulário. Ao final verifica que N envios
+receberam N números distintos e consecutivos em cada série.
+
+Uso: python -m benchmarks.stress_po_numbers [--submissions N] [--processes N] [--threads N] [--format NOME]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def _submit(count, threads, po_format, seed):
+    """Executado em cada processo: 'threads' threads dividem 'count' envios."""
+    from database.connection import write_transaction
+    from database.po_numbers import allocate_po_number
+
+    cost_centers = ['ADM', 'OBRAS', 'TI']
+
+    def run(thread_index, amount):
+        for i in range(amount):
+            with write_transaction() as conn:
+                po_number = allocate_po_number(
+                    conn, cost_center=cost_centers[(seed + thread_index + i) % len(cost_centers)], po_format=po_format
+                )
+                conn.execute(
+                    "INSERT INTO purchase_orders (user_id, requester, po_number, total_value) VALUES (1, 'teste', ?, 1)",
+                    (po_number,)
+                )
+
+    per_thread = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=run, args=(i, amount)) for i, amount in enumerate(per_thread)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=2_000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--format', default='centro_de_custo')
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    # (os processos filhos herdam a variável de ambiente)
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    from database.connection import get_connection
+    from database.migrations import migrate
+
+    migrate()
+    per_process = [args.submissions // args.processes + (1 if i < args.submissions % args.processes else 0)
+                   for i in range(args.processes)]
+    print(f"{args.submissions} envios em {args.processes} processos x {args.threads} threads, formato '{args.format}'")
+
+    context = multiprocessing.get_context('spawn')
+    start = time.perf_counter()
+    with context.Pool(args.processes) as pool:
+        pool.starmap(_submit, [(count, args.threads, args.format, seed) for seed, count in enumerate(per_process)])
+    elapsed = time.perf_counter() - start
+    print(f"  {args.submissions / elapsed:,.0f} envios/s")
+
+    numbers = [row[0] for row in get_connection().execute("SELECT po_number FROM purchase_orders")]
+    unique = set(numbers)
+    # Dentro de cada série os números devem ser 1..n, sem buracos
+    series = {}
+    for number in unique:
+        prefix, _, value = number.rpartition('/')
+        series.setdefault(prefix, []).append(int(value))
+    gaps = [prefix for prefix, values in series.items() if sorted(values) != list(range(1, len(values) + 1))]
+
+    print(f"  {len(numbers)} pedidos gravados, {len(unique)} números distintos em {len(series)} séries")
+    if len(numbers) != args.submissions or len(unique) != len(numbers) or gaps:
+        print(f"FALHA: números repetidos ou séries com buracos ({', '.join(gaps) or 'repetição'})")
+        sys.exit(1)
+    print("OK: cada envio recebeu um número único.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Teste de estresse do snapshot online (database/backup.py) sob escritas.
+
+Gera um banco sintético (benchmarks/datagen.py) e, enquanto vários processos
+enviam pedidos sem parar pela fila de escrita (o mesmo envio de
+benchmarks/stress_writes.py), cria um snapshot com create_snapshot(). Confere
+que o snapshot termina dentro do prazo, que houve commits durante a cópia, que
+o arquivo passa no PRAGMA integrity_check e que ele traz os pedidos gravados
+até o início da cópia. Termina com código 1 em caso de falha.
+
+Uso: python -m benchmarks.stress_snapshot [--orders N] [--processes N] [--threads N] [--timeout S]
+"""
+import argparse
+import gzip
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.stress_writes import REQUESTER_ID, _submit_order
+
+
+def _write_until(stop, threads, items, counter):
+    """Executado em cada processo: as threads enviam pedidos pela fila até 'stop'."""
+    from database.writer import run_write
+
+    item_rows = [(index % 7 + 1, 10.0 + index) for index in range(items)]
+
+    def session():
+        while not stop.is_set():
+            run_write(_submit_order, REQUESTER_ID, item_rows)
+            with counter.get_lock():
+                counter.value += 1
+
+    workers = [threading.Thread(target=session) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def _snapshot_orders(path):
+    """Descompacta o snapshot e retorna (integridade ok, quantidade de pedidos)."""
+    copy_path = path[:-len('.gz')]
+    with gzip.open(path, 'rb') as source, open(copy_path, 'wb') as target:
+        shutil.copyfileobj(source, target, length=1024 * 1024)
+    conn = sqlite3.connect(copy_path)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        return integrity, conn.execute("SELECT COUNT(*) FROM purchase_orders").fetchone()[0]
+    finally:
+        conn.close()
+        os.remove(copy_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=40_000)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=120, help="prazo (s) para o snapshot terminar")
+    args = parser.parse_args()
+
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    directory = tempfile.mkdtemp()
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(directory, 'stress.db')
+    backup_dir = os.path.join(directory, 'backups')
+    from benchmarks.datagen import generate
+    from database.backup import create_snapshot
+    from database.connection import DB_PATH, get_connection
+
+    generate(args.orders)
+    print(f"{args.orders:,} pedidos gerados ({os.path.getsize(DB_PATH) / 1024 / 1024:,.1f} MB); "
+          f"{args.processes} processo(s) x {args.threads} sessões enviando pedidos")
+
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    counter = context.Value('i', 0)
+    writers = [context.Process(target=_write_until, args=(stop, args.threads, args.items, counter))
+               for _ in range(args.processes)]
+    for writer in writers:
+        writer.start()
+    # Espera a carga começar antes de copiar
+    while counter.value < 50:
+        time.sleep(0.05)
+
+    conn = get_connection()
+    orders_before = conn.execute("SELECT COUNT(*) FROM purchase_orders").fetchone()[0]
+    commits_before = counter.value
+    result = {}
+
+    def snapshot():
+        try:
+            result['path'] = create_snapshot(backup_dir)
+        except Exception as e:
+            result['error'] = e
+
+    start = time.perf_counter()
+    copier = threading.Thread(target=snapshot, daemon=True)
+    copier.start()
+    copier.join(args.timeout)
+    seconds = time.perf_counter() - start
+    commits_during = counter.value - commits_before
+    stop.set()
+    for writer in writers:
+        writer.join()
+
+    problems = []
+    if copier.is_alive():
+        problems.append(f"o snapshot não terminou em {args.timeout:.0f} s")
+    elif 'error' in result:
+        problems.append(f"o snapshot falhou: {result['error']}")
+    else:
+        print(f"\nsnapshot: {seconds:.2f} s, {os.path.getsize(result['path']) / 1024 / 1024:,.1f} MB compactado, "
+              f"{commits_during:,} pedidos gravados durante a cópia")
+        if not commits_during:
+            problems.append("nenhum commit durante a cópia: a carga não concorreu com o snapshot")
+        integrity, orders = _snapshot_orders(result['path'])
+        if not integrity:
+            problems.append("o snapshot falhou no PRAGMA integrity_check")
+        if orders < orders_before:
+            problems.append(f"o snapshot tem {orders:,} pedidos, menos que os {orders_before:,} do início da cópia")
+
+    if problems:
+        print("FALHA:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("OK: o snapshot terminou sob escritas concorrentes e passou na verificação de integridade.")
+
+
+if __name__ == '__main__':
+    main()
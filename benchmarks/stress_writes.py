@@ -0,0 +1,203 @@
+"""
+Teste de carga da fila de escrita com commit em grupo (database/writer.py).
+
+Simula o pico de fim de mês: vários processos, cada um com várias threads
+(as sessões do Streamlit), enviam pedidos ao mesmo tempo (número do pedido,
+pedido, itens e notificações aos aprovadores, como na página Novo Pedido) e
+depois decidem sobre eles (record_decision, como na página Aprovar Pedidos).
+
+Cada cenário roda duas vezes em bancos novos: 'direto', com uma transação por
+gravação (o comportamento anterior), e 'fila', com run_write. Mostra as
+gravações por segundo, a latência por gravação e, na fila, o tamanho médio
+dos lotes; ao final confere que nada foi perdido ou duplicado.
+
+Uso: python -m benchmarks.stress_writes [--processes N] [--threads N] [--orders N] [--items N] [--approvers N]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+REQUESTER_ID = 1
+
+
+def _submit_order(requester_id, items):
+    """Gravação equivalente ao envio de um pedido pela página Novo Pedido."""
+    from database import queries
+    from database.connection import write_transaction
+    from database.po_numbers import allocate_po_number
+
+    with write_transaction() as conn:
+        po_number = allocate_po_number(conn)
+        required = conn.execute(queries.REQUIRED_APPROVALS).fetchone()[0]
+        order_id = conn.execute(
+            "INSERT INTO purchase_orders (user_id, requester, po_number, justification, total_value, status, required_approvals) "
+            "VALUES (?, 'solicitante', ?, 'Teste de carga', ?, 'pendente', ?)",
+            (requester_id, po_number, sum(quantity * value for quantity, value in items), required)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, ?, 'UNI', 'Item', ?, ?)",
+            [(order_id, quantity, value, quantity * value) for quantity, value in items]
+        )
+        conn.execute(
+            "INSERT INTO notifications (target_role, message) VALUES ('aprovador', ?)",
+            (f"Novo pedido de compra #{order_id} aguardando sua aprovação.",)
+        )
+    return order_id
+
+
+def _run_sessions(mode, threads, orders_per_thread, items, approver_ids):
+    """Executado em cada processo: as threads enviam pedidos e depois os decidem. Retorna tempos e contagens."""
+    from database.approvals import record_decision
+    from database.writer import run_write, write_queue
+
+    def write(func, *args):
+        return run_write(func, *args) if mode == 'fila' else func(*args)
+
+    barrier = threading.Barrier(threads)
+    results = {'submit': [], 'decide': [], 'order_ids': [], 'refused': 0}
+    lock = threading.Lock()
+    item_rows = [(index % 7 + 1, 10.0 + index) for index in range(items)]
+
+    def session():
+        latencies, order_ids = [], []
+        barrier.wait()
+        for _ in range(orders_per_thread):
+            start = time.perf_counter()
+            order_ids.append(write(_submit_order, REQUESTER_ID, item_rows))
+            latencies.append(time.perf_counter() - start)
+        barrier.wait()
+        decisions, refused = [], 0
+        for order_id in order_ids:
+            for approver_id in approver_ids:
+                start = time.perf_counter()
+                try:
+                    write(record_decision, order_id, approver_id, True)
+                except ValueError:
+                    refused += 1
+                decisions.append(time.perf_counter() - start)
+        with lock:
+            results['submit'].extend(latencies)
+            results['decide'].extend(decisions)
+            results['order_ids'].extend(order_ids)
+            results['refused'] += refused
+
+    workers = [threading.Thread(target=session) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results['seconds'] = time.perf_counter() - start
+    results['queue'] = write_queue.stats()
+    return results
+
+
+def _prepare(approvers):
+    from database.connection import write_transaction
+    from database.migrations import migrate
+
+    migrate()
+    approver_ids = list(range(REQUESTER_ID + 1, REQUESTER_ID + 1 + approvers))
+    with write_transaction() as conn:
+        conn.execute("INSERT INTO users (id, username, password, role) VALUES (?, 'solicitante', 'x', 'Solicitante')", (REQUESTER_ID,))
+        conn.executemany(
+            "INSERT INTO users (id, username, password, role, is_active) VALUES (?, ?, 'x', 'aprovador', 1)",
+            [(uid, f"aprovador{uid}") for uid in approver_ids]
+        )
+    return approver_ids
+
+
+def _check(conn, expected_orders, items, approvers):
+    """Retorna a lista de inconsistências encontradas (vazia se tudo estiver certo)."""
+    problems = []
+    orders, distinct_numbers = conn.execute("SELECT COUNT(*), COUNT(DISTINCT po_number) FROM purchase_orders").fetchone()
+    if orders != expected_orders:
+        problems.append(f"{orders} pedidos gravados, esperados {expected_orders}")
+    if distinct_numbers != orders:
+        problems.append(f"{orders - distinct_numbers} números de pedido repetidos")
+    item_count = conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0]
+    if item_count != expected_orders * items:
+        problems.append(f"{item_count} itens gravados, esperados {expected_orders * items}")
+    decisions = conn.execute("SELECT COUNT(*) FROM approvals").fetchone()[0]
+    if decisions != expected_orders * approvers:
+        problems.append(f"{decisions} decisões gravadas, esperadas {expected_orders * approvers}")
+    not_approved = conn.execute("SELECT COUNT(*) FROM purchase_orders WHERE status != 'aprovado'").fetchone()[0]
+    if not_approved:
+        problems.append(f"{not_approved} pedidos não aprovados após todos os aprovadores decidirem")
+    # Uma notificação para os aprovadores e uma ao solicitante por pedido
+    notifications = conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0]
+    if notifications != expected_orders * 2:
+        problems.append(f"{notifications} notificações, esperadas {expected_orders * 2}")
+    return problems
+
+
+def _scenario(mode, args):
+    """Roda um modo em um banco novo, em um processo à parte para começar sem pool nem fila."""
+    os.environ['COMPRAS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), f'stress_{mode}.db')
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        approver_ids = pool.apply(_prepare, (args.approvers,))
+    with context.Pool(args.processes) as pool:
+        results = pool.starmap(
+            _run_sessions,
+            [(mode, args.threads, args.orders, args.items, approver_ids)] * args.processes
+        )
+    with context.Pool(1) as pool:
+        total = args.processes * args.threads * args.orders
+        problems = pool.apply(_check_path, (total, args.items, args.approvers))
+    return results, problems
+
+
+def _check_path(expected_orders, items, approvers):
+    from database.connection import get_connection
+    return _check(get_connection(), expected_orders, items, approvers)
+
+
+def _latency(values):
+    values = sorted(values)
+    return f"p50 {values[len(values) // 2] * 1e3:6.2f} ms  p95 {values[int(len(values) * 0.95)] * 1e3:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=50, help="pedidos por thread")
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--approvers', type=int, default=3)
+    args = parser.parse_args()
+
+    sessions = args.processes * args.threads
+    print(f"{args.processes} processo(s) x {args.threads} sessões, {args.orders} pedidos por sessão "
+          f"({args.items} itens, {args.approvers} aprovadores cada)")
+    failed = False
+    for mode in ('direto', 'fila'):
+        results, problems = _scenario(mode, args)
+        seconds = max(result['seconds'] for result in results)
+        submits = [value for result in results for value in result['submit']]
+        decisions = [value for result in results for value in result['decide']]
+        writes = len(submits) + len(decisions)
+        print(f"\n  {mode}: {writes:,} gravações em {seconds:.2f} s ({writes / seconds:,.0f}/s, {sessions} sessões)")
+        print(f"    envio de pedido   {_latency(submits)}")
+        print(f"    decisão           {_latency(decisions)}")
+        if mode == 'fila':
+            batches = sum(result['queue']['batches'] for result in results)
+            largest = max(result['queue']['largest_batch'] for result in results)
+            print(f"    {batches:,} commits: {writes / batches:.1f} gravações por commit em média, no máximo {largest}")
+        if problems:
+            failed = True
+            print(f"    FALHA: {len(problems)} inconsistências")
+            for problem in problems[:20]:
+                print(f"      - {problem}")
+        else:
+            print("    OK: pedidos, itens, números, decisões e notificações conferem.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Suíte de benchmarks dos caminhos de acesso a dados usados pelas páginas.
+
+Para cada escala (quantidade de pedidos) gera um banco com benchmarks.datagen
+e mede, com a mediana e o p95 de várias execuções, o que as páginas rodam:
+a listagem de todos os pedidos e a do solicitante (antigos get_all_orders e
+get_user_orders), os detalhes de um pedido e a situação de aprovação dos
+pendentes (get_order_details e get_approvers_status, hoje em
+fetch_order_bundles), a fila de aprovação, a busca, handle_notifications,
+login_user e a geração de relatórios.
+
+Cada escala roda em um processo próprio (o pool de conexões é do processo).
+Os resultados vão para um arquivo JSON com o commit medido; com --compare, a
+execução é comparada com um JSON anterior e termina com código 1 se alguma
+operação ficar mais lenta que o limite.
+
+Uso: python -m benchmarks.suite [--scales 1000 100000 1000000] [--output resultados.json]
+                                [--compare anterior.json] [--data-dir DIR] [--repeat N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Colunas dos cartões da fila de aprovação (as mesmas da página 04)
+QUEUE_COLUMNS = ('id', 'requester', 'created_at', 'total_value', 'justification', 'supplier_name', 'supplier_cnpj', 'delivery_date')
+
+# Filtros vazios da listagem, como a página 01 os monta
+NO_FILTERS = {'status': None, 'user_id': None, 'supplier': None, 'date_from': None,
+              'date_to': None, 'min_value': None, 'max_value': None}
+
+# Diferenças abaixo disso (ms) não contam como regressão, por mais que a razão seja grande
+NOISE_FLOOR_MS = 0.5
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _operations(rng):
+    """
+    Retorna [(nome, função, leve)] com as operações medidas. Operações que não
+    são leves (relatórios) rodam menos vezes.
+    """
+    import streamlit as st
+    from auth.auth import login_user
+    from auth.utils import handle_notifications
+    from benchmarks.datagen import PASSWORD
+    from database import queries
+    from database.connection import fetch_all, get_connection
+    from database.notifications import fetch_unread, unread_count
+    from database.orders import fetch_order_bundles, list_orders
+    from database.search import search_orders
+    from database.summary import get_filtered_summary
+    from reports.export import export_orders
+
+    conn = get_connection()
+    max_order_id = conn.execute("SELECT MAX(id) FROM purchase_orders").fetchone()[0]
+    requester_id, requester = conn.execute(
+        "SELECT id, username FROM users WHERE role = 'Solicitante' ORDER BY id LIMIT 1"
+    ).fetchone()
+    approver_id = conn.execute("SELECT id FROM users WHERE role = 'aprovador' ORDER BY id LIMIT 1").fetchone()[0]
+    last_quarter = date.today() - timedelta(days=90)
+    last_month = date.today() - timedelta(days=30)
+
+    def dashboard(filters):
+        # Totais por status e a primeira página da lista, como na página 01
+        get_filtered_summary(filters)
+        return list_orders(limit=50, **filters)
+
+    def approvers_status():
+        pending, _ = list_orders(limit=50, **dict(NO_FILTERS, status='pendente'))
+        return fetch_order_bundles([order['id'] for order in pending])
+
+    def approval_queue():
+        # Fila em ordem de chegada, como na página 04 (os itens só são lidos quando um cartão é aberto)
+        return list_orders(limit=25, columns=QUEUE_COLUMNS, newest_first=False, status='pendente')
+
+    pending_ids = [row[0] for row in conn.execute("SELECT id FROM purchase_orders WHERE status = 'pendente' LIMIT 1000")]
+
+    def notifications(user_id, role):
+        st.session_state['logged_in'] = True
+        st.session_state['user_id'] = user_id
+        st.session_state['role'] = role
+        handle_notifications()
+
+    def unread_notifications(user_id, role):
+        # O que handle_notifications lê quando há notificações novas (o st.dialog só
+        # funciona dentro do 'streamlit run')
+        return unread_count(user_id, role) and fetch_unread(user_id, role)
+
+    def report(fmt, filters, include_items=False):
+        export_orders(fmt, filters, include_items).close()
+
+    return [
+        ('get_all_orders', lambda: dashboard(NO_FILTERS), True),
+        ('get_user_orders', lambda: dashboard(dict(NO_FILTERS, user_id=requester_id)), True),
+        ('filtered_orders', lambda: dashboard(dict(NO_FILTERS, status='aprovado', supplier='Kalunga',
+                                                   date_from=last_quarter)), True),
+        ('get_order_details', lambda: fetch_order_bundles([rng.randint(1, max_order_id)]), True),
+        ('get_approvers_status', approvers_status, True),
+        ('approval_queue', approval_queue, True),
+        # Abrir um cartão (leitura sem o cache de itens)
+        ('approval_card_items', lambda: fetch_all(queries.PENDING_ORDER_ITEMS, (rng.choice(pending_ids),)), True),
+        ('search_orders', lambda: search_orders('toner', limit=50), True),
+        ('handle_notifications_idle', lambda: notifications(approver_id, 'aprovador'), True),
+        ('handle_notifications_unread', lambda: unread_notifications(requester_id, 'Solicitante'), True),
+        ('login_user', lambda: login_user(requester, PASSWORD), True),
+        ('report_csv_all', lambda: report('csv', NO_FILTERS), False),
+        ('report_html_month', lambda: report('html', dict(NO_FILTERS, date_from=last_month)), False),
+        ('report_xlsx_month', lambda: report('xlsx', dict(NO_FILTERS, date_from=last_month)), False),
+        ('report_csv_month_items', lambda: report('csv', dict(NO_FILTERS, date_from=last_month), True), False),
+    ]
+
+
+def _time(func, runs):
+    """Executa uma vez para aquecer e depois mede runs execuções (ms)."""
+    func()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e3)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+        'runs': runs,
+    }
+
+
+def _measure_scale(orders, db_path, items_per_order, repeat, seed):
+    """Executado em um processo próprio: gera (ou reaproveita) o banco e mede as operações."""
+    # O caminho precisa ser definido antes de importar o pacote 'database'
+    os.environ['COMPRAS_DB_PATH'] = db_path
+    from streamlit.logger import set_log_level
+    from benchmarks.datagen import generate
+    from database.connection import fetch_all, get_connection
+    from database.migrations import migrate
+
+    # Fora do 'streamlit run', cada acesso ao session_state gera um aviso
+    set_log_level('error')
+
+    result = {'orders': orders, 'generation_seconds': None}
+    if os.path.exists(db_path):
+        migrate()
+    else:
+        start = time.perf_counter()
+        generate(orders, items_per_order, seed=seed)
+        result['generation_seconds'] = round(time.perf_counter() - start, 2)
+    result['rows'] = {
+        table: get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ('users', 'purchase_orders', 'order_items', 'approvals', 'notifications')
+    }
+    result['db_size_mb'] = round(os.path.getsize(db_path) / 1024 / 1024, 1)
+
+    result['operations'] = {}
+    for name, func, light in _operations(random.Random(seed)):
+        result['operations'][name] = _time(func, repeat if light else max(3, repeat // 10))
+        print(f"  [{orders:,}] {name:<28} {result['operations'][name]['median_ms']:10.2f} ms", flush=True)
+    return result
+
+
+def compare(previous, current, threshold):
+    """
+    Compara duas execuções (dicionários no formato do JSON de saída) e retorna
+    as linhas do relatório e a lista de regressões (mediana acima do limite).
+    """
+    lines, regressions = [], []
+    previous_scales = {scale['orders']: scale for scale in previous['scales']}
+    for scale in current['scales']:
+        before = previous_scales.get(scale['orders'])
+        if before is None:
+            continue
+        lines.append(f"\n{scale['orders']:,} pedidos ({previous.get('commit')} -> {current.get('commit')}):")
+        for name, stats in scale['operations'].items():
+            old = before['operations'].get(name)
+            if old is None:
+                continue
+            ratio = stats['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+            regressed = ratio > threshold and stats['median_ms'] - old['median_ms'] > NOISE_FLOOR_MS
+            if regressed:
+                regressions.append((scale['orders'], name, ratio))
+            lines.append(f"  {name:<28} {old['median_ms']:10.2f} -> {stats['median_ms']:10.2f} ms "
+                         f"({ratio:5.2f}x){'  REGRESSÃO' if regressed else ''}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1_000, 100_000],
+                        help="quantidades de pedidos (ex.: 1000 100000 1000000)")
+    parser.add_argument('--items-per-order', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help="guarda os bancos gerados aqui e os reaproveita nas próximas execuções")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="JSON de uma execução anterior")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="razão entre medianas a partir da qual uma operação é regressão")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+
+    results = {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'parameters': {'items_per_order': args.items_per_order, 'repeat': args.repeat, 'seed': args.seed},
+        'scales': [],
+    }
+    context = multiprocessing.get_context('spawn')
+    for orders in args.scales:
+        db_path = os.path.join(data_dir, f"compras_{orders}_{args.items_per_order}_{args.seed}.db")
+        print(f"\n{orders:,} pedidos ({db_path}):", flush=True)
+        with context.Pool(1) as pool:
+            results['scales'].append(pool.apply(
+                _measure_scale, (orders, db_path, args.items_per_order, args.repeat, args.seed)
+            ))
+
+    with open(args.output, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fp:
+            lines, regressions = compare(json.load(fp), results, args.threshold)
+        print('\n'.join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.2f}x.")
+            sys.exit(1)
+        print("\nNenhuma regressão.")
+
+
+if __name__ == '__main__':
+    main()
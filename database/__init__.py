@@ -0,0 +1,2 @@
+# Pacote de acesso a dados do sistema de compras.
+# Centraliza o pool de conexões SQLite e as funções de esquema.
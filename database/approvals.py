@@ -0,0 +1,120 @@
+"""
+Registro das decisões de aprovação.
+
+Cada pedido guarda o quórum (required_approvals) e os contadores de decisões
+(approvals_count, rejections_count). Uma decisão é registrada com um INSERT
+protegido pelo índice único (order_id, user_id) e um único UPDATE condicional
+no pedido, tudo dentro da mesma transação BEGIN IMMEDIATE: o custo por clique
+é constante e só uma decisão consegue mudar o status de 'pendente', mesmo com
+vários aprovadores clicando ao mesmo tempo.
+
+A decisão em lote (record_decisions) faz o mesmo para muitos pedidos de uma
+vez: um INSERT ... SELECT e um UPDATE sobre a lista de ids (json_each) e as
+notificações dos solicitantes em um único executemany, na mesma transação.
+"""
+import json
+
+from database.connection import write_transaction
+from database.notifications import notify_user, notify_users
+
+APPROVED = 'aprovado'
+REJECTED = 'rejeitado'
+PENDING = 'pendente'
+
+# Mensagem enviada ao solicitante quando o pedido sai de 'pendente'
+REQUESTER_MESSAGES = {
+    APPROVED: "Seu pedido de compra #{order_id} foi APROVADO e liberado para compra.",
+    REJECTED: "Seu pedido de compra #{order_id} foi REPROVADO.",
+}
+
+_RECORD_DECISION = """
+    INSERT INTO approvals (order_id, user_id, status) VALUES (?, ?, ?)
+    ON CONFLICT (order_id, user_id) DO NOTHING
+"""
+
+# Uma rejeição encerra o pedido; a aprovação que atinge o quórum o aprova
+_DECISION_UPDATE = """
+    UPDATE purchase_orders SET
+        approvals_count = approvals_count + :approved,
+        rejections_count = rejections_count + (1 - :approved),
+        status = CASE
+            WHEN :approved = 0 THEN 'rejeitado'
+            WHEN approvals_count + 1 >= COALESCE(required_approvals, 1) THEN 'aprovado'
+            ELSE status
+        END
+"""
+
+_APPLY_DECISION = _DECISION_UPDATE + """
+    WHERE id = :order_id AND status = 'pendente'
+    RETURNING status, user_id
+"""
+
+# Em lote: só os pedidos ainda pendentes sobre os quais o usuário não decidiu
+_RECORD_DECISIONS = """
+    INSERT INTO approvals (order_id, user_id, status)
+    SELECT id, :user_id, :decision FROM purchase_orders
+    WHERE id IN (SELECT value FROM json_each(:order_ids)) AND status = 'pendente'
+    ON CONFLICT (order_id, user_id) DO NOTHING
+    RETURNING order_id
+"""
+
+_APPLY_DECISIONS = _DECISION_UPDATE + """
+    WHERE id IN (SELECT value FROM json_each(:order_ids)) AND status = 'pendente'
+    RETURNING id, status, user_id
+"""
+
+
+def record_decision(order_id, user_id, approved):
+    """
+    Registra a aprovação (approved=True) ou reprovação de um pedido pelo usuário
+    e retorna o status do pedido após a decisão.
+
+    Lança ValueError se o usuário já decidiu sobre o pedido ou se o pedido não
+    está mais pendente; nesses casos nada é gravado.
+    """
+    with write_transaction() as conn:
+        inserted = conn.execute(
+            _RECORD_DECISION, (order_id, user_id, APPROVED if approved else REJECTED)
+        ).rowcount
+        if not inserted:
+            raise ValueError(f"Você já processou o pedido #{order_id}.")
+
+        rows = conn.execute(
+            _APPLY_DECISION, {'approved': 1 if approved else 0, 'order_id': order_id}
+        ).fetchall()
+        if not rows:
+            # A exceção desfaz o INSERT da decisão junto com a transação
+            raise ValueError(f"O pedido #{order_id} não está mais pendente.")
+
+        new_status, requester_id = rows[0]
+        if new_status != PENDING and requester_id is not None:
+            notify_user(conn, requester_id, REQUESTER_MESSAGES[new_status].format(order_id=order_id))
+    return new_status
+
+
+def record_decisions(order_ids, user_id, approved):
+    """
+    Registra a mesma decisão do usuário sobre vários pedidos, em uma transação.
+
+    Pedidos que não estão mais pendentes ou sobre os quais o usuário já decidiu
+    são ignorados (não há exceção por pedido). Retorna {order_id: status após a
+    decisão} só dos pedidos em que a decisão foi registrada.
+    """
+    decision = APPROVED if approved else REJECTED
+    with write_transaction() as conn:
+        inserted = [row[0] for row in conn.execute(_RECORD_DECISIONS, {
+            'order_ids': json.dumps([int(order_id) for order_id in order_ids]),
+            'user_id': user_id, 'decision': decision,
+        })]
+        if not inserted:
+            return {}
+
+        rows = conn.execute(
+            _APPLY_DECISIONS, {'approved': 1 if approved else 0, 'order_ids': json.dumps(inserted)}
+        ).fetchall()
+        notify_users(conn, [
+            (requester_id, REQUESTER_MESSAGES[new_status].format(order_id=order_id))
+            for order_id, new_status, requester_id in rows
+            if new_status != PENDING and requester_id is not None
+        ])
+    return {order_id: new_status for order_id, new_status, _ in rows}
@@ -0,0 +1,301 @@
+"""
+Arquivamento dos pedidos encerrados (banco quente e arquivo frio).
+
+Pedidos aprovados ou rejeitados cuja última decisão tem mais de
+ARCHIVE_AFTER_MONTHS meses saem de compras.db, com seus itens e aprovações,
+para um segundo arquivo (ARCHIVE_PATH), anexado a todas as conexões do pool
+como o esquema 'archive'. O banco quente fica só com o que ainda está em uso:
+as páginas, os índices e os backups diários não pagam pelo histórico.
+
+A mudança é feita em lotes de ARCHIVE_BATCH_ORDERS pedidos, cada um em duas
+transações curtas: a cópia para o arquivo (marcada com o número do lote) e a
+exclusão no banco quente, que libera o lote em archive_state.visible_batch.
+Em WAL, uma transação não é atômica entre dois arquivos; por isso as leituras
+do arquivo só enxergam lotes já liberados, e lotes copiados e nunca liberados
+(execução interrompida ou backup do banco quente restaurado, que ainda tem
+esses pedidos) são descartados do arquivo na execução seguinte.
+
+As exclusões do arquivamento não disparam as triggers de agregados nem de
+eventos (archive_state.moving): para o painel, os pedidos continuam
+existindo. A listagem, a busca, os totais com filtro e o relatório só
+consultam o arquivo quando o período pedido começa antes do pedido arquivado
+mais recente (order_sources). Após cada execução que move pedidos, o arquivo
+ganha um snapshot próprio em BACKUP_DIR (prefixo ARCHIVE_SNAPSHOT_PREFIX).
+
+Uso: python -m database.archive [run | status]
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from database import queries
+from database.connection import ARCHIVE_PATH, DB_PATH, get_connection, get_pool, write_transaction
+from database.scheduler import ensure_job_started
+
+# Meses desde a última decisão para um pedido encerrado ir para o arquivo
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('COMPRAS_ARCHIVE_AFTER_MONTHS', 12))
+
+# Pedidos movidos por lote e pausa entre lotes (libera o banco para escritas)
+ARCHIVE_BATCH_ORDERS = 50
+BATCH_PAUSE_SECONDS = 0.005
+
+# Intervalo entre execuções automáticas
+ARCHIVE_INTERVAL_SECONDS = 24 * 60 * 60
+
+ARCHIVE_SNAPSHOT_PREFIX = 'arquivo_'
+
+CLOSED_STATUSES = ('aprovado', 'reprovado', 'rejeitado')
+
+# Esquemas consultados pelas leituras de pedidos
+HOT = ('main',)
+HOT_AND_ARCHIVE = ('main', 'archive')
+
+# Tabelas levadas para o arquivo e a coluna que as liga ao pedido
+ARCHIVED_TABLES = (('purchase_orders', 'id'), ('order_items', 'order_id'), ('approvals', 'order_id'))
+
+# Índices de busca do arquivo: (índice FTS, tabela de conteúdo, colunas, coluna do pedido)
+_SEARCH_INDEXES = (
+    ('orders_fts', 'purchase_orders', 'justification, supplier_name, supplier_cnpj', 'id'),
+    ('items_fts', 'order_items', 'description', 'order_id'),
+)
+
+# Definições do banco quente reaproveitadas no arquivo (sqlite_master guarda o
+# CREATE sem IF NOT EXISTS e sem o nome do esquema)
+_MIRRORED_OBJECTS = f"""
+    SELECT sql FROM main.sqlite_master
+    WHERE sql IS NOT NULL AND (
+        (type = 'index' AND tbl_name IN ({', '.join(f"'{table}'" for table, _ in ARCHIVED_TABLES)}))
+        OR name IN ({', '.join(f"'{fts}'" for fts, *_ in _SEARCH_INDEXES)})
+    )
+"""
+_CREATE_PREFIX = re.compile(r'^(CREATE (?:UNIQUE )?INDEX|CREATE VIRTUAL TABLE) ')
+
+# Pedidos encerrados antes do prazo (a última decisão, ou a criação se não houver decisões)
+_ARCHIVABLE_ORDERS = f"""
+    SELECT id, created_at FROM purchase_orders o
+    WHERE id > ? AND status IN ({', '.join(f"'{status}'" for status in CLOSED_STATUSES)})
+      AND created_at < datetime('now', ?)
+      AND COALESCE((SELECT MAX(approved_at) FROM approvals a WHERE a.order_id = o.id), created_at) < datetime('now', ?)
+    ORDER BY id LIMIT ?
+"""
+
+# Resultado da última execução, exibido no painel do administrador
+_last_run = {}
+_run_lock = threading.Lock()
+
+
+def archive_horizon(conn=None):
+    """Data de criação do pedido arquivado mais recente, ou None se nada foi arquivado."""
+    conn = conn or get_connection()
+    try:
+        row = conn.execute(queries.ARCHIVE_HORIZON).fetchone()
+    except sqlite3.OperationalError:
+        # Banco ainda sem a migração 13 (archive_state)
+        return None
+    return row[0] if row else None
+
+
+def order_sources(date_from=None, conn=None):
+    """
+    Esquemas que uma leitura de pedidos criados a partir de date_from (date ou
+    None) precisa consultar: só o banco quente (HOT) ou também o arquivo.
+    """
+    horizon = archive_horizon(conn)
+    if horizon is None or (date_from is not None and date_from.isoformat() > horizon):
+        return HOT
+    return HOT_AND_ARCHIVE
+
+
+def visible_clauses(schema):
+    """Condições extras da leitura de pedidos no esquema: no arquivo, só os lotes já liberados."""
+    if schema != 'archive':
+        return []
+    return ["archive_batch <= (SELECT visible_batch FROM main.archive_state WHERE id = 1)"]
+
+
+def _columns(conn, schema, table):
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def ensure_archive_schema(conn):
+    """
+    Cria no arquivo as tabelas, os índices e a busca textual dos pedidos, com
+    as mesmas colunas do banco quente (colunas novas são acrescentadas) e o
+    número do lote em archive_batch. Deve rodar em transação de escrita.
+    """
+    for table, _ in ARCHIVED_TABLES:
+        archived = {name for name, _ in _columns(conn, 'archive', table)}
+        if not archived:
+            definitions = ', '.join(
+                f"{name} INTEGER PRIMARY KEY" if name == 'id' else f"{name} {declared}"
+                for name, declared in _columns(conn, 'main', table)
+            )
+            conn.execute(f"CREATE TABLE archive.{table} ({definitions}, archive_batch INTEGER NOT NULL)")
+            conn.execute(f"CREATE INDEX archive.idx_{table}_archive_batch ON {table} (archive_batch)")
+            continue
+        for name, declared in _columns(conn, 'main', table):
+            if name not in archived:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {declared}")
+    for (sql,) in conn.execute(_MIRRORED_OBJECTS).fetchall():
+        conn.execute(_CREATE_PREFIX.sub(r'\1 IF NOT EXISTS archive.', sql, count=1))
+
+
+def _discard_unreleased_batches(conn):
+    """
+    Apaga do arquivo os lotes copiados e nunca liberados. Retorna
+    (pedidos descartados, último lote liberado).
+    """
+    visible = conn.execute("SELECT visible_batch FROM archive_state WHERE id = 1").fetchone()[0]
+    for fts, table, columns, _ in _SEARCH_INDEXES:
+        conn.execute(f"""
+            INSERT INTO archive.{fts} ({fts}, rowid, {columns})
+            SELECT 'delete', id, {columns} FROM archive.{table} WHERE archive_batch > ?
+        """, (visible,))
+    discarded = {
+        table: conn.execute(f"DELETE FROM archive.{table} WHERE archive_batch > ?", (visible,)).rowcount
+        for table, _ in ARCHIVED_TABLES
+    }
+    return discarded['purchase_orders'], visible
+
+
+def _copy_batch(conn, batch, ids_param):
+    """Copia para o arquivo os pedidos do lote, com itens, aprovações e busca. Retorna {tabela: linhas}."""
+    copied = {}
+    for table, key in ARCHIVED_TABLES:
+        columns = ', '.join(name for name, _ in _columns(conn, 'main', table))
+        copied[table] = conn.execute(f"""
+            INSERT INTO archive.{table} ({columns}, archive_batch)
+            SELECT {columns}, ? FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))
+        """, (batch, ids_param)).rowcount
+    for fts, table, columns, key in _SEARCH_INDEXES:
+        conn.execute(f"""
+            INSERT INTO archive.{fts} (rowid, {columns})
+            SELECT id, {columns} FROM archive.{table} WHERE {key} IN (SELECT value FROM json_each(?))
+        """, (ids_param,))
+    return copied
+
+
+def _release_batch(conn, batch, ids_param, order_count, newest_created_at):
+    """Apaga o lote do banco quente e o libera para as leituras do arquivo."""
+    conn.execute("UPDATE archive_state SET moving = 1 WHERE id = 1")
+    for table, key in ARCHIVED_TABLES:
+        conn.execute(f"DELETE FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))", (ids_param,))
+    conn.execute("""
+        UPDATE archive_state SET
+            moving = 0,
+            visible_batch = ?,
+            archived_orders = archived_orders + ?,
+            newest_created_at = MAX(COALESCE(newest_created_at, ''), ?)
+        WHERE id = 1
+    """, (batch, order_count, newest_created_at))
+
+
+def archive_closed_orders(months=ARCHIVE_AFTER_MONTHS):
+    """
+    Move para o arquivo, em lotes, os pedidos encerrados há mais de 'months'
+    meses. Retorna ({tabela: linhas movidas}, pedidos descartados de uma
+    execução anterior interrompida).
+    """
+    with write_transaction() as conn:
+        ensure_archive_schema(conn)
+        discarded, batch = _discard_unreleased_batches(conn)
+
+    modifier = f'-{months} months'
+    moved = {table: 0 for table, _ in ARCHIVED_TABLES}
+    after = 0
+    while True:
+        # O lock de escrita fica retido entre a cópia e a exclusão do lote
+        with get_pool().writer_connection():
+            with write_transaction() as conn:
+                rows = conn.execute(_ARCHIVABLE_ORDERS, (after, modifier, modifier, ARCHIVE_BATCH_ORDERS)).fetchall()
+                if not rows:
+                    return moved, discarded
+                batch += 1
+                ids_param = json.dumps([order_id for order_id, _ in rows])
+                copied = _copy_batch(conn, batch, ids_param)
+            with write_transaction() as conn:
+                _release_batch(conn, batch, ids_param, len(rows), max(created_at for _, created_at in rows))
+        for table, count in copied.items():
+            moved[table] += count
+        after = rows[-1][0]
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def run_archival(months=ARCHIVE_AFTER_MONTHS):
+    """
+    Arquiva os pedidos encerrados, compacta o banco quente e, se algum pedido
+    foi movido, cria um snapshot do arquivo. Retorna o resumo da execução.
+    """
+    from database.backup import create_snapshot
+    from database.retention import compact
+
+    with _run_lock:
+        start = time.perf_counter()
+        size_before = _file_size(DB_PATH)
+        moved, discarded = archive_closed_orders(months)
+        if moved['purchase_orders']:
+            compact()
+            create_snapshot(source_path=ARCHIVE_PATH, prefix=ARCHIVE_SNAPSHOT_PREFIX)
+        result = {
+            'orders': moved['purchase_orders'],
+            'items': moved['order_items'],
+            'approvals': moved['approvals'],
+            'discarded': discarded,
+            'size_before': size_before,
+            'size_after': _file_size(DB_PATH),
+            'archive_size': _file_size(ARCHIVE_PATH),
+            'seconds': time.perf_counter() - start,
+            'finished_at': time.time(),
+        }
+        _last_run.clear()
+        _last_run.update(result)
+        return result
+
+
+def archive_status():
+    """Pedidos arquivados, criação do mais recente e tamanho dos dois arquivos."""
+    archived_orders, newest_created_at = get_connection().execute(
+        "SELECT archived_orders, newest_created_at FROM archive_state WHERE id = 1"
+    ).fetchone()
+    return {
+        'archived_orders': archived_orders,
+        'newest_created_at': newest_created_at,
+        'hot_size': _file_size(DB_PATH),
+        'archive_size': _file_size(ARCHIVE_PATH),
+    }
+
+
+def last_run():
+    """Resumo da última execução neste processo (vazio se ainda não rodou)."""
+    return dict(_last_run)
+
+
+def ensure_archive_schedule():
+    """Inicia (uma vez por processo) o arquivamento periódico."""
+    return ensure_job_started('archive', ARCHIVE_INTERVAL_SECONDS, run_archival)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    if command == 'run':
+        summary = run_archival()
+        print(f"Pedidos arquivados: {summary['orders']} ({summary['items']} itens, {summary['approvals']} aprovações)")
+        if summary['discarded']:
+            print(f"Pedidos de lotes interrompidos descartados do arquivo: {summary['discarded']}")
+        print(f"Banco quente: {summary['size_before'] / 1024:,.1f} KB -> {summary['size_after'] / 1024:,.1f} KB; "
+              f"arquivo: {summary['archive_size'] / 1024:,.1f} KB em {summary['seconds']:.2f} s")
+    elif command == 'status':
+        status = archive_status()
+        print(f"Pedidos arquivados: {status['archived_orders']} (mais recente criado em {status['newest_created_at'] or '-'})")
+        print(f"Banco quente: {status['hot_size'] / 1024:,.1f} KB; arquivo: {status['archive_size'] / 1024:,.1f} KB")
+    else:
+        print(__doc__)
+        sys.exit(1)
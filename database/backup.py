@@ -0,0 +1,186 @@
+"""
+Backups online do banco usando a API de backup do SQLite.
+
+As páginas são copiadas em um único passo, dentro de uma transação de leitura:
+no modo WAL ela não bloqueia as escritas, e a cópia é sempre uma imagem
+consistente do banco (uma cópia em vários passos recomeçaria do início a cada
+commit de outra conexão e, sob escritas frequentes, nunca terminaria). A cópia
+é verificada com PRAGMA integrity_check e então compactada em gzip de forma
+incremental. Os snapshots ficam em BACKUP_DIR, com rotação.
+
+Uso: python -m database.backup [snapshot | list | restore <arquivo>]
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from database.cache import invalidate_order_items, invalidate_users
+from database.connection import DB_PATH, get_pool
+from database.migrations import migrate
+from database.scheduler import ensure_job_started
+
+BACKUP_DIR = os.environ.get('COMPRAS_BACKUP_DIR', os.path.join(os.path.dirname(DB_PATH), 'backups'))
+
+# Quantos snapshots manter no disco
+KEEP_SNAPSHOTS = 7
+
+# Intervalo entre snapshots automáticos
+SNAPSHOT_INTERVAL_SECONDS = 24 * 60 * 60
+
+# Páginas copiadas por passo na restauração (o lock de escrita fica retido durante ela)
+PAGES_PER_STEP = 256
+
+SNAPSHOT_PREFIX = 'compras_'
+SNAPSHOT_SUFFIX = '.db.gz'
+
+# Evita dois snapshots simultâneos no mesmo processo
+_snapshot_lock = threading.Lock()
+
+
+def _integrity_ok(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def _compress(source_path, target_path):
+    """Compacta um arquivo em gzip lendo em blocos (sem carregá-lo inteiro na memória)."""
+    partial_path = target_path + '.part'
+    with open(source_path, 'rb') as source, gzip.open(partial_path, 'wb', compresslevel=6) as target:
+        shutil.copyfileobj(source, target, length=1024 * 1024)
+    os.replace(partial_path, target_path)
+
+
+def create_snapshot(backup_dir=None, keep=KEEP_SNAPSHOTS, source_path=None, prefix=SNAPSHOT_PREFIX):
+    """
+    Cria um snapshot compactado do banco e aplica a rotação. Retorna o caminho.
+
+    source_path e prefix permitem copiar outro arquivo com rotação própria
+    (o arquivo de pedidos arquivados, ver database/archive.py).
+    Lança RuntimeError se a cópia não passar no PRAGMA integrity_check.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    with _snapshot_lock:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        target_path = os.path.join(backup_dir, f"{prefix}{timestamp}{SNAPSHOT_SUFFIX}")
+        fd, copy_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+        os.close(fd)
+        try:
+            source = sqlite3.connect(source_path or DB_PATH)
+            target = sqlite3.connect(copy_path)
+            try:
+                # Um passo só: nenhum commit concorrente reinicia a cópia
+                source.backup(target, pages=-1)
+                # O snapshot é um arquivo único, sem depender de -wal/-shm
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+                source.close()
+
+            if not _integrity_ok(copy_path):
+                raise RuntimeError("A cópia do banco falhou na verificação de integridade.")
+            _compress(copy_path, target_path)
+        finally:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+        rotate_snapshots(backup_dir, keep, prefix)
+    return target_path
+
+
+def list_snapshots(backup_dir=None, prefix=SNAPSHOT_PREFIX):
+    """Retorna os snapshots existentes, do mais recente para o mais antigo, como dicionários."""
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backup_dir):
+        if name.startswith(prefix) and name.endswith(SNAPSHOT_SUFFIX):
+            path = os.path.join(backup_dir, name)
+            stat = os.stat(path)
+            snapshots.append({'name': name, 'path': path, 'size': stat.st_size,
+                              'created_at': datetime.fromtimestamp(stat.st_mtime)})
+    return sorted(snapshots, key=lambda snapshot: snapshot['name'], reverse=True)
+
+
+def latest_snapshot(backup_dir=None):
+    """Retorna o snapshot mais recente ou None."""
+    snapshots = list_snapshots(backup_dir)
+    return snapshots[0] if snapshots else None
+
+
+def rotate_snapshots(backup_dir=None, keep=KEEP_SNAPSHOTS, prefix=SNAPSHOT_PREFIX):
+    """Remove os snapshots mais antigos, mantendo os 'keep' mais recentes."""
+    for snapshot in list_snapshots(backup_dir, prefix)[keep:]:
+        os.remove(snapshot['path'])
+
+
+def restore_snapshot(snapshot_path):
+    """
+    Restaura um snapshot sobre o banco em uso.
+
+    O arquivo é descompactado e verificado com PRAGMA integrity_check antes de
+    qualquer alteração; só então as páginas são copiadas para o banco ativo,
+    com o lock de escrita do pool retido durante a cópia. Um snapshot de uma
+    versão anterior do esquema é migrado em seguida (a inicialização do
+    processo, que faria isso, já passou). O arquivo de pedidos arquivados não
+    muda: os lotes que o snapshot ainda tem no banco quente ficam invisíveis
+    nele e são descartados no próximo arquivamento.
+    """
+    fd, restored_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(snapshot_path) or '.')
+    os.close(fd)
+    try:
+        with gzip.open(snapshot_path, 'rb') as source, open(restored_path, 'wb') as target:
+            shutil.copyfileobj(source, target, length=1024 * 1024)
+        if not _integrity_ok(restored_path):
+            raise ValueError("O snapshot está corrompido e não foi restaurado.")
+
+        restored = sqlite3.connect(restored_path)
+        try:
+            with get_pool().writer_connection() as live:
+                restored.backup(live, pages=PAGES_PER_STEP)
+        finally:
+            restored.close()
+        migrate()
+        invalidate_users()
+        invalidate_order_items()
+    finally:
+        if os.path.exists(restored_path):
+            os.remove(restored_path)
+
+
+def _snapshot_if_due():
+    latest = latest_snapshot()
+    if latest is None or time.time() - latest['created_at'].timestamp() >= SNAPSHOT_INTERVAL_SECONDS:
+        create_snapshot()
+
+
+def ensure_backup_schedule():
+    """Inicia (uma vez por processo) a criação periódica de snapshots."""
+    # Verifica a cada hora se o último snapshot já venceu
+    return ensure_job_started('backup', 60 * 60, _snapshot_if_due)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'snapshot'
+    if command == 'snapshot':
+        print(f"Snapshot criado: {create_snapshot()}")
+    elif command == 'list':
+        for snapshot in list_snapshots():
+            print(f"{snapshot['name']}  {snapshot['size'] / 1024:.1f} KB")
+    elif command == 'restore' and len(sys.argv) > 2:
+        restore_snapshot(sys.argv[2])
+        print("Banco restaurado com sucesso.")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,130 @@
+"""
+Cache do processo para dados de referência (usuários, perfis, aprovadores e
+e-mails de destinatários) e para os itens dos pedidos.
+
+Esses dados mudam pouco e eram consultados a cada rerun ou a cada pedido. Os
+valores ficam em memória, compartilhados por todas as sessões, até expirar o
+TTL ou até uma escrita em 'users' chamar invalidate_users(). Os itens de um
+pedido não mudam depois de gravados; o cache deles tem tamanho limitado.
+"""
+import threading
+import time
+
+from database import queries
+from database.connection import fetch_all
+
+# Tempo máximo (segundos) que um valor fica no cache sem ser relido
+DEFAULT_TTL_SECONDS = 300
+
+# Pedidos cujos itens ficam em memória ao mesmo tempo
+ORDER_ITEMS_MAX_ENTRIES = 2000
+
+
+class TTLCache:
+    """
+    Cache chave -> valor com expiração e contadores de acertos/faltas. Com
+    max_entries, a entrada gravada há mais tempo sai quando o cache enche.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._values = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor da chave, chamando loader() se ausente ou expirado."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._values.pop(key, None)
+            if self.max_entries is not None and len(self._values) >= self.max_entries:
+                self._values.pop(next(iter(self._values)))
+            self._values[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Descarta as chaves informadas (ou todas, se nenhuma for informada)."""
+        with self._lock:
+            if keys:
+                for key in keys:
+                    self._values.pop(key, None)
+            else:
+                self._values.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._values),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+reference_cache = TTLCache()
+order_items_cache = TTLCache(max_entries=ORDER_ITEMS_MAX_ENTRIES)
+
+
+def _cached_query(key, query):
+    # Guarda tuplas: o valor é compartilhado entre sessões e não pode ser alterado
+    return reference_cache.get_or_load(key, lambda: tuple(fetch_all(query)))
+
+
+def get_all_users():
+    """Todos os usuários como (id, username, role, email, is_active)."""
+    return _cached_query('all_users', queries.ALL_USERS)
+
+
+def get_requesters():
+    """Lista de (id, username) ordenada pelo nome, para filtros."""
+    return _cached_query('requesters', queries.REQUESTERS)
+
+
+def get_active_approvers():
+    """Nomes dos aprovadores ativos."""
+    return tuple(row[0] for row in _cached_query('active_approvers', queries.ACTIVE_APPROVERS))
+
+
+def get_recipient_emails():
+    """E-mails dos aprovadores e administradores ativos que recebem cada pedido na hora."""
+    return tuple(row[0] for row in _cached_query('recipient_emails', queries.RECIPIENT_EMAILS))
+
+
+def get_digest_recipient_ids():
+    """Ids dos aprovadores e administradores ativos que recebem os novos pedidos no resumo periódico."""
+    return tuple(row[0] for row in _cached_query('digest_recipient_ids', queries.DIGEST_RECIPIENT_IDS))
+
+
+def get_order_items(order_id):
+    """Itens do pedido como (quantity, unit, description, unit_value, total_value)."""
+    order_id = int(order_id)
+    return order_items_cache.get_or_load(
+        order_id, lambda: tuple(fetch_all(queries.PENDING_ORDER_ITEMS, (order_id,)))
+    )
+
+
+def invalidate_order_items():
+    """Descarta os itens em cache (necessário quando o banco inteiro é substituído)."""
+    order_items_cache.invalidate()
+
+
+def invalidate_users():
+    """Deve ser chamada após qualquer escrita na tabela 'users'."""
+    reference_cache.invalidate()
+
+
+def cache_stats():
+    return reference_cache.stats()
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database.tracing import TracedConnection
+
+# Caminho do banco de dados (pode ser sobrescrito pela variável de ambiente)
+DB_PATH = os.environ.get('COMPRAS_DB_PATH', os.path.join('database', 'compras.db'))
+
+# Arquivo com os pedidos encerrados há muito tempo (ver database/archive.py),
+# anexado a todas as conexões como o esquema 'archive'
+ARCHIVE_PATH = os.environ.get('COMPRAS_ARCHIVE_PATH', os.path.splitext(DB_PATH)[0] + '_arquivo.db')
+
+# Tempo máximo (ms) que uma conexão espera por um lock antes de falhar
+BUSY_TIMEOUT_MS = 5000
+
+# Pragmas aplicados em toda conexão aberta pelo pool
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout = %d" % BUSY_TIMEOUT_MS,
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite do processo.
+
+    Cada thread recebe sua própria conexão de leitura; todas as escritas passam
+    por uma única conexão protegida por um lock, o que evita disputas pelo
+    lock do banco entre sessões do Streamlit. Toda conexão tem o arquivo de
+    pedidos arquivados anexado como 'archive'.
+    """
+
+    def __init__(self, path, archive_path):
+        self.path = path
+        self.archive_path = archive_path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+        self._wal_ready = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+            factory=TracedConnection,
+        )
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        with self._init_lock:
+            if not self._wal_ready:
+                # O modo WAL é persistente no arquivo: basta ativá-lo uma vez
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA archive.journal_mode = WAL")
+                self._wal_ready = True
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        # O arquivo é pouco lido: fica com o cache padrão
+        conn.execute("PRAGMA archive.synchronous = NORMAL")
+        return conn
+
+    def reader(self):
+        """Retorna a conexão de leitura da thread atual (criada sob demanda)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def write(self):
+        """
+        Abre uma transação de escrita serializada (BEGIN IMMEDIATE).
+
+        Faz commit ao sair do bloco ou rollback em caso de exceção. Chamadas
+        aninhadas na mesma thread reaproveitam a transação já aberta.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                # O SQLite pode já ter desfeito a transação (ex.: disco cheio):
+                # um ROLLBACK aqui falharia e esconderia o erro original
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def writer_connection(self):
+        """
+        Entrega a conexão de escrita fora de transação, com o lock de escrita
+        retido. Usada em manutenção (restauração de backup, VACUUM), que não
+        pode rodar dentro de BEGIN.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            yield self._writer
+
+    def data_version(self):
+        """
+        Retorna o PRAGMA data_version de uma conexão dedicada que nunca escreve.
+
+        O valor muda sempre que qualquer outra conexão (deste ou de outro
+        processo) faz commit, servindo como carimbo barato para invalidar caches.
+        """
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = self._connect()
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """Fecha as conexões de escrita e de monitoramento e a de leitura da thread atual."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._monitor_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool de conexões compartilhado pelo processo."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, ARCHIVE_PATH)
+    return _pool
+
+
+def get_connection():
+    """Atalho para a conexão de leitura da thread atual."""
+    return get_pool().reader()
+
+
+def write_transaction():
+    """Atalho para abrir uma transação de escrita no pool compartilhado."""
+    return get_pool().write()
+
+
+@contextmanager
+def read_snapshot():
+    """
+    Agrupa leituras da thread atual em uma transação de leitura: todas veem o
+    mesmo estado do banco, mesmo que outra conexão faça commit no meio.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+
+def fetch_all(query, params=()):
+    """Executa uma consulta de leitura e retorna todas as linhas."""
+    return get_connection().execute(query, params).fetchall()
+
+
+def fetch_one(query, params=()):
+    """Executa uma consulta de leitura e retorna a primeira linha (ou None)."""
+    return get_connection().execute(query, params).fetchone()
@@ -0,0 +1,103 @@
+"""
+Registro de mudanças dos pedidos (order_events) e atualização incremental.
+
+As triggers da migração 10 acrescentam uma linha a cada pedido criado,
+decidido (aprovado, rejeitado ou decisão parcial), editado ou excluído, com o
+status e o valor antes e depois. Os ids só crescem, então quem guarda o
+último id visto lê apenas o que mudou depois dele: sem mudanças, cada
+verificação é uma leitura pela chave primária que não devolve nada.
+
+patch_summary, patch_order_rows e patch_order_page aplicam os eventos aos
+totais e às linhas já carregados por uma página, em vez de recalcular tudo a
+cada atualização.
+"""
+from database import queries
+from database.connection import get_connection
+from database.orders import fetch_orders_by_ids, order_matches
+
+# Eventos lidos por verificação; acima disso a página recarrega tudo
+MAX_EVENTS_PER_READ = 1000
+
+
+def latest_event_id():
+    """Id do último evento registrado (0 se não houver nenhum)."""
+    return get_connection().execute(queries.LATEST_ORDER_EVENT).fetchone()[0]
+
+
+def fetch_events_since(last_id, limit=MAX_EVENTS_PER_READ):
+    """Eventos com id maior que last_id, em ordem, como dicionários."""
+    cursor = get_connection().execute(queries.ORDER_EVENTS_SINCE, (last_id, limit))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _versions(event):
+    """Versões do pedido antes e depois do evento (None quando não existia ou foi excluído)."""
+    common = {'user_id': event['user_id'], 'created_at': event['order_created_at']}
+    before = after = None
+    if event['event'] != 'criado':
+        before = dict(common, status=event['old_status'], total_value=event['old_value'])
+    if event['event'] != 'excluido':
+        after = dict(common, status=event['new_status'], total_value=event['new_value'])
+    return before, after
+
+
+def patch_summary(summary, events, filters):
+    """
+    Aplica os eventos a um resumo {status: {'count': n, 'total_value': v}}
+    calculado com os filtros informados e retorna o resumo atualizado.
+
+    Retorna None quando os eventos não bastam para o cálculo (filtro de
+    fornecedor, cujas colunas não constam nos eventos); a página então
+    recalcula o resumo.
+    """
+    if filters.get('supplier'):
+        return None
+    patched = {status: dict(values) for status, values in summary.items()}
+    for event in events:
+        for version, sign in zip(_versions(event), (-1, 1)):
+            if version is None or not order_matches(version, **filters):
+                continue
+            values = patched.setdefault(version['status'], {'count': 0, 'total_value': 0.0})
+            values['count'] += sign
+            values['total_value'] += sign * (version['total_value'] or 0)
+    return {status: values for status, values in patched.items() if values['count']}
+
+
+def patch_order_rows(rows, events, columns, newest_first=True, include_new=True, **filters):
+    """
+    Atualiza uma página de pedidos já carregada: as linhas de pedidos que
+    mudaram são relidas em uma consulta só (e saem da página se não atendem
+    mais aos filtros); com include_new, os pedidos criados que atendem aos
+    filtros entram na página na posição da ordenação.
+    """
+    changed = {event['order_id'] for event in events}
+    shown = {row['id'] for row in rows}
+    created = {event['order_id'] for event in events if event['event'] == 'criado'} - shown
+    wanted = (changed & shown) | (created if include_new else set())
+    current = fetch_orders_by_ids(sorted(wanted), columns, **filters)
+
+    patched = [current.get(row['id']) if row['id'] in changed else row for row in rows]
+    patched = [row for row in patched if row is not None]
+    if include_new:
+        added = [current[order_id] for order_id in sorted(created) if order_id in current]
+        if added:
+            patched.extend(added)
+            patched.sort(key=lambda row: (row['created_at'], row['id']), reverse=newest_first)
+    return patched
+
+
+def patch_order_page(frame, events, columns, limit, newest_first=True, include_new=True, **filters):
+    """
+    Atualiza uma página paginada por cursor, (linhas, proximo_cursor), como
+    list_orders a retorna. Os pedidos novos que entram na página empurram os
+    últimos para a página seguinte: a página volta a ter no máximo 'limit'
+    linhas e o cursor passa a ser a nova última linha, para que a próxima
+    página comece logo depois dela (sem pular nem repetir pedidos).
+    """
+    rows, next_cursor = frame
+    rows = patch_order_rows(rows, events, columns, newest_first, include_new, **filters)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
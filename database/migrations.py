@@ -0,0 +1,635 @@
+from database.connection import write_transaction
+
+# --- Passos de migração ---
+# Cada passo recebe a conexão de escrita e roda dentro da mesma transação que
+# registra a versão em 'schema_version': ou o passo inteiro é aplicado, ou nada.
+
+
+def _create_base_tables(conn):
+    """Cria as tabelas originais do sistema (sem efeito em bancos já existentes)."""
+    cursor = conn.cursor()
+
+    # Tabela de usuários
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            email TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+
+    # Tabela de pedidos de compra
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS purchase_orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            requester TEXT NOT NULL,
+            po_number TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_value REAL,
+            justification TEXT,
+            spreadsheet_link TEXT,
+            supplier_name TEXT,
+            supplier_cnpj TEXT,
+            supplier_contact TEXT,
+            payment_method TEXT,
+            bank_details TEXT,
+            delivery_date TEXT,
+            due_date TEXT,
+            delivery_address TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Tabela de itens do pedido
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            quantity INTEGER NOT NULL,
+            unit TEXT NOT NULL,
+            description TEXT NOT NULL,
+            unit_value REAL NOT NULL,
+            total_value REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES purchase_orders (id)
+        )
+    """)
+
+    # Tabela de aprovações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS approvals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            user_id INTEGER,
+            status TEXT NOT NULL,
+            comments TEXT,
+            approved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES purchase_orders (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Tabela de notificações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            message TEXT NOT NULL,
+            is_read INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+
+def _create_hot_path_indexes(conn):
+    """Cria os índices usados pelas consultas das páginas."""
+    statements = (
+        # Lista geral e lista por solicitante, ordenadas por data
+        "CREATE INDEX IF NOT EXISTS idx_purchase_orders_created ON purchase_orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_purchase_orders_user_created ON purchase_orders (user_id, created_at)",
+        # Fila de aprovação (status = 'pendente')
+        "CREATE INDEX IF NOT EXISTS idx_purchase_orders_status_created ON purchase_orders (status, created_at)",
+        # Itens de um pedido
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)",
+        # Notificações não lidas e histórico do usuário
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_read ON notifications (user_id, is_read)",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id)",
+        # Quem já aprovou um pedido (índice de cobertura)
+        "CREATE INDEX IF NOT EXISTS idx_approvals_order_status ON approvals (order_id, status, user_id)",
+        # Aprovadores ativos e destinatários de e-mail
+        "CREATE INDEX IF NOT EXISTS idx_users_role_active ON users (role, is_active, username)",
+    )
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _order_summary_delta(row, sign):
+    """Comando de trigger que soma (ou subtrai) o pedido 'row' (NEW ou OLD) aos agregados."""
+    # Cada pedido conta no escopo global ('all', 0) e no do solicitante ('user', user_id)
+    return f"""
+        INSERT INTO order_summary (scope, scope_id, status, order_count, total_value)
+        VALUES ('all', 0, {row}.status, {sign}1, {sign}COALESCE({row}.total_value, 0)),
+               ('user', COALESCE({row}.user_id, 0), {row}.status, {sign}1, {sign}COALESCE({row}.total_value, 0))
+        ON CONFLICT (scope, scope_id, status) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_value = total_value + excluded.total_value;
+    """
+
+
+def _create_order_summary(conn):
+    """Cria a tabela de agregados por status e as triggers que a mantêm atualizada."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS order_summary (
+            scope TEXT NOT NULL,
+            scope_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_value REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_id, status)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_summary_insert AFTER INSERT ON purchase_orders
+        BEGIN {_order_summary_delta('NEW', '+')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_summary_update
+        AFTER UPDATE OF status, total_value, user_id ON purchase_orders
+        BEGIN {_order_summary_delta('OLD', '-')} {_order_summary_delta('NEW', '+')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_summary_delete AFTER DELETE ON purchase_orders
+        BEGIN {_order_summary_delta('OLD', '-')} END
+    """)
+
+    from database.summary import rebuild_summary
+    rebuild_summary(conn)
+
+
+def _create_email_outbox(conn):
+    """Cria a fila de e-mails enviada em segundo plano pelo mailer."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            recipients TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body_html TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES purchase_orders (id)
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)"
+    )
+
+
+def _create_notification_counters(conn):
+    """Cria o contador de notificações não lidas por usuário, mantido por triggers."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notification_counters (
+            user_id INTEGER PRIMARY KEY,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    def apply_delta(user_id, delta):
+        return f"""
+            INSERT INTO notification_counters (user_id, unread_count, version)
+            SELECT {user_id}, {delta}, 1 WHERE {user_id} IS NOT NULL
+            ON CONFLICT (user_id) DO UPDATE SET
+                unread_count = unread_count + excluded.unread_count,
+                version = version + 1;
+        """
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_counters_insert
+        AFTER INSERT ON notifications WHEN NEW.is_read = 0
+        BEGIN {apply_delta('NEW.user_id', 1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_counters_update
+        AFTER UPDATE OF is_read, user_id ON notifications
+        WHEN OLD.is_read IS NOT NEW.is_read OR OLD.user_id IS NOT NEW.user_id
+        BEGIN
+            {apply_delta('OLD.user_id', "CASE WHEN OLD.is_read = 0 THEN -1 ELSE 0 END")}
+            {apply_delta('NEW.user_id', "CASE WHEN NEW.is_read = 0 THEN 1 ELSE 0 END")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_counters_delete
+        AFTER DELETE ON notifications WHEN OLD.is_read = 0
+        BEGIN {apply_delta('OLD.user_id', -1)} END
+    """)
+
+    conn.execute("DELETE FROM notification_counters")
+    conn.execute("""
+        INSERT INTO notification_counters (user_id, unread_count, version)
+        SELECT user_id, SUM(is_read = 0), 1 FROM notifications
+        WHERE user_id IS NOT NULL GROUP BY user_id
+    """)
+
+
+def _create_approval_counters(conn):
+    """Adiciona os contadores de decisões e o quórum ao pedido e impede decisões duplicadas."""
+    add_column(conn, 'purchase_orders', 'approvals_count', "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, 'purchase_orders', 'rejections_count', "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, 'purchase_orders', 'required_approvals', "INTEGER")
+
+    # Mantém apenas a primeira decisão de cada aprovador por pedido
+    conn.execute("""
+        DELETE FROM approvals WHERE id NOT IN (
+            SELECT MIN(id) FROM approvals GROUP BY order_id, user_id
+        )
+    """)
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_approvals_order_user ON approvals (order_id, user_id)"
+    )
+
+    # Preenche os contadores a partir das decisões já registradas; o quórum dos
+    # pedidos existentes passa a ser o número atual de aprovadores ativos
+    conn.execute("""
+        UPDATE purchase_orders SET
+            approvals_count = (SELECT COUNT(*) FROM approvals a WHERE a.order_id = purchase_orders.id AND a.status = 'aprovado'),
+            rejections_count = (SELECT COUNT(*) FROM approvals a WHERE a.order_id = purchase_orders.id AND a.status = 'rejeitado'),
+            required_approvals = (SELECT MAX(1, COUNT(*)) FROM users WHERE role = 'aprovador' AND is_active = 1)
+    """)
+
+
+def _create_po_sequences(conn):
+    """Cria a tabela de séries de numeração dos pedidos, continuando a numeração atual."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS po_sequences (
+            series TEXT PRIMARY KEY,
+            last_value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # Os números antigos eram o próximo id do pedido: a série padrão parte do maior já usado
+    conn.execute("""
+        INSERT OR IGNORE INTO po_sequences (series, last_value)
+        SELECT 'geral', MAX(
+            COALESCE((SELECT MAX(id) FROM purchase_orders), 0),
+            COALESCE((SELECT MAX(CAST(po_number AS INTEGER)) FROM purchase_orders WHERE po_number GLOB '[0-9]*'), 0)
+        )
+    """)
+
+
+def _create_po_number_index(conn):
+    """Índice do número do pedido, usado para detectar pedidos já importados."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_purchase_orders_po_number ON purchase_orders (po_number)")
+
+
+def _create_search_index(conn):
+    """Cria os índices de busca textual (FTS5) de pedidos e itens e os preenche."""
+    # Índices de conteúdo externo: o texto fica só nas tabelas originais
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+            justification, supplier_name, supplier_cnpj,
+            content='purchase_orders', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            description,
+            content='order_items', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+
+    # Gravações em lote adiam a indexação e indexam tudo de uma vez no final
+    # (ver database.search.deferred_search_index)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_index_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            deferred INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO search_index_state (id, deferred) VALUES (1, 0)")
+    indexing_enabled = "(SELECT deferred FROM search_index_state WHERE id = 1) = 0"
+
+    order_columns = "justification, supplier_name, supplier_cnpj"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_insert AFTER INSERT ON purchase_orders
+        WHEN {indexing_enabled} BEGIN
+            INSERT INTO orders_fts (rowid, {order_columns})
+            VALUES (NEW.id, NEW.justification, NEW.supplier_name, NEW.supplier_cnpj);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_delete AFTER DELETE ON purchase_orders BEGIN
+            INSERT INTO orders_fts (orders_fts, rowid, {order_columns})
+            VALUES ('delete', OLD.id, OLD.justification, OLD.supplier_name, OLD.supplier_cnpj);
+        END
+    """)
+    # Só as colunas indexadas: mudanças de status e contadores não tocam o índice
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_update
+        AFTER UPDATE OF {order_columns} ON purchase_orders BEGIN
+            INSERT INTO orders_fts (orders_fts, rowid, {order_columns})
+            VALUES ('delete', OLD.id, OLD.justification, OLD.supplier_name, OLD.supplier_cnpj);
+            INSERT INTO orders_fts (rowid, {order_columns})
+            VALUES (NEW.id, NEW.justification, NEW.supplier_name, NEW.supplier_cnpj);
+        END
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON order_items
+        WHEN {indexing_enabled} BEGIN
+            INSERT INTO items_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON order_items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_update AFTER UPDATE OF description ON order_items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO items_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    """)
+
+    from database.search import rebuild_search_index
+    rebuild_search_index(conn)
+
+
+# Colunas gravadas pelas triggers de order_events e o evento de exclusão
+_ORDER_EVENT_COLUMNS = "order_id, event, user_id, order_created_at, old_status, new_status, old_value, new_value"
+_ORDER_DELETED_EVENT = f"""
+    INSERT INTO order_events ({_ORDER_EVENT_COLUMNS})
+    VALUES (OLD.id, 'excluido', OLD.user_id, OLD.created_at, OLD.status, NULL, OLD.total_value, NULL);
+"""
+
+
+def _create_order_events(conn):
+    """Cria o registro de mudanças dos pedidos (order_events) e as triggers que o alimentam."""
+    # AUTOINCREMENT: os ids só crescem e nunca são reaproveitados, mesmo após exclusões
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS order_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            user_id INTEGER,
+            order_created_at TIMESTAMP,
+            old_status TEXT,
+            new_status TEXT,
+            old_value REAL,
+            new_value REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_events_insert AFTER INSERT ON purchase_orders BEGIN
+            INSERT INTO order_events ({_ORDER_EVENT_COLUMNS})
+            VALUES (NEW.id, 'criado', NEW.user_id, NEW.created_at, NULL, NEW.status, NULL, NEW.total_value);
+        END
+    """)
+    # Mudança de status vira o próprio status ('aprovado', 'rejeitado'...); uma
+    # decisão que não muda o status é 'decisao'; o resto é 'editado'
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_events_update AFTER UPDATE ON purchase_orders BEGIN
+            INSERT INTO order_events ({_ORDER_EVENT_COLUMNS})
+            VALUES (
+                NEW.id,
+                CASE
+                    WHEN NEW.status IS NOT OLD.status THEN COALESCE(NEW.status, 'editado')
+                    WHEN NEW.approvals_count IS NOT OLD.approvals_count
+                      OR NEW.rejections_count IS NOT OLD.rejections_count THEN 'decisao'
+                    ELSE 'editado'
+                END,
+                NEW.user_id, NEW.created_at, OLD.status, NEW.status, OLD.total_value, NEW.total_value
+            );
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_events_delete AFTER DELETE ON purchase_orders BEGIN
+            {_ORDER_DELETED_EVENT}
+        END
+    """)
+
+
+def _create_email_digests(conn):
+    """Cria a preferência de entrega de e-mails por usuário e a fila dos resumos periódicos."""
+    # 'imediato': um e-mail por pedido; 'resumo': um e-mail a cada digest_minutes
+    add_column(conn, 'users', 'email_delivery', "TEXT NOT NULL DEFAULT 'imediato'")
+    add_column(conn, 'users', 'digest_minutes', "INTEGER NOT NULL DEFAULT 30")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS email_digest_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            order_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (order_id) REFERENCES purchase_orders (id)
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_digest_queue_user ON email_digest_queue (user_id, id)"
+    )
+
+
+def _create_notification_cursors(conn):
+    """
+    Troca a cópia da notificação por aprovador por uma mensagem única para o
+    papel (target_role) e o campo is_read por um cursor de leitura por usuário.
+
+    Lidas são as notificações com id até notification_cursors.last_read_id; as
+    mensagens para um papel só aparecem para o usuário a partir de
+    broadcast_from_id (quando ele foi criado ou passou a ter o papel).
+    """
+    add_column(conn, 'notifications', 'target_role', "TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notification_cursors (
+            user_id INTEGER PRIMARY KEY,
+            last_read_id INTEGER NOT NULL DEFAULT 0,
+            broadcast_from_id INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Cada aviso de novo pedido foi gravado uma vez por aprovador: a primeira
+    # cópia vira a mensagem do papel e as demais apontam para ela
+    conn.execute("""
+        CREATE TEMP TABLE notification_groups AS
+        SELECT id, MIN(id) OVER (PARTITION BY message) AS group_id, user_id, is_read
+        FROM notifications WHERE message LIKE 'Novo pedido de compra #%'
+    """)
+
+    # Cursor de cada usuário logo antes da primeira notificação não lida
+    # (contando a posição que a cópia dele terá depois de agrupada)
+    conn.execute("""
+        INSERT OR REPLACE INTO notification_cursors (user_id, last_read_id, broadcast_from_id)
+        SELECT u.id,
+               COALESCE(
+                   (SELECT MIN(COALESCE(g.group_id, n.id)) - 1 FROM notifications n
+                    LEFT JOIN notification_groups g ON g.id = n.id
+                    WHERE n.user_id = u.id AND n.is_read = 0),
+                   (SELECT COALESCE(MAX(id), 0) FROM notifications)
+               ),
+               COALESCE(
+                   (SELECT MIN(group_id) - 1 FROM notification_groups WHERE user_id = u.id),
+                   (SELECT COALESCE(MAX(id), 0) FROM notifications)
+               )
+        FROM users u
+    """)
+
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_notification_counters_{trigger}")
+    conn.execute("DROP TABLE IF EXISTS notification_counters")
+    conn.execute("""
+        UPDATE notifications SET user_id = NULL, target_role = 'aprovador'
+        WHERE id IN (SELECT group_id FROM notification_groups)
+    """)
+    conn.execute("""
+        DELETE FROM notifications
+        WHERE id IN (SELECT id FROM notification_groups WHERE id != group_id)
+    """)
+    conn.execute("DROP TABLE notification_groups")
+
+    conn.execute("DROP INDEX IF EXISTS idx_notifications_user_read")
+    conn.execute("ALTER TABLE notifications DROP COLUMN is_read")
+    # Notificações do usuário: idx_notifications_user (user_id) já ordena por id dentro do usuário
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_notifications_role ON notifications (target_role, id) WHERE target_role IS NOT NULL"
+    )
+
+    # Novos usuários (e quem muda de papel) só veem as mensagens do papel a partir de agora
+    latest = "(SELECT COALESCE(MAX(id), 0) FROM notifications)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_cursors_insert AFTER INSERT ON users BEGIN
+            INSERT OR REPLACE INTO notification_cursors (user_id, last_read_id, broadcast_from_id)
+            VALUES (NEW.id, {latest}, {latest});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_cursors_role AFTER UPDATE OF role ON users
+        WHEN OLD.role IS NOT NEW.role BEGIN
+            UPDATE notification_cursors SET broadcast_from_id = {latest} WHERE user_id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notification_cursors_delete AFTER DELETE ON users BEGIN
+            DELETE FROM notification_cursors WHERE user_id = OLD.id;
+        END
+    """)
+
+
+def _create_order_archive(conn):
+    """
+    Cria o estado do arquivamento de pedidos encerrados (database/archive.py)
+    e as tabelas do arquivo anexado, e faz as exclusões feitas pelo
+    arquivamento não contarem como exclusão de pedido.
+    """
+    # moving só vale 1 dentro da transação que apaga um lote já copiado;
+    # visible_batch é o último lote do arquivo liberado para as leituras
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            moving INTEGER NOT NULL DEFAULT 0,
+            visible_batch INTEGER NOT NULL DEFAULT 0,
+            archived_orders INTEGER NOT NULL DEFAULT 0,
+            newest_created_at TIMESTAMP
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO archive_state (id) VALUES (1)")
+
+    # Pedidos arquivados continuam nos agregados e não geram evento de exclusão
+    not_archiving = "(SELECT moving FROM archive_state WHERE id = 1) = 0"
+    conn.execute("DROP TRIGGER IF EXISTS trg_order_summary_delete")
+    conn.execute(f"""
+        CREATE TRIGGER trg_order_summary_delete AFTER DELETE ON purchase_orders
+        WHEN {not_archiving} BEGIN {_order_summary_delta('OLD', '-')} END
+    """)
+    conn.execute("DROP TRIGGER IF EXISTS trg_order_events_delete")
+    conn.execute(f"""
+        CREATE TRIGGER trg_order_events_delete AFTER DELETE ON purchase_orders
+        WHEN {not_archiving} BEGIN {_ORDER_DELETED_EVENT} END
+    """)
+
+    from database.archive import ensure_archive_schema
+    ensure_archive_schema(conn)
+
+
+# Lista ordenada de migrações: (versão, descrição, função)
+MIGRATIONS = [
+    (1, "Tabelas iniciais", _create_base_tables),
+    (2, "Índices para as consultas frequentes", _create_hot_path_indexes),
+    (3, "Agregados de pedidos por status e solicitante", _create_order_summary),
+    (4, "Fila de e-mails (outbox)", _create_email_outbox),
+    (5, "Contador de notificações não lidas", _create_notification_counters),
+    (6, "Contadores de aprovação e quórum por pedido", _create_approval_counters),
+    (7, "Séries de numeração dos pedidos", _create_po_sequences),
+    (8, "Índice do número do pedido", _create_po_number_index),
+    (9, "Busca textual em pedidos, itens e fornecedores", _create_search_index),
+    (10, "Registro de mudanças dos pedidos", _create_order_events),
+    (11, "Preferências de e-mail e fila de resumos", _create_email_digests),
+    (12, "Notificações por papel e cursor de leitura", _create_notification_cursors),
+    (13, "Arquivamento de pedidos encerrados", _create_order_archive),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# --- Utilitários para passos futuros ---
+
+def column_exists(conn, table, column):
+    """Verifica se uma coluna já existe em uma tabela."""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def add_column(conn, table, column, definition):
+    """Adiciona uma coluna preservando os dados existentes (idempotente)."""
+    if not column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# --- Motor de migração ---
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(conn):
+    """Retorna a versão do esquema registrada no banco (0 se nunca migrado)."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Aplica, em ordem, os passos ainda não registrados na conexão informada.
+
+    A conexão deve estar dentro de uma transação de escrita. Retorna a lista
+    de versões aplicadas.
+    """
+    _ensure_version_table(conn)
+    version = current_version(conn)
+    applied = []
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        step(conn)
+        conn.execute(
+            "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+            (step_version, description)
+        )
+        applied.append(step_version)
+    return applied
+
+
+def migrate():
+    """Atualiza o banco compartilhado para a versão mais recente do esquema."""
+    with write_transaction() as conn:
+        return apply_migrations(conn)
+
+
+if __name__ == '__main__':
+    applied = migrate()
+    if applied:
+        print(f"Migrações aplicadas: {', '.join(str(v) for v in applied)}")
+    else:
+        print(f"Esquema já está na versão {LATEST_VERSION}.")
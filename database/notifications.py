@@ -0,0 +1,86 @@
+"""
+Notificações do sistema.
+
+Uma notificação é gravada uma única vez: para um usuário (user_id) ou para
+todos os usuários de um papel (target_role, ex.: os aprovadores a cada novo
+pedido). O que cada usuário já leu fica em um cursor por usuário
+(notification_cursors.last_read_id): marcar como lidas é atualizar uma linha,
+e as não lidas são as de id maior que o cursor, lidas por faixa nos índices
+(user_id, id) e (target_role, id).
+"""
+import threading
+
+from database import queries
+from database.connection import get_connection, get_pool, write_transaction
+
+# Cache do processo: (user_id, papel) -> (data_version em que foi lido, não lidas)
+_unread_cache = {}
+_unread_cache_lock = threading.Lock()
+
+
+def notify_user(conn, user_id, message):
+    """Grava uma notificação para um usuário, na transação de quem chama."""
+    conn.execute("INSERT INTO notifications (user_id, message) VALUES (?, ?)", (user_id, message))
+
+
+def notify_users(conn, notifications):
+    """Grava de uma vez várias notificações, dadas como pares (user_id, mensagem), na transação de quem chama."""
+    conn.executemany("INSERT INTO notifications (user_id, message) VALUES (?, ?)", notifications)
+
+
+def notify_role(conn, role, message):
+    """Grava uma única notificação para todos os usuários do papel, na transação de quem chama."""
+    conn.execute("INSERT INTO notifications (target_role, message) VALUES (?, ?)", (role, message))
+
+
+def unread_count(user_id, role):
+    """
+    Retorna quantas notificações não lidas o usuário tem.
+
+    Enquanto o PRAGMA data_version não mudar (nenhum commit no banco), a
+    resposta vem do cache em memória; caso contrário, é contada a partir do
+    cursor do usuário.
+    """
+    stamp = get_pool().data_version()
+    key = (user_id, role)
+    with _unread_cache_lock:
+        cached = _unread_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    row = get_connection().execute(queries.UNREAD_COUNT, {'user_id': user_id, 'role': role}).fetchone()
+    count = row[0] if row else 0
+    with _unread_cache_lock:
+        _unread_cache[key] = (stamp, count)
+    return count
+
+
+def fetch_unread(user_id, role):
+    """Retorna as notificações não lidas do usuário como lista de (id, mensagem)."""
+    return get_connection().execute(queries.UNREAD_NOTIFICATIONS, {'user_id': user_id, 'role': role}).fetchall()
+
+
+def fetch_history(user_id, role, before=None, limit=50):
+    """
+    Retorna uma página do histórico do usuário, do mais recente ao mais antigo.
+
+    before é o cursor devolvido pela página anterior (None na primeira). Retorna
+    (linhas (id, mensagem, lida), proximo_cursor); proximo_cursor é None na última página.
+    """
+    rows = get_connection().execute(queries.NOTIFICATION_HISTORY, {
+        'user_id': user_id, 'role': role, 'before': before if before is not None else 2 ** 63 - 1, 'limit': limit + 1,
+    }).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+    return rows, next_cursor
+
+
+def mark_read(user_id, up_to_id):
+    """Marca como lidas as notificações do usuário até o id informado (o cursor só avança)."""
+    with write_transaction() as conn:
+        conn.execute("""
+            INSERT INTO notification_cursors (user_id, last_read_id) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET last_read_id = MAX(last_read_id, excluded.last_read_id)
+        """, (user_id, up_to_id))
@@ -0,0 +1,219 @@
+import json
+from datetime import timedelta
+
+from database import queries
+from database.archive import order_sources, visible_clauses
+from database.cache import get_active_approvers
+from database.connection import get_connection
+
+
+def _rows_as_dicts(cursor):
+    """Converte o resultado de um cursor em uma lista de dicionários."""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def fetch_order_bundles(order_ids):
+    """
+    Busca, para uma lista de pedidos, os detalhes, os itens e a situação de
+    aprovação de todos eles com um número fixo de consultas (quatro),
+    independentemente da quantidade de pedidos.
+
+    Retorna {order_id: {'details': dict, 'items': [dict], 'approved': [str], 'pending': [str]}}.
+    Pedidos inexistentes não aparecem no resultado.
+    """
+    order_ids = [int(order_id) for order_id in order_ids]
+    if not order_ids:
+        return {}
+
+    conn = get_connection()
+    ids_param = json.dumps(order_ids)
+
+    bundles = {}
+    for details in _rows_as_dicts(conn.execute(queries.ORDERS_BY_IDS, (ids_param,))):
+        bundles[details['id']] = {'details': details, 'items': [], 'approved': [], 'pending': []}
+
+    for item in _rows_as_dicts(conn.execute(queries.ITEMS_BY_ORDER_IDS, (ids_param,))):
+        bundle = bundles.get(item.pop('order_id'))
+        if bundle is not None:
+            bundle['items'].append(item)
+
+    for order_id, username in conn.execute(queries.APPROVED_BY_ORDER_IDS, (ids_param,)):
+        bundle = bundles.get(order_id)
+        if bundle is not None:
+            bundle['approved'].append(username)
+
+    all_approvers = get_active_approvers()
+    for bundle in bundles.values():
+        approved = set(bundle['approved'])
+        bundle['pending'] = [approver for approver in all_approvers if approver not in approved]
+
+    return bundles
+
+
+# --- Listagem paginada (keyset) ---
+
+# Colunas exibidas nas listagens de pedidos
+ORDER_LIST_COLUMNS = ('id', 'requester', 'po_number', 'created_at', 'total_value', 'status')
+
+
+def _next_day(value):
+    """Converte uma data final (inclusiva) no limite exclusivo usado no filtro."""
+    return (value + timedelta(days=1)).isoformat()
+
+
+def build_order_filters(status=None, user_id=None, supplier=None, date_from=None,
+                        date_to=None, min_value=None, max_value=None):
+    """
+    Monta as cláusulas WHERE (e seus parâmetros) para os filtros de pedidos.
+
+    status pode ser um texto ou uma lista de status; supplier busca por trecho
+    da razão social ou do CNPJ; date_from/date_to são objetos date (inclusivos).
+    """
+    clauses, params = [], []
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(int(user_id))
+    if supplier:
+        clauses.append("(supplier_name LIKE ? OR supplier_cnpj LIKE ?)")
+        params.extend([f"%{supplier}%", f"%{supplier}%"])
+    if date_from:
+        clauses.append("created_at >= ?")
+        params.append(date_from.isoformat())
+    if date_to:
+        clauses.append("created_at < ?")
+        params.append(_next_day(date_to))
+    if min_value is not None:
+        clauses.append("total_value >= ?")
+        params.append(float(min_value))
+    if max_value is not None:
+        clauses.append("total_value <= ?")
+        params.append(float(max_value))
+    return clauses, params
+
+
+def select_orders(columns, clauses, params, sources):
+    """
+    Monta 'SELECT colunas FROM purchase_orders WHERE cláusulas' em cada esquema
+    de sources (ver database.archive.order_sources), unidos por UNION ALL.
+    Retorna (sql, parâmetros).
+    """
+    selects, all_params = [], []
+    for schema in sources:
+        schema_clauses = clauses + visible_clauses(schema)
+        where = f"WHERE {' AND '.join(schema_clauses)}" if schema_clauses else ""
+        selects.append(f"SELECT {', '.join(columns)} FROM {schema}.purchase_orders {where}")
+        all_params.extend(params)
+    return " UNION ALL ".join(selects), all_params
+
+
+def build_order_page_query(after=None, limit=50, columns=ORDER_LIST_COLUMNS, newest_first=True, sources=None, **filters):
+    """
+    Monta a consulta de uma página de pedidos ordenada por (created_at, id).
+
+    Com o arquivo, cada esquema lê a página pelo seu índice e o SQLite intercala
+    os dois resultados já ordenados (sem ordenar tudo de novo).
+    """
+    clauses, params = build_order_filters(**filters)
+    if after is not None:
+        # Continua a partir do último (created_at, id) da página anterior
+        clauses.append("(created_at, id) < (?, ?)" if newest_first else "(created_at, id) > (?, ?)")
+        params.extend(after)
+    if sources is None:
+        sources = order_sources(filters.get('date_from'))
+    select, params = select_orders(columns, clauses, params, sources)
+    direction = "DESC" if newest_first else "ASC"
+    sql = f"{select} ORDER BY created_at {direction}, id {direction} LIMIT ?"
+    # Busca um registro a mais para saber se existe próxima página
+    params.append(int(limit) + 1)
+    return sql, params
+
+
+def list_orders(after=None, limit=50, columns=ORDER_LIST_COLUMNS, newest_first=True, **filters):
+    """
+    Retorna uma página de pedidos e o cursor da próxima página.
+
+    A paginação usa o par (created_at, id) do último registro como cursor, o que
+    mantém o custo de cada página constante independentemente do histórico.
+    Retorna (linhas, proximo_cursor); proximo_cursor é None na última página.
+    """
+    if 'created_at' not in columns or 'id' not in columns:
+        columns = tuple(columns) + tuple(c for c in ('id', 'created_at') if c not in columns)
+    sql, params = build_order_page_query(after, limit, columns, newest_first, **filters)
+    rows = _rows_as_dicts(get_connection().execute(sql, params))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+def fetch_orders_by_ids(order_ids, columns=ORDER_LIST_COLUMNS, **filters):
+    """
+    Retorna {id: linha} dos pedidos da lista que ainda atendem aos filtros,
+    em uma única consulta. Usada para atualizar só as linhas que mudaram.
+    """
+    if not order_ids:
+        return {}
+    if 'id' not in columns:
+        columns = ('id',) + tuple(columns)
+    clauses, params = build_order_filters(**filters)
+    clauses.insert(0, "id IN (SELECT value FROM json_each(?))")
+    params.insert(0, json.dumps([int(order_id) for order_id in order_ids]))
+    sql, params = select_orders(columns, clauses, params, order_sources(filters.get('date_from')))
+    rows = _rows_as_dicts(get_connection().execute(sql, params))
+    return {row['id']: row for row in rows}
+
+
+def order_matches(order, status=None, user_id=None, supplier=None, date_from=None,
+                  date_to=None, min_value=None, max_value=None):
+    """
+    Equivalente em Python de build_order_filters: indica se um pedido (dict
+    com status, total_value, user_id, created_at e, para o filtro de
+    fornecedor, supplier_name e supplier_cnpj) atende aos filtros.
+    """
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        if order['status'] not in statuses:
+            return False
+    if user_id is not None and order['user_id'] != int(user_id):
+        return False
+    if supplier:
+        needle = supplier.lower()
+        if not any(needle in (order.get(column) or '').lower() for column in ('supplier_name', 'supplier_cnpj')):
+            return False
+    created_at = order['created_at'] or ''
+    if date_from and created_at < date_from.isoformat():
+        return False
+    if date_to and created_at >= _next_day(date_to):
+        return False
+    value = order['total_value']
+    if min_value is not None and (value is None or value < float(min_value)):
+        return False
+    if max_value is not None and (value is None or value > float(max_value)):
+        return False
+    return True
+
+
+def count_orders(**filters):
+    """Conta os pedidos que atendem aos filtros, direto no banco."""
+    clauses, params = build_order_filters(**filters)
+    sql, params = select_orders(('1',), clauses, params, order_sources(filters.get('date_from')))
+    return get_connection().execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+
+def summarize_orders(**filters):
+    """
+    Retorna {status: {'count': n, 'total_value': v}} para os pedidos que
+    atendem aos filtros, calculado no banco.
+    """
+    clauses, params = build_order_filters(**filters)
+    sql, params = select_orders(('status', 'total_value'), clauses, params, order_sources(filters.get('date_from')))
+    rows = get_connection().execute(
+        f"SELECT status, COUNT(*), COALESCE(SUM(total_value), 0) FROM ({sql}) GROUP BY status", params
+    )
+    return {status: {'count': count, 'total_value': total} for status, count, total in rows}
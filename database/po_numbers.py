@@ -0,0 +1,61 @@
+"""
+Numeração dos pedidos de compra.
+
+Cada série tem um contador em 'po_sequences'. O número é reservado com um
+único UPSERT ... RETURNING dentro da transação que grava o pedido: dois
+envios simultâneos nunca recebem o mesmo número e, se o pedido não for
+gravado, o número volta junto com o ROLLBACK (a série não fica com buracos).
+
+O formato é escolhido pela variável de ambiente COMPRAS_PO_FORMAT entre os
+de PO_FORMATS. Cada formato define a chave da série (quando ela recomeça) e
+o texto do número; ambos aceitam {year}, {cost_center} e, no texto, {number}.
+"""
+import os
+from datetime import datetime
+
+# nome -> (chave da série, formato do número)
+PO_FORMATS = {
+    # 1, 2, 3... (formato original)
+    'sequencial': ('geral', '{number}'),
+    # 2026/00001, recomeçando a cada ano
+    'anual': ('{year}', '{year}/{number:05d}'),
+    # ADM-2026/0001, uma série por centro de custo e ano
+    'centro_de_custo': ('{cost_center}-{year}', '{cost_center}-{year}/{number:04d}'),
+}
+
+PO_FORMAT = os.environ.get('COMPRAS_PO_FORMAT', 'sequencial')
+
+_NEXT_VALUE = """
+    INSERT INTO po_sequences (series, last_value) VALUES (?, 1)
+    ON CONFLICT (series) DO UPDATE SET last_value = last_value + 1
+    RETURNING last_value
+"""
+
+
+def _format_spec(po_format=None):
+    po_format = po_format or PO_FORMAT
+    if po_format not in PO_FORMATS:
+        raise ValueError(f"Formato de numeração desconhecido: {po_format}")
+    return PO_FORMATS[po_format]
+
+
+def uses_cost_center(po_format=None):
+    """Indica se o formato exige o centro de custo do pedido."""
+    return '{cost_center' in _format_spec(po_format)[0]
+
+
+def allocate_po_number(conn, cost_center=None, when=None, po_format=None):
+    """
+    Reserva e retorna o próximo número de pedido da série correspondente.
+
+    Deve ser chamada com a conexão de uma transação de escrita aberta (a
+    mesma que insere o pedido).
+    """
+    series_format, number_format = _format_spec(po_format)
+    fields = {
+        'year': (when or datetime.now()).year,
+        'cost_center': (cost_center or '').strip().upper() or 'GERAL',
+    }
+    series = series_format.format(**fields)
+    number = conn.execute(_NEXT_VALUE, (series,)).fetchall()[0][0]
+    return number_format.format(number=number, **fields)
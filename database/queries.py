@@ -0,0 +1,111 @@
+# Consultas SQL usadas pelas páginas.
+# Ficam centralizadas aqui para que o verificador de planos de execução
+# (database/query_plan.py) analise exatamente o que as páginas executam.
+
+# --- Painel de Controle ---
+ACTIVE_APPROVERS = "SELECT username FROM users WHERE role = 'aprovador' AND is_active = 1"
+
+REQUESTERS = "SELECT id, username FROM users ORDER BY username"
+
+GLOBAL_STATUS_SUMMARY = "SELECT status, order_count, total_value FROM order_summary WHERE scope = 'all' AND scope_id = 0"
+
+USER_STATUS_SUMMARY = "SELECT status, order_count, total_value FROM order_summary WHERE scope = 'user' AND scope_id = ?"
+
+# --- Novo Pedido de Compra ---
+# Destinatários de e-mail: os que recebem cada pedido na hora e os que preferem o resumo periódico
+RECIPIENT_EMAILS = "SELECT email FROM users WHERE (role = 'aprovador' OR role = 'administrador') AND email IS NOT NULL AND email != '' AND is_active = 1 AND email_delivery = 'imediato'"
+
+DIGEST_RECIPIENT_IDS = "SELECT id FROM users WHERE (role = 'aprovador' OR role = 'administrador') AND email IS NOT NULL AND email != '' AND is_active = 1 AND email_delivery = 'resumo'"
+
+# Quórum de um novo pedido: todos os aprovadores ativos (no mínimo um)
+REQUIRED_APPROVALS = "SELECT MAX(1, COUNT(*)) FROM users WHERE role = 'aprovador' AND is_active = 1"
+
+# --- Atualização automática (painel e fila de aprovação) ---
+# Último evento registrado e eventos posteriores a um id (leitura pela chave primária)
+LATEST_ORDER_EVENT = "SELECT COALESCE(MAX(id), 0) FROM order_events"
+
+ORDER_EVENTS_SINCE = """
+    SELECT id, order_id, event, user_id, order_created_at, old_status, new_status, old_value, new_value
+    FROM order_events WHERE id > ? ORDER BY id LIMIT ?
+"""
+
+# --- Resumos de e-mail (worker do mailer) ---
+# Usuários com resumo vencido: a entrada mais antiga passou da janela do usuário,
+# ou ele voltou para o envio imediato e o que estava na fila sai de uma vez
+DUE_DIGESTS = """
+    SELECT q.user_id, MAX(q.id), u.email, u.is_active
+    FROM email_digest_queue q JOIN users u ON u.id = q.user_id
+    GROUP BY q.user_id
+    HAVING u.email_delivery != 'resumo' OR MIN(q.created_at) <= datetime('now', '-' || u.digest_minutes || ' minutes')
+"""
+
+# Pedidos de um resumo: os da fila do usuário que seguem pendentes e sem a decisão dele
+DIGEST_ORDERS = """
+    SELECT po.po_number, po.requester, po.created_at, po.total_value, po.justification
+    FROM email_digest_queue q JOIN purchase_orders po ON po.id = q.order_id
+    WHERE q.user_id = ? AND q.id <= ? AND po.status = 'pendente'
+      AND NOT EXISTS (SELECT 1 FROM approvals a WHERE a.order_id = po.id AND a.user_id = q.user_id)
+    ORDER BY q.id
+"""
+
+# --- Aprovar Pedidos ---
+# Itens de um cartão da fila (lidos só quando o cartão é aberto, com cache por pedido)
+PENDING_ORDER_ITEMS = "SELECT quantity, unit, description, unit_value, total_value FROM order_items WHERE order_id = ? ORDER BY id"
+
+# --- Notificações e autenticação ---
+# As notificações do usuário (user_id) e as do seu papel (target_role) são
+# lidas por faixa de id nos índices; lidas são as que estão até o cursor dele
+UNREAD_NOTIFICATIONS = """
+    SELECT n.id, n.message FROM notification_cursors c
+    JOIN notifications n ON n.user_id = c.user_id AND n.id > c.last_read_id
+    WHERE c.user_id = :user_id
+    UNION ALL
+    SELECT n.id, n.message FROM notification_cursors c
+    JOIN notifications n ON n.target_role = :role AND n.id > MAX(c.last_read_id, c.broadcast_from_id)
+    WHERE c.user_id = :user_id
+    ORDER BY 1
+"""
+
+UNREAD_COUNT = """
+    SELECT
+        (SELECT COUNT(*) FROM notifications WHERE user_id = c.user_id AND id > c.last_read_id)
+      + (SELECT COUNT(*) FROM notifications WHERE target_role = :role AND id > MAX(c.last_read_id, c.broadcast_from_id))
+    FROM notification_cursors c WHERE c.user_id = :user_id
+"""
+
+# Histórico paginado pelo id, do mais recente ao mais antigo (:before é o id
+# da última linha da página anterior)
+NOTIFICATION_HISTORY = """
+    SELECT n.id, n.message, n.id <= c.last_read_id FROM notification_cursors c
+    JOIN notifications n ON n.user_id = c.user_id AND n.id < :before
+    WHERE c.user_id = :user_id
+    UNION ALL
+    SELECT n.id, n.message, n.id <= c.last_read_id FROM notification_cursors c
+    JOIN notifications n ON n.target_role = :role AND n.id > c.broadcast_from_id AND n.id < :before
+    WHERE c.user_id = :user_id
+    ORDER BY 1 DESC
+    LIMIT :limit
+"""
+
+USER_FOR_LOGIN = "SELECT id, password, role, is_active FROM users WHERE username = ?"
+
+# --- Administrador ---
+ALL_USERS = "SELECT id, username, role, email, is_active FROM users"
+
+FAILED_EMAILS = "SELECT id, order_id, subject, attempts, last_error FROM email_outbox WHERE status = 'falhou' ORDER BY id DESC LIMIT 50"
+
+# --- Consultas em lote (lista de ids passada como JSON em um único parâmetro) ---
+ORDERS_BY_IDS = "SELECT * FROM purchase_orders WHERE id IN (SELECT value FROM json_each(?))"
+
+ITEMS_BY_ORDER_IDS = "SELECT order_id, quantity, unit, description, unit_value, total_value FROM order_items WHERE order_id IN (SELECT value FROM json_each(?)) ORDER BY order_id, id"
+
+APPROVED_BY_ORDER_IDS = """
+    SELECT a.order_id, u.username
+    FROM approvals a
+    JOIN users u ON a.user_id = u.id
+    WHERE a.order_id IN (SELECT value FROM json_each(?)) AND a.status = 'aprovado'
+"""
+
+# --- Pedidos arquivados (database/archive.py) ---
+# Data de criação do pedido arquivado mais recente (nenhuma linha se nada foi arquivado)
+ARCHIVE_HORIZON = "SELECT newest_created_at FROM archive_state WHERE id = 1 AND archived_orders > 0"
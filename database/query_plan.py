@@ -0,0 +1,118 @@
+"""
+Verificador de planos de execução das consultas das páginas.
+
+Cria um banco em memória com o esquema mais recente, roda EXPLAIN QUERY PLAN
+para cada consulta de database/queries.py e falha se alguma delas fizer uma
+varredura completa de tabela: SCAN sem índice ou percorrendo um índice inteiro
+(SCAN ... USING [COVERING] INDEX), que lê todas as linhas na ordem do índice.
+
+Uso: python -m database.query_plan
+"""
+import re
+import sqlite3
+import sys
+from datetime import date
+
+from database import queries
+from database.archive import HOT, HOT_AND_ARCHIVE
+from database.migrations import apply_migrations
+from database.orders import build_order_page_query
+from database.search import build_search_query
+
+# Consultas cuja varredura completa é intencional (listagens pequenas ou agregados)
+ALLOWED_FULL_SCANS = {
+    'ALL_USERS',
+    'REQUESTERS',
+    # A fila de resumos é esvaziada a cada envio: lê-la inteira é o trabalho da consulta
+    'DUE_DIGESTS',
+}
+
+# Combinações de filtros usadas pelas listagens paginadas das páginas
+ORDER_PAGE_FILTERS = {
+    'ORDER_PAGE': {},
+    'ORDER_PAGE_BY_USER': {'user_id': 1},
+    'ORDER_PAGE_BY_STATUS': {'status': 'pendente'},
+    'ORDER_PAGE_BY_DATE': {'date_from': date(2000, 1, 1), 'date_to': date(2000, 12, 31)},
+    'ORDER_PAGE_BY_SUPPLIER_VALUE': {'supplier': 'x', 'min_value': 0, 'max_value': 1},
+    # Período que alcança os pedidos arquivados: banco quente e arquivo
+    'ORDER_PAGE_WITH_ARCHIVE': {'sources': HOT_AND_ARCHIVE},
+    'ORDER_PAGE_BY_USER_WITH_ARCHIVE': {'user_id': 1, 'sources': HOT_AND_ARCHIVE},
+}
+
+# Combinações de filtros usadas pela busca textual (painel e fila de aprovação)
+SEARCH_FILTERS = {
+    'SEARCH': {},
+    'SEARCH_PENDING': {'status': 'pendente'},
+    'SEARCH_BY_USER_DATE': {'user_id': 1, 'date_from': date(2000, 1, 1)},
+    'SEARCH_WITH_ARCHIVE': {'sources': HOT_AND_ARCHIVE},
+}
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)( USING (COVERING )?INDEX \w+)?$')
+_SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+
+
+def page_queries():
+    """Retorna as consultas das páginas como {nome: sql}: as fixas e as listagens paginadas."""
+    found = {
+        name: value for name, value in vars(queries).items()
+        if name.isupper() and isinstance(value, str)
+    }
+    # Sem 'sources', as consultas ficam só no banco quente (não lê o banco em uso)
+    for name, filters in ORDER_PAGE_FILTERS.items():
+        found[name], _ = build_order_page_query(after=('', 0), **dict({'sources': HOT}, **filters))
+    for name, filters in SEARCH_FILTERS.items():
+        found[name], _ = build_search_query('x', **dict({'sources': HOT}, **filters))
+    return found
+
+
+def _dummy_params(sql):
+    """Gera parâmetros nulos compatíveis com os marcadores da consulta."""
+    named = re.findall(r':(\w+)', sql)
+    if named:
+        return {name: None for name in named}
+    return (None,) * sql.count('?')
+
+
+def explain(conn, sql):
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN de uma consulta."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", _dummy_params(sql)).fetchall()
+    return [row[3] for row in rows]
+
+
+def check_query_plans(conn=None):
+    """
+    Analisa o plano de cada consulta e retorna a lista de problemas encontrados
+    como tuplas (nome, detalhe). Lista vazia significa que tudo usa índices.
+    """
+    if conn is None:
+        conn = sqlite3.connect(':memory:', isolation_level=None)
+        conn.execute("ATTACH DATABASE ':memory:' AS archive")
+        conn.execute("BEGIN")
+        apply_migrations(conn)
+        conn.execute("COMMIT")
+
+    problems = []
+    for name, sql in sorted(page_queries().items()):
+        try:
+            details = explain(conn, sql)
+        except sqlite3.Error as e:
+            problems.append((name, f"erro ao analisar: {e}"))
+            continue
+        if name in ALLOWED_FULL_SCANS:
+            continue
+        # Varreduras de subconsultas e CTEs (resultados intermediários) não contam
+        subqueries = {match.group(1) for match in map(_SUBQUERY.match, details) if match}
+        for detail in details:
+            match = _FULL_SCAN.match(detail.strip())
+            if match and match.group(1) not in subqueries:
+                problems.append((name, detail))
+    return problems
+
+
+if __name__ == '__main__':
+    found = check_query_plans()
+    if found:
+        for name, detail in found:
+            print(f"[FALHA] {name}: {detail}")
+        sys.exit(1)
+    print(f"OK: {len(page_queries())} consultas analisadas, nenhuma varredura completa.")
@@ -0,0 +1,204 @@
+"""
+Retenção e compactação do banco.
+
+Apaga, em lotes pequenos (uma transação curta por lote, com pausa entre
+eles), o que já cumpriu seu papel e só faria as tabelas crescerem:
+
+- notificações lidas mais antigas que NOTIFICATION_RETENTION_DAYS (as de um
+  papel só depois que todos os usuários ativos do papel as leram);
+- eventos de order_events mais antigos que EVENT_RETENTION_DAYS (o mais
+  recente é sempre mantido: é ele que marca até onde as páginas já leram);
+- e-mails enviados mais antigos que SENT_EMAIL_RETENTION_DAYS.
+
+Os ids crescem com o tempo, então cada limpeza percorre só o começo da
+tabela, por faixas de id. Depois, a compactação devolve ao sistema as
+páginas liberadas (PRAGMA incremental_vacuum, também em passos), limita o
+arquivo WAL e atualiza as estatísticas do planejador. A tarefa periódica roda
+a cada RETENTION_INTERVAL_SECONDS.
+
+Uso: python -m database.retention [run | status]
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from database.connection import DB_PATH, get_connection, get_pool, write_transaction
+from database.scheduler import ensure_job_started
+
+# Prazos de retenção (dias); podem ser ajustados por variáveis de ambiente
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('COMPRAS_NOTIFICATION_RETENTION_DAYS', 180))
+EVENT_RETENTION_DAYS = int(os.environ.get('COMPRAS_EVENT_RETENTION_DAYS', 7))
+SENT_EMAIL_RETENTION_DAYS = int(os.environ.get('COMPRAS_SENT_EMAIL_RETENTION_DAYS', 30))
+
+# Linhas apagadas por transação e pausa entre lotes (libera o banco para escritas)
+PURGE_BATCH_ROWS = 500
+BATCH_PAUSE_SECONDS = 0.005
+
+# Compactação: só vale a pena acima de uma fração de páginas livres; elas são
+# devolvidas em passos de VACUUM_PAGES_PER_STEP
+FREE_PAGES_RATIO = 0.1
+VACUUM_PAGES_PER_STEP = 256
+
+# Intervalo entre execuções automáticas
+RETENTION_INTERVAL_SECONDS = 60 * 60
+
+# Notificações lidas: as do usuário até o cursor dele; as de um papel até o
+# menor cursor entre os usuários ativos do papel (passado como JSON {papel: id}).
+# Usuários excluídos ou papéis sem ninguém ativo não seguram nada.
+_READ_NOTIFICATION = """
+    (user_id IS NOT NULL AND id <= COALESCE(
+        (SELECT last_read_id FROM notification_cursors c WHERE c.user_id = notifications.user_id), id))
+    OR (target_role IS NOT NULL AND id <= COALESCE(
+        (SELECT value FROM json_each(?) WHERE key = notifications.target_role), id))
+"""
+
+_ROLE_READ_IDS = """
+    SELECT u.role, MIN(MAX(c.last_read_id, c.broadcast_from_id))
+    FROM users u JOIN notification_cursors c ON c.user_id = u.id
+    WHERE u.is_active = 1 GROUP BY u.role
+"""
+
+# Resultado da última execução, exibido no painel do administrador
+_last_run = {}
+_run_lock = threading.Lock()
+
+
+def _cutoff_id(conn, table, days):
+    """Primeiro id criado dentro do prazo (as linhas antes dele são candidatas à limpeza)."""
+    row = conn.execute(
+        f"SELECT id FROM {table} WHERE created_at >= datetime('now', ?) ORDER BY id LIMIT 1", (f'-{days} days',)
+    ).fetchone()
+    if row:
+        return row[0]
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+
+def _purge(table, days, condition, params=lambda conn: ()):
+    """
+    Apaga de 'table', em lotes por faixa de id, as linhas anteriores ao prazo
+    que atendem a 'condition'. params(conn) monta os parâmetros da condição
+    dentro da transação de cada lote. Retorna quantas linhas foram apagadas.
+    """
+    cutoff_id = _cutoff_id(get_connection(), table, days)
+    after, deleted = 0, 0
+    while True:
+        with write_transaction() as conn:
+            end = conn.execute(
+                f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > ? AND id < ? ORDER BY id LIMIT ?)",
+                (after, cutoff_id, PURGE_BATCH_ROWS)
+            ).fetchone()[0]
+            if end is None:
+                return deleted
+            deleted += conn.execute(
+                f"DELETE FROM {table} WHERE id > ? AND id <= ? AND ({condition})", (after, end, *params(conn))
+            ).rowcount
+        after = end
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+def purge_notifications(days=NOTIFICATION_RETENTION_DAYS):
+    """Apaga as notificações lidas mais antigas que o prazo. Retorna quantas foram apagadas."""
+    def role_read_ids(conn):
+        return (json.dumps(dict(conn.execute(_ROLE_READ_IDS).fetchall())),)
+    return _purge('notifications', days, _READ_NOTIFICATION, role_read_ids)
+
+
+def purge_order_events(days=EVENT_RETENTION_DAYS):
+    """Apaga os eventos de pedidos mais antigos que o prazo, mantendo o mais recente."""
+    return _purge('order_events', days, "id < (SELECT MAX(id) FROM order_events)")
+
+
+def purge_sent_emails(days=SENT_EMAIL_RETENTION_DAYS):
+    """Apaga os e-mails já enviados mais antigos que o prazo (os que falharam continuam na fila)."""
+    return _purge('email_outbox', days, "status = 'enviado'")
+
+
+def database_pages():
+    """Retorna (páginas do arquivo, páginas livres, tamanho da página, modo de auto_vacuum)."""
+    conn = get_connection()
+    return tuple(
+        conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+        for pragma in ('page_count', 'freelist_count', 'page_size', 'auto_vacuum')
+    )
+
+
+def compact(free_pages_ratio=FREE_PAGES_RATIO):
+    """
+    Devolve ao sistema as páginas livres do arquivo, se forem pelo menos
+    free_pages_ratio do total, limita o WAL e roda PRAGMA optimize.
+
+    Um banco criado sem auto_vacuum passa para o modo INCREMENTAL com um VACUUM
+    completo, uma única vez; daí em diante as páginas são liberadas em passos
+    curtos, soltando o lock de escrita entre eles. Retorna as páginas liberadas.
+    """
+    page_count, free_pages, _, auto_vacuum = database_pages()
+    released = 0
+    if free_pages and free_pages >= page_count * free_pages_ratio:
+        if auto_vacuum != 2:
+            with get_pool().writer_connection() as conn:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            released = free_pages
+        else:
+            while True:
+                with get_pool().writer_connection() as conn:
+                    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if not before:
+                        break
+                    conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})").fetchall()
+                    released += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                time.sleep(BATCH_PAUSE_SECONDS)
+    with get_pool().writer_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        conn.execute("PRAGMA optimize")
+    return released
+
+
+def run_retention():
+    """Executa as limpezas e a compactação. Retorna o resumo da execução."""
+    with _run_lock:
+        start = time.perf_counter()
+        size_before = os.path.getsize(DB_PATH)
+        result = {
+            'notifications': purge_notifications(),
+            'order_events': purge_order_events(),
+            'sent_emails': purge_sent_emails(),
+            'released_pages': compact(),
+        }
+        result['size_before'] = size_before
+        result['size_after'] = os.path.getsize(DB_PATH)
+        result['seconds'] = time.perf_counter() - start
+        result['finished_at'] = time.time()
+        _last_run.clear()
+        _last_run.update(result)
+        return result
+
+
+def last_run():
+    """Resumo da última execução neste processo (vazio se ainda não rodou)."""
+    return dict(_last_run)
+
+
+def ensure_retention_schedule():
+    """Inicia (uma vez por processo) a limpeza e a compactação periódicas."""
+    return ensure_job_started('retention', RETENTION_INTERVAL_SECONDS, run_retention)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    if command == 'run':
+        summary = run_retention()
+        print(f"Notificações apagadas: {summary['notifications']}")
+        print(f"Eventos de pedidos apagados: {summary['order_events']}")
+        print(f"E-mails enviados apagados: {summary['sent_emails']}")
+        print(f"Páginas liberadas: {summary['released_pages']}")
+        print(f"Arquivo: {summary['size_before'] / 1024:,.1f} KB -> {summary['size_after'] / 1024:,.1f} KB "
+              f"em {summary['seconds']:.2f} s")
+    elif command == 'status':
+        page_count, free_pages, page_size, auto_vacuum = database_pages()
+        print(f"Páginas: {page_count} ({page_count * page_size / 1024:,.1f} KB), livres: {free_pages}, auto_vacuum: {auto_vacuum}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,40 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(threading.Thread):
+    """Executa uma função em intervalos regulares numa thread em segundo plano."""
+
+    def __init__(self, name, interval_seconds, func):
+        super().__init__(name=f"job-{name}", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.func()
+            except Exception:
+                logger.exception("Erro na tarefa periódica %s", self.name)
+            self._stop_event.wait(self.interval_seconds)
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def ensure_job_started(name, interval_seconds, func):
+    """Inicia a tarefa periódica 'name' uma única vez por processo e a retorna."""
+    with _jobs_lock:
+        job = _jobs.get(name)
+        if job is None or not job.is_alive():
+            job = PeriodicJob(name, interval_seconds, func)
+            job.start()
+            _jobs[name] = job
+        return job
@@ -0,0 +1,160 @@
+"""
+Busca textual em pedidos, itens e fornecedores (SQLite FTS5).
+
+'orders_fts' indexa a justificativa, a razão social e o CNPJ dos pedidos e
+'items_fts' a descrição dos itens. São índices de conteúdo externo mantidos
+pelas triggers da migração 9. Cada palavra digitada vira um prefixo ("ton"
+encontra "toner") e todas precisam aparecer no mesmo registro (no pedido ou
+em um de seus itens); os pedidos voltam ordenados pela relevância (bm25).
+
+Para termos muito comuns, calcular a relevância de todas as ocorrências
+custaria centenas de milissegundos em milhões de itens. Por isso cada índice
+entrega só as SEARCH_CANDIDATES ocorrências mais recentes (ordem de rowid, que
+o FTS5 percorre sem ler o resto) e a relevância é calculada apenas sobre elas.
+
+Os pedidos arquivados têm índices próprios no arquivo (database/archive.py),
+consultados só quando o período da busca alcança esses pedidos.
+
+Reconstrução dos índices: python -m database.search [rebuild | check]
+"""
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from database.archive import order_sources, visible_clauses
+from database.connection import get_connection, write_transaction
+from database.orders import ORDER_LIST_COLUMNS, _rows_as_dicts, build_order_filters
+
+# Ocorrências mais recentes consideradas em cada índice antes de ranquear e filtrar
+SEARCH_CANDIDATES = 300
+
+
+def _ranked_matches(schema):
+    """Pedidos e itens do esquema que contêm os termos, com a melhor pontuação por pedido."""
+    return f"""
+        SELECT order_id, MIN(score) AS score FROM (
+            SELECT * FROM (
+                SELECT rowid AS order_id, rank AS score FROM {schema}.orders_fts
+                WHERE orders_fts MATCH ? ORDER BY rowid DESC LIMIT {SEARCH_CANDIDATES}
+            )
+            UNION ALL
+            SELECT i.order_id, m.score FROM (
+                SELECT rowid AS item_id, rank AS score FROM {schema}.items_fts
+                WHERE items_fts MATCH ? ORDER BY rowid DESC LIMIT {SEARCH_CANDIDATES}
+            ) m
+            JOIN {schema}.order_items i ON i.id = m.item_id
+        )
+        GROUP BY order_id
+    """
+
+
+def build_match_query(text):
+    """
+    Converte o texto digitado em uma expressão MATCH do FTS5 (cada palavra
+    como prefixo entre aspas). Retorna None se não houver palavras.
+    """
+    terms = re.findall(r"\w+", text or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def build_search_query(match_query, limit=50, columns=ORDER_LIST_COLUMNS, sources=None, **filters):
+    """
+    Monta o SQL (e os parâmetros) da busca ranqueada com os filtros de
+    build_order_filters, no banco quente e, se o período pedir, no arquivo.
+    """
+    clauses, params = build_order_filters(**filters)
+    if sources is None:
+        sources = order_sources(filters.get('date_from'))
+    selects, all_params = [], []
+    for schema in sources:
+        schema_clauses = clauses + visible_clauses(schema)
+        where = f"WHERE {' AND '.join(schema_clauses)}" if schema_clauses else ""
+        selects.append(f"""
+            SELECT {', '.join('o.' + column for column in columns)}, hits.score AS score
+            FROM ({_ranked_matches(schema)}) hits
+            JOIN {schema}.purchase_orders o ON o.id = hits.order_id
+            {where}
+        """)
+        all_params.extend([match_query, match_query, *params])
+    sql = f"SELECT {', '.join(columns)} FROM ({' UNION ALL '.join(selects)}) ORDER BY score LIMIT ?"
+    return sql, [*all_params, limit]
+
+
+def search_orders(text, limit=50, columns=ORDER_LIST_COLUMNS, **filters):
+    """
+    Retorna os pedidos (como dicionários) que contêm o texto, do mais para o
+    menos relevante, aplicando os mesmos filtros da listagem de pedidos.
+    """
+    match_query = build_match_query(text)
+    if match_query is None:
+        return []
+    sql, params = build_search_query(match_query, limit, columns, **filters)
+    return _rows_as_dicts(get_connection().execute(sql, params))
+
+
+@contextmanager
+def deferred_search_index(conn):
+    """
+    Adia a indexação dos pedidos e itens inseridos no bloco e os indexa de uma
+    vez, com um INSERT ... SELECT, ao sair. Dentro das triggers o FTS5 grava
+    um segmento por linha, o que deixa as inserções em lote ~10x mais lentas.
+
+    Deve envolver apenas INSERTs e rodar dentro de uma transação de escrita:
+    como a marcação é desfeita antes do COMMIT, outras conexões nunca a veem.
+    """
+    last_order_id, last_item_id = conn.execute(
+        "SELECT (SELECT COALESCE(MAX(id), 0) FROM purchase_orders), (SELECT COALESCE(MAX(id), 0) FROM order_items)"
+    ).fetchone()
+    conn.execute("UPDATE search_index_state SET deferred = 1 WHERE id = 1")
+    yield
+    conn.execute("""
+        INSERT INTO orders_fts (rowid, justification, supplier_name, supplier_cnpj)
+        SELECT id, justification, supplier_name, supplier_cnpj FROM purchase_orders WHERE id > ?
+    """, (last_order_id,))
+    conn.execute(
+        "INSERT INTO items_fts (rowid, description) SELECT id, description FROM order_items WHERE id > ?",
+        (last_item_id,)
+    )
+    conn.execute("UPDATE search_index_state SET deferred = 0 WHERE id = 1")
+
+
+def rebuild_search_index(conn):
+    """Recria os índices a partir das tabelas (deve rodar em transação de escrita)."""
+    conn.execute("INSERT INTO orders_fts (orders_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+
+
+def check_search_index():
+    """Verifica se os índices estão de acordo com as tabelas. Retorna a lista de problemas."""
+    problems = []
+    # O 'integrity-check' é um comando INSERT: roda na conexão de escrita, sem alterar nada
+    with write_transaction() as conn:
+        for table in ('orders_fts', 'items_fts'):
+            try:
+                conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('integrity-check', 1)")
+            except sqlite3.DatabaseError as e:
+                problems.append(f"{table}: {e}")
+    return problems
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rebuild'
+    if command == 'rebuild':
+        with write_transaction() as conn:
+            rebuild_search_index(conn)
+            conn.execute("INSERT INTO orders_fts (orders_fts) VALUES ('optimize')")
+            conn.execute("INSERT INTO items_fts (items_fts) VALUES ('optimize')")
+        print("Índices de busca reconstruídos.")
+    elif command == 'check':
+        problems = check_search_index()
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit(1)
+        print("OK: índices de busca consistentes.")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,113 @@
+"""
+Agregados de pedidos por status, no escopo global e por solicitante.
+
+A tabela 'order_summary' é mantida pelas triggers criadas na migração 3, de
+modo que o painel e o relatório leem os totais sem varrer 'purchase_orders'.
+Os pedidos arquivados (database/archive.py) continuam contando nos agregados.
+
+Verificação de consistência: python -m database.summary [--repair]
+"""
+import sys
+
+from database import queries
+from database.archive import order_sources
+from database.connection import get_connection, write_transaction
+from database.orders import select_orders, summarize_orders
+
+# Tolerância para diferenças de arredondamento na soma dos valores
+VALUE_TOLERANCE = 0.005
+
+
+def summary_from_scratch(conn):
+    """Consulta que recalcula os agregados do zero, a partir dos pedidos do banco quente e do arquivo."""
+    orders, _ = select_orders(('user_id', 'status', 'total_value'), [], [], order_sources(conn=conn))
+    return f"""
+        SELECT 'all', 0, status, COUNT(*), COALESCE(SUM(total_value), 0)
+        FROM ({orders}) GROUP BY status
+        UNION ALL
+        SELECT 'user', COALESCE(user_id, 0), status, COUNT(*), COALESCE(SUM(total_value), 0)
+        FROM ({orders}) GROUP BY COALESCE(user_id, 0), status
+    """
+
+
+def rebuild_summary(conn):
+    """Recria todos os agregados a partir dos pedidos (deve rodar em transação de escrita)."""
+    conn.execute("DELETE FROM order_summary")
+    conn.execute(f"""
+        INSERT INTO order_summary (scope, scope_id, status, order_count, total_value)
+        {summary_from_scratch(conn)}
+    """)
+
+
+def get_status_summary(user_id=None):
+    """
+    Retorna {status: {'count': n, 'total_value': v}} para todos os pedidos ou,
+    se user_id for informado, apenas para os pedidos daquele solicitante.
+    """
+    if user_id is None:
+        rows = get_connection().execute(queries.GLOBAL_STATUS_SUMMARY)
+    else:
+        rows = get_connection().execute(queries.USER_STATUS_SUMMARY, (user_id,))
+    return {
+        status: {'count': count, 'total_value': total}
+        for status, count, total in rows
+        if count
+    }
+
+
+def get_filtered_summary(filters):
+    """
+    Retorna os totais por status para um conjunto de filtros de pedidos.
+
+    Sem filtros (além do solicitante), a leitura vem dos agregados; com
+    filtros, a agregação é feita no banco sobre os pedidos filtrados.
+    """
+    if all(value is None for key, value in filters.items() if key != 'user_id'):
+        return get_status_summary(filters.get('user_id'))
+    return summarize_orders(**filters)
+
+
+def check_summary(conn=None, repair=False):
+    """
+    Compara os agregados mantidos pelas triggers com um recálculo completo.
+
+    Retorna a lista de divergências como tuplas
+    (escopo, id, status, (qtde, valor) esperados, (qtde, valor) armazenados).
+    Com repair=True, recria os agregados quando houver divergência.
+    """
+    conn = conn or get_connection()
+    expected = {
+        (scope, scope_id, status): (count, total)
+        for scope, scope_id, status, count, total in conn.execute(summary_from_scratch(conn))
+    }
+    stored = {
+        (scope, scope_id, status): (count, total)
+        for scope, scope_id, status, count, total in conn.execute(
+            "SELECT scope, scope_id, status, order_count, total_value FROM order_summary"
+        )
+        if count or abs(total) > VALUE_TOLERANCE
+    }
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        exp_count, exp_total = expected.get(key, (0, 0.0))
+        got_count, got_total = stored.get(key, (0, 0.0))
+        if exp_count != got_count or abs(exp_total - got_total) > VALUE_TOLERANCE:
+            drift.append((*key, (exp_count, exp_total), (got_count, got_total)))
+
+    if drift and repair:
+        with write_transaction() as write_conn:
+            rebuild_summary(write_conn)
+    return drift
+
+
+if __name__ == '__main__':
+    repair = '--repair' in sys.argv
+    found = check_summary(repair=repair)
+    for scope, scope_id, status, exp, got in found:
+        print(f"[DIVERGÊNCIA] {scope}/{scope_id}/{status}: esperado {exp}, armazenado {got}")
+    if not found:
+        print("OK: agregados consistentes com os pedidos.")
+    elif repair:
+        print("Agregados recriados a partir dos pedidos.")
+    sys.exit(1 if found and not repair else 0)
@@ -0,0 +1,298 @@
+"""
+Instrumentação das consultas SQL (opcional, ligada em tempo de execução).
+
+As conexões do pool são criadas com TracedConnection. Com a instrumentação
+desligada, ela só repassa as chamadas para sqlite3.Connection; ligada, cada
+cursor registra o texto da consulta, o formato dos parâmetros (tipos ou
+nomes, nunca os valores), as linhas devolvidas ou alteradas e o tempo gasto
+no SQLite (execute mais as leituras das linhas, sem contar o tempo do código
+que consome o resultado entre uma leitura e outra).
+
+Os números ficam em memória, agregados por consulta e por visualização de
+página (cada rerun chama trace_page_view no início do script). Consultas
+acima de SLOW_QUERY_MS vão para o log 'database.tracing' e para a lista de
+consultas lentas do painel do administrador.
+
+Variáveis de ambiente: COMPRAS_SQL_TRACE=1 liga a instrumentação ao iniciar;
+COMPRAS_SLOW_QUERY_MS define o limite de consulta lenta (padrão 100 ms).
+"""
+import logging
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get('COMPRAS_SLOW_QUERY_MS', '100'))
+
+# Tempos guardados por consulta para calcular os percentis
+LATENCY_SAMPLES = 500
+
+# Limites da memória usada: consultas distintas, visualizações e consultas lentas guardadas
+MAX_DISTINCT_QUERIES = 500
+MAX_PAGE_VIEWS = 500
+MAX_SLOW_QUERIES = 100
+
+# Linhas lidas por vez quando o cursor é percorrido com 'for'
+ITER_BATCH_ROWS = 256
+
+# Agrupa as consultas que excedem MAX_DISTINCT_QUERIES
+OTHER_QUERIES = '(outras consultas)'
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Texto da consulta em uma linha, usado como chave das estatísticas."""
+    return ' '.join(sql.split())
+
+
+def params_shape(params):
+    """Descreve os parâmetros sem expor os valores: tipos dos posicionais ou nomes dos nomeados."""
+    if params is None:
+        return '(executemany)'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f":{name}" for name in params) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class SQLTracer:
+    """Acumula as estatísticas das consultas do processo."""
+
+    def __init__(self, enabled=False, slow_query_ms=SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Descarta tudo o que foi registrado."""
+        with self._lock:
+            self._queries = {}
+            self._views = deque(maxlen=MAX_PAGE_VIEWS)
+            self._slow = deque(maxlen=MAX_SLOW_QUERIES)
+            self.started_at = datetime.now()
+        self._local = threading.local()
+
+    def start_page_view(self, page):
+        """Abre uma nova visualização de página para as consultas da thread atual."""
+        view = {'page': page, 'started_at': datetime.now(), 'queries': 0, 'total_ms': 0.0}
+        with self._lock:
+            self._views.append(view)
+        self._local.view = view
+
+    def record(self, sql, params, elapsed_ms, rows):
+        """Registra uma execução (chamado pelos cursores instrumentados)."""
+        key = normalize_sql(sql)
+        view = getattr(self._local, 'view', None)
+        slow = elapsed_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is None:
+                if len(self._queries) >= MAX_DISTINCT_QUERIES:
+                    key = OTHER_QUERIES
+                    stats = self._queries.get(key)
+                if stats is None:
+                    stats = self._queries[key] = {
+                        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                        'params': params_shape(params), 'samples': deque(maxlen=LATENCY_SAMPLES),
+                    }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['rows'] += rows
+            if elapsed_ms > stats['max_ms']:
+                stats['max_ms'] = elapsed_ms
+            stats['samples'].append(elapsed_ms)
+            if view is not None:
+                view['queries'] += 1
+                view['total_ms'] += elapsed_ms
+            if slow:
+                self._slow.append({
+                    'at': datetime.now(), 'page': view['page'] if view else None, 'sql': key,
+                    'params': params_shape(params), 'ms': elapsed_ms, 'rows': rows,
+                })
+        if slow:
+            logger.warning("Consulta lenta (%.1f ms, %d linhas) em %s: %s %s",
+                           elapsed_ms, rows, view['page'] if view else 'segundo plano', key, params_shape(params))
+
+    def top_queries(self, limit=20):
+        """Consultas ordenadas pelo tempo total, com média, p50, p95 e máximo."""
+        with self._lock:
+            snapshot = [(sql, dict(stats, samples=sorted(stats['samples']))) for sql, stats in self._queries.items()]
+        snapshot.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return [
+            {
+                'sql': sql, 'count': stats['count'], 'total_ms': stats['total_ms'],
+                'mean_ms': stats['total_ms'] / stats['count'], 'p50_ms': _percentile(stats['samples'], 0.5),
+                'p95_ms': _percentile(stats['samples'], 0.95), 'max_ms': stats['max_ms'],
+                'rows': stats['rows'], 'params': stats['params'],
+            }
+            for sql, stats in snapshot[:limit]
+        ]
+
+    def page_views(self):
+        """Consultas e tempo de SQL por visualização, agrupados por página."""
+        with self._lock:
+            views = [dict(view) for view in self._views]
+        pages = {}
+        for view in views:
+            pages.setdefault(view['page'], []).append(view)
+        return [
+            {
+                'page': page, 'views': len(items),
+                'mean_queries': statistics.fmean(view['queries'] for view in items),
+                'max_queries': max(view['queries'] for view in items),
+                'mean_ms': statistics.fmean(view['total_ms'] for view in items),
+            }
+            for page, items in sorted(pages.items())
+        ]
+
+    def slow_queries(self):
+        """Consultas lentas mais recentes primeiro."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def summary(self):
+        """Totais gerais: execuções, tempo, p50/p95 (sobre as amostras) e consultas por visualização."""
+        with self._lock:
+            samples = sorted(sample for stats in self._queries.values() for sample in stats['samples'])
+            count = sum(stats['count'] for stats in self._queries.values())
+            total_ms = sum(stats['total_ms'] for stats in self._queries.values())
+            view_queries = [view['queries'] for view in self._views]
+        return {
+            'count': count,
+            'total_ms': total_ms,
+            'p50_ms': _percentile(samples, 0.5),
+            'p95_ms': _percentile(samples, 0.95),
+            'page_views': len(view_queries),
+            'queries_per_view': statistics.fmean(view_queries) if view_queries else 0.0,
+        }
+
+
+sql_tracer = SQLTracer(enabled=os.environ.get('COMPRAS_SQL_TRACE') == '1')
+
+
+def trace_page_view(page):
+    """Marca o início de um rerun da página (chamada no topo de cada script)."""
+    if sql_tracer.enabled:
+        sql_tracer.start_page_view(page)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor que mede a própria execução. A consulta é registrada quando termina:
+    ao esgotar as linhas, ao executar outra consulta, ao fechar ou ao ser
+    descartado.
+    """
+
+    _trace_sql = None
+
+    def _start(self, sql, params):
+        if self._trace_sql is not None:
+            self._finish()
+        self._trace_sql, self._trace_params = sql, params
+        self._trace_ms, self._trace_rows = 0.0, 0
+
+    def _finish(self):
+        sql, self._trace_sql = self._trace_sql, None
+        if sql is not None:
+            sql_tracer.record(sql, self._trace_params, self._trace_ms, self._trace_rows)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._trace_ms += (time.perf_counter() - start) * 1e3
+        if self.description is None:
+            # Comando sem resultado: as linhas alteradas já são conhecidas
+            self._trace_rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._trace_ms += (time.perf_counter() - start) * 1e3
+        self._trace_rows = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        if self._trace_sql is not None:
+            self._trace_ms += (time.perf_counter() - start) * 1e3
+            if row is None:
+                self._finish()
+            else:
+                self._trace_rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._trace_sql is not None:
+            self._trace_ms += (time.perf_counter() - start) * 1e3
+            self._trace_rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        if self._trace_sql is not None:
+            self._trace_ms += (time.perf_counter() - start) * 1e3
+            self._trace_rows += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        # Lê em blocos para medir o tempo sem uma chamada extra por linha
+        while True:
+            rows = self.fetchmany(ITER_BATCH_ROWS)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Conexão do pool: entrega cursores instrumentados quando a instrumentação está ligada."""
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TracedCursor if sql_tracer.enabled else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not sql_tracer.enabled:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not sql_tracer.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,172 @@
+"""
+Fila de escrita com commit em grupo.
+
+As gravações de maior volume (envio de pedidos e decisões de aprovação) não
+abrem cada uma a sua transação: as sessões do Streamlit entregam a função de
+escrita à fila e recebem um Future. Uma única thread escritora retira os
+trabalhos e junta ao primeiro todos os que se acumularam enquanto o lote
+anterior era gravado (até MAX_BATCH_JOBS), executando o lote inteiro em uma
+só transação BEGIN IMMEDIATE, com um commit só. Sem carga, cada trabalho é
+gravado assim que chega; sob carga, os lotes crescem sozinhos.
+
+Cada trabalho roda dentro de um SAVEPOINT: se ele lançar uma exceção, só as
+suas alterações são desfeitas e a exceção vai para o seu Future, sem afetar
+os demais trabalhos do lote. Os Futures só recebem o resultado depois do
+COMMIT, então quem espera por run_write só continua com o dado já gravado.
+
+Os trabalhos são funções comuns que gravam com write_transaction(): na thread
+escritora a transação do lote já está aberta e é reaproveitada, então as
+mesmas funções funcionam com ou sem a fila (ex.: record_decision).
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from database.connection import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Trabalhos por transação e espera (ms) por mais trabalhos após o primeiro.
+# Com espera zero, o lote leva só o que já está na fila: nenhuma latência extra
+MAX_BATCH_JOBS = 64
+BATCH_WAIT_MS = 0
+
+# Tempo máximo (s) que run_write espera por um trabalho que ainda não começou
+RESULT_TIMEOUT_S = 30
+
+
+class WriteQueue:
+    """Fila de trabalhos de escrita atendida por uma única thread escritora."""
+
+    def __init__(self, max_batch_jobs=MAX_BATCH_JOBS, batch_wait_ms=BATCH_WAIT_MS):
+        self.max_batch_jobs = max_batch_jobs
+        self.batch_wait_ms = batch_wait_ms
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'jobs': 0, 'failed': 0, 'batches': 0, 'largest_batch': 0}
+
+    def submit(self, func, *args, **kwargs):
+        """Enfileira func(*args, **kwargs) e retorna um Future com o resultado (ou a exceção)."""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Chamado de dentro de um trabalho: já há uma transação aberta nesta thread
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._ensure_started()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """
+        Executa func pela fila e espera o commit. Retorna o resultado ou lança a
+        exceção do trabalho. Não deve ser chamada com uma transação de escrita
+        aberta na thread atual (a thread escritora ficaria esperando por ela).
+
+        Se o trabalho não começar em RESULT_TIMEOUT_S, ele é cancelado e
+        TimeoutError é lançado: nada foi nem será gravado. Um trabalho que já
+        está no lote em gravação não pode ser cancelado; a espera continua até
+        o commit, para que quem chama nunca veja um erro de algo que foi gravado.
+        """
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=RESULT_TIMEOUT_S)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def stats(self):
+        """Trabalhos executados, que falharam, lotes gravados e tamanho médio e máximo dos lotes."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['mean_batch'] = stats['jobs'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run_forever, name="database-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run_forever(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._commit_batch(batch)
+            except Exception:
+                # Nunca deixa a thread morrer: os Futures do lote já receberam o erro
+                logger.exception("Falha ao gravar um lote de %d trabalho(s)", len(batch))
+
+    def _next_batch(self):
+        """Espera o primeiro trabalho e junta os que chegarem em seguida."""
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_jobs:
+            try:
+                if self.batch_wait_ms:
+                    batch.append(self._queue.get(timeout=self.batch_wait_ms / 1000))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit_batch(self, batch):
+        """Executa o lote em uma transação, um SAVEPOINT por trabalho, e resolve os Futures após o COMMIT."""
+        done = []
+        failed = 0
+        try:
+            with get_pool().write() as conn:
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        failed += 1
+                        future.set_exception(e)
+                        if not conn.in_transaction:
+                            # O SQLite desfez a transação inteira (ex.: disco cheio): o lote se perde
+                            raise
+                        conn.execute("ROLLBACK TO write_job")
+                        conn.execute("RELEASE write_job")
+                    else:
+                        conn.execute("RELEASE write_job")
+                        done.append((future, result))
+        except Exception as e:
+            for future, _ in done:
+                future.set_exception(e)
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self._stats_lock:
+                self._stats['jobs'] += len(batch)
+                self._stats['failed'] += failed
+                self._stats['batches'] += 1
+                self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+        for future, result in done:
+            future.set_result(result)
+
+
+write_queue = WriteQueue()
+
+
+def submit_write(func, *args, **kwargs):
+    """Atalho para enfileirar um trabalho na fila de escrita do processo."""
+    return write_queue.submit(func, *args, **kwargs)
+
+
+def run_write(func, *args, **kwargs):
+    """Atalho para executar um trabalho pela fila de escrita e esperar o commit."""
+    return write_queue.run(func, *args, **kwargs)
@@ -0,0 +1 @@
+# Pacote de importação em lote de pedidos e itens (CSV/XLSX).
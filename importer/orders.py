@@ -0,0 +1,345 @@
+"""
+Importação em lote de pedidos e itens a partir de CSV ou XLSX.
+
+O arquivo tem uma linha por item; as linhas com o mesmo "Nº Pedido" formam um
+pedido, cujos dados (solicitante, fornecedor, status...) vêm da primeira linha.
+Os títulos gerados pela exportação (reports/export.py) são aceitos, assim como
+os nomes das colunas do banco.
+
+As colunas são validadas e convertidas de forma vetorizada (pandas), o CSV é
+lido em blocos e cada bloco é gravado com executemany em uma transação. As
+linhas inválidas não são gravadas e vão para o relatório de erros.
+"""
+import csv
+import io
+import json
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from database import queries
+from database.cache import get_all_users
+from database.connection import write_transaction
+from database.search import deferred_search_index
+
+# Linhas do arquivo processadas (e gravadas) por transação
+CHUNK_ROWS = 50_000
+
+# Limite de erros guardados no relatório (os demais são apenas contados)
+MAX_REPORTED_ERRORS = 10_000
+
+# Título no arquivo -> coluna
+COLUMN_ALIASES = {
+    'Nº Pedido': 'po_number',
+    'Solicitante': 'requester',
+    'Data': 'created_at',
+    'Status': 'status',
+    'Fornecedor': 'supplier_name',
+    'Razão Social': 'supplier_name',
+    'CNPJ': 'supplier_cnpj',
+    'Contato': 'supplier_contact',
+    'Justificativa': 'justification',
+    'Forma de Pagamento': 'payment_method',
+    'Data de Entrega': 'delivery_date',
+    'Vencimento': 'due_date',
+    'Endereço de Entrega': 'delivery_address',
+    'Qtde': 'quantity',
+    'Unidade': 'unit',
+    'Descrição': 'description',
+    'Descrição do Item': 'description',
+    'Valor Un.': 'unit_value',
+    'Valor Total': 'total_value',
+}
+
+# Colunas do pedido gravadas a partir da primeira linha de cada pedido
+ORDER_FIELDS = ('requester', 'status', 'created_at', 'justification', 'supplier_name', 'supplier_cnpj',
+                'supplier_contact', 'payment_method', 'delivery_date', 'due_date', 'delivery_address')
+
+ITEM_FIELDS = ('quantity', 'unit', 'description', 'unit_value')
+
+# Título usado no relatório de erros para cada coluna
+COLUMN_TITLES = {column: title for title, column in COLUMN_ALIASES.items()}
+
+VALID_STATUSES = {'pendente', 'aprovado', 'rejeitado'}
+
+_INSERT_ORDER = f"""
+    INSERT INTO purchase_orders (id, user_id, po_number, total_value, required_approvals, {', '.join(ORDER_FIELDS)})
+    VALUES (?, ?, ?, ?, ?, {', '.join('?' for _ in ORDER_FIELDS)})
+"""
+
+_INSERT_ITEM = """
+    INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Próximo id livre, respeitando o AUTOINCREMENT (ids apagados não são reutilizados)
+_LAST_ORDER_ID = """
+    SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'purchase_orders'), 0),
+               COALESCE((SELECT MAX(id) FROM purchase_orders), 0))
+"""
+
+# Inclui os pedidos arquivados (database/archive.py): reimportá-los os duplicaria
+_EXISTING_PO_NUMBERS = """
+    SELECT po_number FROM main.purchase_orders WHERE po_number IN (SELECT value FROM json_each(:numbers))
+    UNION ALL
+    SELECT po_number FROM archive.purchase_orders WHERE po_number IN (SELECT value FROM json_each(:numbers))
+"""
+
+# Pedidos sem itens no arquivo mantêm o 'Valor Total' informado
+_UPDATE_TOTALS = """
+    UPDATE purchase_orders
+    SET total_value = COALESCE((SELECT SUM(total_value) FROM order_items WHERE order_id = purchase_orders.id), total_value, 0)
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+
+# --- Leitura ---
+
+def _detect_csv_format(fp):
+    """Retorna (separador, codificação) a partir do início do arquivo."""
+    sample = fp.read(64 * 1024)
+    fp.seek(0)
+    try:
+        text = sample.decode('utf-8-sig')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        text = sample.decode('latin-1')
+        encoding = 'latin-1'
+    header = text.splitlines()[0] if text else ''
+    return (';' if header.count(';') >= header.count(',') else ','), encoding
+
+
+def _normalize_columns(frame):
+    renamed = {}
+    for column in frame.columns:
+        name = str(column).strip()
+        renamed[column] = COLUMN_ALIASES.get(name, name.lower())
+    frame = frame.rename(columns=renamed)
+    # Colunas repetidas (ex.: 'Descrição' e 'Descrição do Item'): fica a primeira
+    return frame.loc[:, ~frame.columns.duplicated()]
+
+
+def read_chunks(fp, filename, chunk_rows=CHUNK_ROWS):
+    """
+    Lê o arquivo (objeto binário) em blocos de DataFrame com as colunas já
+    normalizadas, todas como texto, e a coluna 'line' com a linha no arquivo.
+    """
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        frame = pd.read_excel(fp, dtype=str, keep_default_na=False, engine='openpyxl')
+        chunks = (frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows))
+    elif filename.lower().endswith('.csv'):
+        sep, encoding = _detect_csv_format(fp)
+        chunks = pd.read_csv(fp, sep=sep, encoding=encoding, dtype=str, keep_default_na=False,
+                             chunksize=chunk_rows)
+    else:
+        raise ValueError("Formato de arquivo não suportado. Use CSV ou XLSX.")
+
+    for chunk in chunks:
+        chunk = _normalize_columns(chunk)
+        # A primeira linha do arquivo é o cabeçalho
+        chunk['line'] = chunk.index + 2
+        yield chunk
+
+
+# --- Validação e conversão (vetorizadas) ---
+
+def _text(frame, column):
+    if column not in frame:
+        return pd.Series('', index=frame.index)
+    return frame[column].fillna('').astype(str).str.strip()
+
+
+def _to_number(series):
+    """Converte texto em número aceitando '1.234,56', '1234.56' e 'R$ 10,00'."""
+    text = series.str.replace('R$', '', regex=False).str.strip()
+    brazilian = text.str.contains(',', regex=False)
+    text = text.where(~brazilian, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(text, errors='coerce')
+
+
+def _to_timestamp(series):
+    """Converte datas (poucos valores distintos) convertendo cada valor distinto uma única vez."""
+    distinct = series.drop_duplicates()
+    # ISO (2024-01-31) primeiro; o restante é lido como dia/mês/ano
+    parsed = pd.to_datetime(distinct, errors='coerce', format='ISO8601')
+    missing = parsed.isna()
+    parsed[missing] = pd.to_datetime(distinct[missing], dayfirst=True, errors='coerce', format='mixed')
+    mapping = dict(zip(distinct, parsed.dt.strftime('%Y-%m-%d %H:%M:%S')))
+    return series.map(mapping)
+
+
+def _collect_errors(errors, frame, mask, column, message):
+    if mask.any():
+        title = COLUMN_TITLES.get(column, column)
+        errors.extend((line, title, message) for line in frame.loc[mask, 'line'])
+
+
+def validate_items(frame, errors):
+    """
+    Converte e valida as colunas de item. Retorna um DataFrame com quantity,
+    unit, description, unit_value e total_value, a máscara das linhas válidas
+    e a das linhas que têm item (linhas só com dados do pedido são válidas,
+    mas não geram item).
+    """
+    raw_quantity = _text(frame, 'quantity')
+    raw_unit_value = _text(frame, 'unit_value')
+    quantity = _to_number(raw_quantity)
+    unit_value = _to_number(raw_unit_value)
+    description = _text(frame, 'description')
+    unit = _text(frame, 'unit').str.upper().replace('', 'UNI')
+    has_item = (raw_quantity != '') | (raw_unit_value != '') | (description != '')
+
+    invalid_quantity = has_item & (quantity.isna() | (quantity <= 0))
+    invalid_value = has_item & (unit_value.isna() | (unit_value < 0))
+    blank_description = has_item & (description == '')
+    _collect_errors(errors, frame, invalid_quantity, 'quantity', "Quantidade inválida")
+    _collect_errors(errors, frame, invalid_value, 'unit_value', "Valor unitário inválido")
+    _collect_errors(errors, frame, blank_description, 'description', "Descrição em branco")
+
+    items = pd.DataFrame({
+        'quantity': quantity,
+        'unit': unit,
+        'description': description,
+        'unit_value': unit_value,
+        'total_value': (quantity * unit_value).round(2),
+    }, index=frame.index)
+    return items, ~(invalid_quantity | invalid_value | blank_description), has_item
+
+
+def validate_orders(frame, errors, default_requester):
+    """Converte e valida as colunas do pedido. Retorna (DataFrame com ORDER_FIELDS e po_number, máscara)."""
+    po_number = _text(frame, 'po_number')
+    status = _text(frame, 'status').str.lower().replace({'': 'pendente', 'reprovado': 'rejeitado'})
+    raw_created_at = _text(frame, 'created_at')
+    created_at = _to_timestamp(raw_created_at)
+
+    blank_po = po_number == ''
+    invalid_status = ~status.isin(VALID_STATUSES)
+    invalid_date = (raw_created_at != '') & created_at.isna()
+    _collect_errors(errors, frame, blank_po, 'po_number', "Nº do pedido em branco")
+    _collect_errors(errors, frame, invalid_status, 'status', "Status desconhecido")
+    _collect_errors(errors, frame, invalid_date, 'created_at', "Data inválida")
+
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    orders = pd.DataFrame({'po_number': po_number, 'line': frame['line']}, index=frame.index)
+    for field in ORDER_FIELDS:
+        text = _text(frame, field).astype(object)
+        orders[field] = text.where(text != '', None)
+    orders['requester'] = orders['requester'].where(orders['requester'].notna(), default_requester)
+    orders['status'] = status
+    orders['created_at'] = created_at.fillna(now)
+    total_value = _to_number(_text(frame, 'total_value')).astype(object)
+    orders['total_value'] = total_value.where(total_value.notna(), None)
+    return orders, ~(blank_po | invalid_status | invalid_date)
+
+
+def parse_items(fp, filename):
+    """
+    Lê uma lista de itens (ex.: uma cotação colada em planilha) para o
+    formulário de novo pedido. Retorna (DataFrame no formato do editor, erros).
+    """
+    errors = []
+    frames = []
+    for chunk in read_chunks(fp, filename):
+        items, valid, has_item = validate_items(chunk, errors)
+        frames.append(items[valid & has_item])
+    items = pd.concat(frames) if frames else pd.DataFrame(columns=list(ITEM_FIELDS))
+    editor_df = pd.DataFrame({
+        'Qtde': items['quantity'],
+        'Unidade': items['unit'],
+        'Descrição': items['description'],
+        'Valor Un.': items['unit_value'],
+    }).reset_index(drop=True)
+    return editor_df, errors
+
+
+# --- Gravação ---
+
+def _write_chunk(conn, orders, items, known_orders, required_approvals, user_ids, errors):
+    """Grava os pedidos novos e os itens de um bloco. Retorna (pedidos, itens) gravados."""
+    first_rows = orders.drop_duplicates('po_number')
+    new_orders = first_rows[~first_rows['po_number'].isin(known_orders)]
+
+    # Pedidos que já existiam no banco antes da importação são recusados por inteiro
+    candidates = new_orders['po_number'].tolist()
+    existing = {row[0] for row in conn.execute(_EXISTING_PO_NUMBERS, {'numbers': json.dumps(candidates)})}
+    if existing:
+        duplicated = new_orders['po_number'].isin(existing)
+        _collect_errors(errors, new_orders, duplicated, 'po_number', "Pedido já existe no sistema")
+        for po_number in existing:
+            known_orders[po_number] = None
+        new_orders = new_orders[~duplicated]
+
+    first_id = conn.execute(_LAST_ORDER_ID).fetchone()[0] + 1
+    order_ids = range(first_id, first_id + len(new_orders))
+    known_orders.update(zip(new_orders['po_number'], order_ids))
+    conn.executemany(_INSERT_ORDER, (
+        (order_id, user_ids.get(row[0]), po_number, total_value, required_approvals) + row
+        for order_id, po_number, total_value, row in zip(
+            order_ids, new_orders['po_number'], new_orders['total_value'],
+            new_orders[list(ORDER_FIELDS)].itertuples(index=False, name=None)
+        )
+    ))
+
+    order_id_column = orders.loc[items.index, 'po_number'].map(known_orders)
+    writable = order_id_column.notna()
+    items = items[writable]
+    conn.executemany(_INSERT_ITEM, zip(
+        order_id_column[writable].astype(int).tolist(),
+        items['quantity'].tolist(),
+        items['unit'].tolist(),
+        items['description'].tolist(),
+        items['unit_value'].tolist(),
+        items['total_value'].tolist(),
+    ))
+
+    touched = sorted(set(order_id_column[writable].astype(int).tolist()))
+    conn.execute(_UPDATE_TOTALS, (json.dumps(touched),))
+    return len(new_orders), len(items)
+
+
+def import_orders(fp, filename, default_requester, chunk_rows=CHUNK_ROWS):
+    """
+    Importa pedidos e itens do arquivo. Retorna um dicionário com as contagens
+    ('rows', 'orders', 'items', 'error_count'), a lista de erros
+    (linha, coluna, mensagem) e o tempo gasto em segundos.
+
+    Pedidos importados não geram notificações nem e-mails.
+    """
+    start = time.perf_counter()
+    errors = []
+    result = {'rows': 0, 'orders': 0, 'items': 0}
+    known_orders = {}
+    user_ids = {username: user_id for user_id, username, *_ in get_all_users()}
+
+    for chunk in read_chunks(fp, filename, chunk_rows):
+        chunk_errors = []
+        orders, valid_orders = validate_orders(chunk, chunk_errors, default_requester)
+        items, valid_items, has_item = validate_items(chunk, chunk_errors)
+        valid = valid_orders & valid_items
+
+        with write_transaction() as conn, deferred_search_index(conn):
+            required_approvals = conn.execute(queries.REQUIRED_APPROVALS).fetchone()[0]
+            orders_written, items_written = _write_chunk(
+                conn, orders[valid], items[valid & has_item], known_orders, required_approvals, user_ids, chunk_errors
+            )
+        result['rows'] += len(chunk)
+        result['orders'] += orders_written
+        result['items'] += items_written
+        errors.extend(chunk_errors)
+
+    errors.sort()
+    result['error_count'] = len(errors)
+    result['errors'] = errors[:MAX_REPORTED_ERRORS]
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def errors_to_csv(errors):
+    """Relatório de erros em CSV (UTF-8 com BOM, separador ';')."""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(['Linha', 'Coluna', 'Erro'])
+    writer.writerows(errors)
+    return output.getvalue().encode('utf-8-sig')
@@ -0,0 +1,2 @@
+# Pacote de envio de e-mails do sistema de compras.
+# A fila (outbox) é gravada junto com o pedido e enviada em segundo plano.
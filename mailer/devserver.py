@@ -0,0 +1,103 @@
+"""
+Servidor SMTP mínimo para desenvolvimento e testes locais.
+
+Aceita qualquer remetente/destinatário, não exige autenticação e guarda as
+mensagens recebidas em memória (e as imprime no terminal quando executado
+diretamente). Para usá-lo com o worker, configure em secrets.toml:
+
+    [email_credentials]
+    sender_email = "compras@localhost"
+    sender_password = ""
+    smtp_server = "localhost"
+    smtp_port = 1025
+    use_ssl = false
+
+Uso: python -m mailer.devserver [porta]
+"""
+import socketserver
+import sys
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self._reply("220 localhost SMTP de desenvolvimento")
+        envelope = {'from': None, 'to': []}
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self._reply("250 localhost")
+            elif verb == 'MAIL':
+                envelope = {'from': command.split(':', 1)[1].strip(), 'to': []}
+                self._reply("250 OK")
+            elif verb == 'RCPT':
+                envelope['to'].append(command.split(':', 1)[1].strip())
+                self._reply("250 OK")
+            elif verb == 'DATA':
+                self._reply("354 Termine com <CRLF>.<CRLF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line.decode(errors='replace'))
+                self.server.store(dict(envelope, data=''.join(lines)))
+                self._reply("250 OK: mensagem recebida")
+            elif verb in ('NOOP', 'RSET'):
+                self._reply("250 OK")
+            elif verb == 'QUIT':
+                self._reply("221 Até logo")
+                return
+            else:
+                self._reply("502 Comando não implementado")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Servidor SMTP em thread própria; as mensagens ficam em 'messages'."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='localhost', port=1025, echo=False):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def verify_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        return True
+
+    def store(self, message):
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"--- De: {message['from']} Para: {', '.join(message['to'])} ---")
+            print(message['data'])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    print(f"Servidor SMTP de desenvolvimento ouvindo em localhost:{port}")
+    with LocalSMTPServer(port=port, echo=True) as server:
+        server.serve_forever()
@@ -0,0 +1,77 @@
+"""
+Resumo periódico de novos pedidos para aprovadores e administradores.
+
+Quem prefere o resumo não recebe um e-mail por pedido: o envio do pedido só
+acrescenta uma linha por destinatário em email_digest_queue, na mesma
+transação. O worker do mailer verifica a fila a cada ciclo e, para cada
+usuário cuja entrada mais antiga passou da sua janela (digest_minutes), monta
+um único e-mail com os pedidos que ainda aguardam a decisão dele, grava-o no
+outbox e limpa as entradas usadas.
+"""
+from database import queries
+from database.cache import invalidate_users
+from database.connection import get_connection, write_transaction
+from mailer.outbox import enqueue_email
+from mailer.templates import render_digest_email
+
+# Formas de entrega oferecidas na página de notificações
+DELIVERY_MODES = {
+    'imediato': "Um e-mail a cada novo pedido",
+    'resumo': "Resumo periódico dos novos pedidos",
+}
+
+# Janelas de resumo (minutos) oferecidas na página de notificações
+DIGEST_WINDOW_OPTIONS = [15, 30, 60, 120, 240, 480, 1440]
+
+
+def queue_digest_entries(conn, user_ids, order_id):
+    """Coloca o pedido no próximo resumo de cada usuário, na transação de quem chama."""
+    conn.executemany(
+        "INSERT INTO email_digest_queue (user_id, order_id) VALUES (?, ?)",
+        [(user_id, order_id) for user_id in user_ids]
+    )
+
+
+def enqueue_due_digests():
+    """
+    Grava no outbox um resumo para cada usuário com a janela vencida.
+
+    Pedidos que deixaram de estar pendentes (ou que o usuário já decidiu) são
+    descartados; se não sobrar nenhum, ou se o usuário estiver inativo ou sem
+    e-mail, as entradas são apenas removidas. Retorna quantos resumos foram gravados.
+    """
+    enqueued = 0
+    with write_transaction() as conn:
+        for user_id, last_entry_id, email, is_active in conn.execute(queries.DUE_DIGESTS).fetchall():
+            if email and is_active:
+                columns = ('po_number', 'requester', 'created_at', 'total_value', 'justification')
+                orders = [
+                    dict(zip(columns, row))
+                    for row in conn.execute(queries.DIGEST_ORDERS, (user_id, last_entry_id))
+                ]
+                if orders:
+                    subject, body_html = render_digest_email(orders)
+                    enqueue_email(conn, [email], subject, body_html)
+                    enqueued += 1
+            conn.execute(
+                "DELETE FROM email_digest_queue WHERE user_id = ? AND id <= ?", (user_id, last_entry_id)
+            )
+    return enqueued
+
+
+def get_delivery_preference(user_id):
+    """Retorna (forma de entrega, janela em minutos) do usuário."""
+    row = get_connection().execute("SELECT email_delivery, digest_minutes FROM users WHERE id = ?", (user_id,)).fetchone()
+    return row if row else ('imediato', DIGEST_WINDOW_OPTIONS[1])
+
+
+def set_delivery_preference(user_id, mode, digest_minutes):
+    """Grava a forma de entrega ('imediato' ou 'resumo') e a janela do resumo do usuário."""
+    if mode not in DELIVERY_MODES:
+        raise ValueError(f"Forma de entrega inválida: {mode}")
+    with write_transaction() as conn:
+        conn.execute(
+            "UPDATE users SET email_delivery = ?, digest_minutes = ? WHERE id = ?",
+            (mode, max(int(digest_minutes), 1), user_id)
+        )
+    invalidate_users()
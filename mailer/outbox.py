@@ -0,0 +1,91 @@
+import json
+
+from database.connection import get_connection, write_transaction
+
+# Quantas vezes um e-mail é tentado antes de ser marcado como 'falhou'
+MAX_ATTEMPTS = 6
+
+# Espera base (segundos) entre tentativas; dobra a cada falha até o limite
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+# Tempo de reserva de um e-mail em envio; se o processo cair, ele volta para a fila
+CLAIM_LEASE_SECONDS = 300
+
+
+def enqueue_email(conn, recipients, subject, body_html, order_id=None):
+    """
+    Grava um e-mail na fila usando a conexão (e a transação) de quem chama.
+
+    Deve ser chamada dentro da mesma transação que grava o pedido, para que o
+    e-mail só exista se o pedido tiver sido salvo. Retorna o id da mensagem.
+    """
+    cursor = conn.execute(
+        "INSERT INTO email_outbox (order_id, recipients, subject, body_html) VALUES (?, ?, ?, ?)",
+        (order_id, json.dumps(list(recipients)), subject, body_html)
+    )
+    return cursor.lastrowid
+
+
+def claim_due_emails(limit=20):
+    """
+    Reserva os e-mails prontos para envio e os retorna como dicionários.
+
+    A reserva muda o status para 'enviando' e adia a próxima tentativa pelo
+    tempo de lease, o que evita envios duplicados se houver mais de um worker.
+    """
+    with write_transaction() as conn:
+        rows = conn.execute(f"""
+            UPDATE email_outbox
+            SET status = 'enviando', next_attempt_at = datetime('now', '+{CLAIM_LEASE_SECONDS} seconds')
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE status IN ('pendente', 'enviando') AND next_attempt_at <= datetime('now')
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            )
+            RETURNING id, recipients, subject, body_html, attempts
+        """, (limit,)).fetchall()
+    return [
+        {'id': row[0], 'recipients': json.loads(row[1]), 'subject': row[2], 'body_html': row[3], 'attempts': row[4]}
+        for row in sorted(rows)
+    ]
+
+
+def mark_sent(email_id):
+    """Registra o envio bem-sucedido de um e-mail."""
+    with write_transaction() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'enviado', attempts = attempts + 1, sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+            (email_id,)
+        )
+
+
+def backoff_seconds(attempts):
+    """Espera antes da próxima tentativa, após 'attempts' falhas."""
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+
+
+def mark_failed(email_id, error, attempts_so_far):
+    """
+    Registra uma falha de envio. Reagenda com espera exponencial ou, após
+    MAX_ATTEMPTS tentativas, marca o e-mail como 'falhou'.
+    """
+    attempts = attempts_so_far + 1
+    with write_transaction() as conn:
+        if attempts >= MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE email_outbox SET status = 'falhou', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, str(error), email_id)
+            )
+        else:
+            conn.execute(
+                f"UPDATE email_outbox SET status = 'pendente', attempts = ?, last_error = ?, "
+                f"next_attempt_at = datetime('now', '+{backoff_seconds(attempts)} seconds') WHERE id = ?",
+                (attempts, str(error), email_id)
+            )
+
+
+def outbox_status_counts():
+    """Retorna {status: quantidade} da fila de e-mails."""
+    return dict(get_connection().execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status").fetchall())
@@ -0,0 +1,162 @@
+"""
+Modelos HTML dos e-mails (novo pedido e resumo periódico).
+
+As partes fixas (estilos, cabeçalho, rodapé, marcação de cada linha) são
+montadas uma única vez, na importação do módulo; por mensagem só os campos
+são preenchidos com str.format, já escapados para HTML.
+"""
+from datetime import datetime
+from html import escape
+
+# Pedidos listados em um resumo; os demais entram só na contagem e no total
+DIGEST_MAX_ORDERS = 500
+
+_STYLES = """
+    body { font-family: Arial, sans-serif; color: #333; line-height: 1.6; }
+    .container { max-width: 800px; margin: auto; padding: 20px; border: 1px solid #eee; border-radius: 10px; background-color: #fdfdfd; }
+    h2 { color: #0056b3; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }
+    h3 { color: #444; border-bottom: 1px solid #ccc; padding-bottom: 5px; margin-top: 30px; }
+    ul { list-style-type: none; padding: 0; }
+    li { margin-bottom: 12px; background-color: #f9f9f9; padding: 15px; border-left: 5px solid #0056b3; border-radius: 5px; }
+    strong { color: #333; }
+"""
+
+_CELL = '<td style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">{}</td>'
+_HEADER_CELL = '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">{}</th>'
+
+
+def _compile_document(heading, intro):
+    """Documento completo com os estilos embutidos; {content} recebe o corpo da mensagem."""
+    return (
+        "<html><head><style>" + _STYLES.replace('{', '{{').replace('}', '}}') + "</style></head><body><div class=\"container\">"
+        f"<h2>{heading}</h2><p>{intro}</p>"
+        "{content}"
+        '<p style="margin-top: 30px; text-align: center; font-size: 1.1em;">'
+        "Por favor, acesse o <strong>Sistema de Compras</strong> para revisar e aprovar {call_to_action}."
+        "</p></div></body></html>"
+    )
+
+
+def _compile_table(titles, row_fields):
+    """Cabeçalho da tabela e o formato de uma linha, com um campo por coluna."""
+    head = (
+        '<table style="width:100%; border-collapse: collapse; font-family: Arial, sans-serif;">'
+        '<thead style="background-color: #f2f2f2;"><tr>'
+        + ''.join(_HEADER_CELL.format(title) for title in titles)
+        + '</tr></thead><tbody>'
+    )
+    row = '<tr>' + ''.join(_CELL.format('{' + field + '}') for field in row_fields) + '</tr>'
+    return head, row, '</tbody></table>'
+
+
+_NEW_ORDER_DOCUMENT = _compile_document(
+    "Novo Pedido de Compra para Aprovação",
+    "Um novo pedido de compra foi enviado e requer sua atenção.",
+)
+_NEW_ORDER_CONTENT = """
+    <h3>Detalhes Gerais</h3>
+    <ul>
+        <li><strong>Pedido Nº:</strong> {po_number}</li>
+        <li><strong>Solicitante:</strong> {requester}</li>
+        <li><strong>Data do Pedido:</strong> {today}</li>
+        <li><strong>Valor Total:</strong> R$ {total_value:,.2f}</li>
+        <li><strong>Justificativa:</strong> {justification}</li>
+    </ul>
+    <h3>Itens do Pedido</h3>
+    {items}
+    <h3>Dados do Fornecedor</h3>
+    <ul>
+        <li><strong>Razão Social:</strong> {supplier_name}</li>
+        <li><strong>CNPJ:</strong> {supplier_cnpj}</li>
+        <li><strong>Contato:</strong> {supplier_contact}</li>
+        <li><strong>Forma de Pagamento:</strong> {payment_method}</li>
+        <li><strong>Dados Bancários / PIX:</strong> {bank_details}</li>
+    </ul>
+    <h3>Informações de Entrega</h3>
+    <ul>
+        <li><strong>Data de Entrega Prevista:</strong> {delivery_date}</li>
+        <li><strong>Endereço de Entrega:</strong> {delivery_address}</li>
+    </ul>
+"""
+_ITEMS_HEAD, _ITEM_ROW, _TABLE_END = _compile_table(
+    ['Qtde', 'Unidade', 'Descrição', 'Valor Un.', 'Valor Total'],
+    ['quantity', 'unit', 'description', 'unit_value', 'total_value'],
+)
+
+_DIGEST_DOCUMENT = _compile_document(
+    "Resumo de Pedidos Aguardando Aprovação",
+    "Estes pedidos de compra foram enviados desde o último resumo e ainda aguardam sua decisão.",
+)
+_DIGEST_CONTENT = """
+    <ul>
+        <li><strong>Pedidos pendentes:</strong> {count}</li>
+        <li><strong>Valor total:</strong> R$ {total_value:,.2f}</li>
+    </ul>
+    {orders}
+    {more}
+"""
+_DIGEST_HEAD, _DIGEST_ROW, _ = _compile_table(
+    ['Pedido Nº', 'Solicitante', 'Data', 'Valor Total', 'Justificativa'],
+    ['po_number', 'requester', 'created_at', 'total_value', 'justification'],
+)
+
+
+def _text(value, default=''):
+    """Texto escapado para HTML (o valor padrão quando vazio)."""
+    return escape(str(value)) if value not in (None, '') else default
+
+
+def render_new_order_email(order_details, items):
+    """
+    Monta o assunto e o corpo HTML do e-mail de novo pedido para os aprovadores.
+
+    items é uma sequência de linhas (qtde, unidade, descrição, valor unitário, valor total).
+    """
+    subject = f"Novo Pedido de Compra para Aprovação - Nº {order_details['po_number']}"
+    items_html = _ITEMS_HEAD + ''.join(
+        _ITEM_ROW.format(quantity=_text(quantity), unit=_text(unit), description=_text(description),
+                         unit_value=f"R$ {unit_value:,.2f}", total_value=f"R$ {total_value:,.2f}")
+        for quantity, unit, description, unit_value, total_value in items
+    ) + _TABLE_END
+    content = _NEW_ORDER_CONTENT.format(
+        po_number=_text(order_details['po_number']),
+        requester=_text(order_details['requester']),
+        today=datetime.now().strftime('%d/%m/%Y'),
+        total_value=order_details['total_value'],
+        justification=_text(order_details['justification'], 'Não informada'),
+        items=items_html,
+        supplier_name=_text(order_details['supplier_name'], 'Não informado'),
+        supplier_cnpj=_text(order_details['supplier_cnpj'], 'Não informado'),
+        supplier_contact=_text(order_details['supplier_contact'], 'Não informado'),
+        payment_method=_text(order_details['payment_method'], 'Não informada'),
+        bank_details=_text(order_details['bank_details'], 'Não informado'),
+        delivery_date=_text(order_details['delivery_date']),
+        delivery_address=_text(order_details['delivery_address']).replace('\n', '<br>'),
+    )
+    return subject, _NEW_ORDER_DOCUMENT.format(content=content, call_to_action="o pedido")
+
+
+def render_digest_email(orders, max_orders=DIGEST_MAX_ORDERS):
+    """
+    Monta o assunto e o corpo HTML do resumo de pedidos pendentes.
+
+    orders é uma sequência de dicionários com po_number, requester, created_at,
+    total_value e justification. Com max_orders, só os primeiros são listados;
+    a contagem e o valor total consideram todos.
+    """
+    count = len(orders)
+    listed = orders if max_orders is None else orders[:max_orders]
+    subject = f"Resumo: {count} pedido(s) de compra aguardando aprovação"
+    rows_html = _DIGEST_HEAD + ''.join(
+        _DIGEST_ROW.format(
+            po_number=_text(order['po_number']), requester=_text(order['requester']),
+            created_at=_text(order['created_at']), total_value=f"R$ {order['total_value'] or 0:,.2f}",
+            justification=_text(order['justification'], 'Não informada'),
+        )
+        for order in listed
+    ) + _TABLE_END
+    more = f"<p>... e mais {count - len(listed)} pedido(s).</p>" if count > len(listed) else ""
+    content = _DIGEST_CONTENT.format(
+        count=count, total_value=sum(order['total_value'] or 0 for order in orders), orders=rows_html, more=more,
+    )
+    return subject, _DIGEST_DOCUMENT.format(content=content, call_to_action="os pedidos")
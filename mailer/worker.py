@@ -0,0 +1,164 @@
+import logging
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from mailer.digest import enqueue_due_digests
+from mailer.outbox import claim_due_emails, mark_failed, mark_sent
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (segundos) entre verificações da fila
+POLL_INTERVAL_SECONDS = 5
+
+# Fecha a conexão SMTP após esse tempo (segundos) sem enviar nada
+IDLE_DISCONNECT_SECONDS = 60
+
+
+def load_smtp_settings():
+    """
+    Lê as credenciais de e-mail de st.secrets["email_credentials"].
+
+    Chaves obrigatórias: sender_email, sender_password, smtp_server, smtp_port.
+    Opcionais: use_ssl (padrão True) e use_starttls (padrão False); com
+    use_ssl = false é possível apontar para um servidor SMTP local de testes
+    (veja mailer/devserver.py). Retorna None se não houver configuração.
+    """
+    import streamlit as st
+    try:
+        return dict(st.secrets["email_credentials"])
+    except (KeyError, FileNotFoundError):
+        return None
+
+
+class SMTPSender:
+    """Mantém uma conexão SMTP aberta e a reaproveita entre mensagens."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        host = self.settings['smtp_server']
+        port = int(self.settings['smtp_port'])
+        if self.settings.get('use_ssl', True):
+            server = smtplib.SMTP_SSL(host, port, timeout=30)
+        else:
+            server = smtplib.SMTP(host, port, timeout=30)
+            if self.settings.get('use_starttls', False):
+                server.starttls()
+        if self.settings.get('sender_password'):
+            server.login(self.settings['sender_email'], self.settings['sender_password'])
+        return server
+
+    def _is_alive(self):
+        try:
+            return self._server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, recipients, subject, body_html):
+        """Envia uma mensagem HTML, reconectando se a conexão tiver caído."""
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = self.settings['sender_email']
+        message["To"] = ", ".join(recipients)
+        message.attach(MIMEText(body_html, "html"))
+
+        if self._server is None or not self._is_alive():
+            self.close()
+            self._server = self._connect()
+        self._server.sendmail(self.settings['sender_email'], recipients, message.as_string())
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > IDLE_DISCONNECT_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class OutboxWorker(threading.Thread):
+    """Thread em segundo plano que envia os e-mails pendentes da fila."""
+
+    def __init__(self, settings, poll_interval=POLL_INTERVAL_SECONDS):
+        super().__init__(name="email-outbox-worker", daemon=True)
+        self.sender = SMTPSender(settings)
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def process_once(self):
+        """Grava os resumos vencidos e envia todos os e-mails vencidos. Retorna (enviados, falhas)."""
+        sent, failed = 0, 0
+        enqueue_due_digests()
+        while True:
+            batch = claim_due_emails()
+            if not batch:
+                break
+            for email in batch:
+                try:
+                    self.sender.send(email['recipients'], email['subject'], email['body_html'])
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.warning("Falha ao enviar e-mail %s: %s", email['id'], e)
+                    # A conexão pode ter ficado em estado inválido: descarta
+                    self.sender.close()
+                    mark_failed(email['id'], e, email['attempts'])
+                    failed += 1
+                else:
+                    mark_sent(email['id'])
+                    sent += 1
+        return sent, failed
+
+    def wake(self):
+        """Pede uma verificação imediata da fila (ex.: logo após gravar um pedido)."""
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.process_once()
+                self.sender.close_if_idle()
+            except Exception:
+                logger.exception("Erro inesperado no worker de e-mails")
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+        self.sender.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker_started(settings=None):
+    """
+    Inicia (uma vez por processo) o worker de e-mails e o acorda.
+
+    Retorna o worker, ou None se não houver credenciais de e-mail configuradas
+    (nesse caso as mensagens permanecem na fila até o worker ser iniciado).
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            settings = settings or load_smtp_settings()
+            if not settings:
+                return None
+            _worker = OutboxWorker(settings)
+            _worker.start()
+    _worker.wake()
+    return _worker
@@ -1,9 +1,19 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 from auth.utils import handle_notifications
-import plotly.express as px
-from datetime import datetime
+from database.cache import get_requesters
+from database.events import patch_order_page, patch_order_rows, patch_summary
+from database.orders import ORDER_LIST_COLUMNS, fetch_order_bundles, list_orders
+from database.search import search_orders
+from database.summary import get_filtered_summary
+from database.tracing import trace_page_view
+from reports.export import FORMATS as REPORT_FORMATS, export_orders
+from ui.live import live_frame, live_refresh_interval
+from ui.pagination import keyset_pager, page_size_selector
+from functools import partial
+
+# Instrumentação de SQL: as consultas deste rerun contam para esta página
+trace_page_view("Painel de Controle")
 
 # Proteção de acesso à página
 if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
@@ -16,198 +26,202 @@ handle_notifications()
 st.set_page_config(page_title="Painel de Controle", layout="wide")
 st.title("Painel de Controle de Pedidos")
 
-conn = sqlite3.connect('database/compras.db', check_same_thread=False)
-cursor = conn.cursor()
-
-# --- Funções de busca no banco de dados ---
-
-def get_all_orders():
-    """Busca todos os pedidos."""
-    query = "SELECT id, requester, po_number, created_at, total_value, status FROM purchase_orders ORDER BY created_at DESC"
-    return pd.read_sql_query(query, conn)
-
-def get_user_orders(user_id):
-    """Busca os pedidos de um usuário específico."""
-    query = "SELECT id, requester, po_number, created_at, total_value, status FROM purchase_orders WHERE user_id = ? ORDER BY created_at DESC"
-    return pd.read_sql_query(query, conn, params=(user_id,))
-
-def get_order_details(order_id):
-    """Busca os detalhes e itens de um pedido específico."""
-    details_query = "SELECT * FROM purchase_orders WHERE id = ?"
-    items_query = "SELECT quantity, unit, description, unit_value, total_value FROM order_items WHERE order_id = ?"
-    
-    details = pd.read_sql_query(details_query, conn, params=(order_id,))
-    items = pd.read_sql_query(items_query, conn, params=(order_id,))
-    
-    return details.iloc[0] if not details.empty else None, items
-
-def get_approvers_status(order_id):
-    """Verifica o status de aprovação para um pedido."""
-    approved_by_query = """
-        SELECT u.username 
-        FROM approvals a 
-        JOIN users u ON a.user_id = u.id 
-        WHERE a.order_id = ? AND a.status = 'aprovado'
-    """
-    
-    all_approvers_query = "SELECT username FROM users WHERE role = 'aprovador' AND is_active = 1"
-    
-    approved_list = [row[0] for row in cursor.execute(approved_by_query, (order_id,)).fetchall()]
-    all_approvers_list = [row[0] for row in cursor.execute(all_approvers_query).fetchall()]
-    
-    pending_list = [approver for approver in all_approvers_list if approver not in approved_list]
-    
-    return approved_list, pending_list
+ORDER_ITEM_COLUMNS = ['quantity', 'unit', 'description', 'unit_value', 'total_value']
 
 # --- Lógica de exibição ---
 
 user_role = st.session_state.get('role')
 user_id = st.session_state.get('user_id')
 
+STATUS_OPTIONS = ['Todos', 'pendente', 'aprovado', 'reprovado', 'rejeitado']
+
 if user_role == 'Solicitante':
     st.header("Meus Pedidos")
-    df_orders = get_user_orders(user_id)
 else:
     st.header("Todos os Pedidos")
-    df_orders = get_all_orders()
+refresh_interval = live_refresh_interval("dashboard")
+
+# --- Busca textual (justificativa, fornecedor, CNPJ e descrição dos itens) ---
+search_text = st.text_input("Buscar pedidos", placeholder="Ex.: toner, razão social, CNPJ ou descrição de um item")
+
+# --- Filtros (aplicados no banco de dados) ---
+with st.expander("Filtros", expanded=False):
+    f_col1, f_col2, f_col3 = st.columns(3)
+    with f_col1:
+        status_filter = st.selectbox("Status", STATUS_OPTIONS)
+        supplier_filter = st.text_input("Fornecedor (Razão Social ou CNPJ)")
+    with f_col2:
+        if user_role == 'Solicitante':
+            requester_filter = user_id
+        else:
+            requesters = dict(get_requesters())
+            requester_filter = st.selectbox(
+                "Solicitante", [None] + list(requesters),
+                format_func=lambda uid: "Todos" if uid is None else requesters[uid]
+            )
+        date_range = st.date_input("Período de criação", value=())
+    with f_col3:
+        min_value = st.number_input("Valor mínimo (R$)", min_value=0.0, value=None)
+        max_value = st.number_input("Valor máximo (R$)", min_value=0.0, value=None)
+        page_size = page_size_selector("orders")
+
+filters = {
+    'status': None if status_filter == 'Todos' else status_filter,
+    'user_id': requester_filter,
+    'supplier': supplier_filter.strip() or None,
+    'date_from': date_range[0] if len(date_range) > 0 else None,
+    'date_to': date_range[1] if len(date_range) > 1 else None,
+    'min_value': min_value,
+    'max_value': max_value,
+}
+
+filter_signature = tuple(filters.items())
+
+
+def load_page(key, after, **page_filters):
+    """Página de pedidos mantida em memória e atualizada pelos eventos (não é relida a cada atualização)."""
+    return live_frame(
+        key, (filter_signature, page_size, after),
+        load=lambda: list_orders(after=after, limit=page_size, **page_filters),
+        patch=lambda frame, events: patch_order_page(
+            frame, events, ORDER_LIST_COLUMNS, page_size, include_new=after is None, **page_filters
+        ),
+    )
+
+
+def orders_overview():
+    """
+    Indicadores, gráfico, lista e pendentes. É um fragmento com atualização
+    automática: a cada intervalo lê só os eventos novos de order_events e
+    ajusta os totais e as linhas em memória.
+    """
+    # Totais: sem filtros vêm da tabela de agregados; depois só os eventos são aplicados
+    summary = live_frame(
+        "dashboard_summary", filter_signature,
+        load=lambda: get_filtered_summary(filters),
+        patch=lambda frame, events: patch_summary(frame, events, filters),
+    )
+    status_totals = {status: values['count'] for status, values in summary.items()}
+
+    if not status_totals:
+        st.info("Nenhum pedido encontrado.")
+        return
+
+    # --- Indicadores ---
+    k_col1, k_col2, k_col3, k_col4, k_col5 = st.columns(5)
+    k_col1.metric("Total de Pedidos", sum(status_totals.values()))
+    k_col2.metric("Valor Total", f"R$ {sum(values['total_value'] for values in summary.values()):,.2f}")
+    k_col3.metric("Pendentes", status_totals.get('pendente', 0))
+    k_col4.metric("Aprovados", status_totals.get('aprovado', 0))
+    k_col5.metric("Rejeitados", status_totals.get('reprovado', 0) + status_totals.get('rejeitado', 0))
 
-if df_orders.empty:
-    st.info("Nenhum pedido encontrado.")
-else:
     # --- Gráfico de Pizza ---
     st.subheader("Status dos Pedidos")
-    status_counts = df_orders['status'].value_counts().reset_index()
-    status_counts.columns = ['status', 'count']
-    
-    fig = px.pie(status_counts, names='status', values='count', 
-                 title='Distribuição de Status dos Pedidos',
-                 color='status',
-                 color_discrete_map={'pendente':'orange', 'aprovado':'green', 'rejeitado':'red'})
+    # graph_objects em vez de plotly.express: importado só quando há gráfico
+    # e monta a figura em ~1 ms por rerun (px.pie leva dezenas de ms)
+    import plotly.graph_objects as go
+    status_colors = {'pendente': 'orange', 'aprovado': 'green', 'rejeitado': 'red'}
+    fig = go.Figure(go.Pie(labels=list(status_totals), values=list(status_totals.values()),
+                           marker_colors=[status_colors.get(status, 'gray') for status in status_totals],
+                           sort=False))
+    fig.update_layout(title='Distribuição de Status dos Pedidos', legend_title_text='status')
     st.plotly_chart(fig, use_container_width=True)
 
     # --- Tabela de Pedidos ---
     st.subheader("Lista de Pedidos")
-    st.dataframe(df_orders, use_container_width=True)
+    if search_text.strip():
+        # A ordem de relevância é mantida; os eventos só atualizam ou retiram linhas
+        page_rows = live_frame(
+            "dashboard_search", (filter_signature, page_size, search_text),
+            load=lambda: search_orders(search_text, limit=page_size, **filters),
+            patch=lambda frame, events: patch_order_rows(frame, events, ORDER_LIST_COLUMNS, include_new=False, **filters),
+        )
+        st.caption(f"{len(page_rows)} pedido(s) mais relevante(s) para \"{search_text.strip()}\".")
+    else:
+        st.caption(f"{sum(status_totals.values())} pedido(s) encontrado(s).")
+        page_rows = keyset_pager(
+            "orders",
+            lambda after: load_page("dashboard_orders", after, **filters),
+            signature=(filter_signature, page_size),
+        )
+    st.dataframe(pd.DataFrame(page_rows, columns=ORDER_LIST_COLUMNS), use_container_width=True)
 
     # --- Detalhes dos Pedidos Pendentes ---
     st.subheader("Detalhes dos Pedidos Pendentes")
-    pending_orders = df_orders[df_orders['status'] == 'pendente']
-
-    if pending_orders.empty:
+    pending_filters = dict(filters, status='pendente')
+    if filters['status'] not in (None, 'pendente') or not status_totals.get('pendente'):
         st.success("Não há pedidos pendentes de aprovação.")
-    else:
-        for index, order in pending_orders.iterrows():
-            with st.expander(f"Pedido #{order['po_number']} - Solicitante: {order['requester']} - Valor: R$ {order['total_value']:,.2f}"):
-                details, items = get_order_details(order['id'])
-                if details is not None:
-                    st.write("##### Itens do Pedido")
-                    st.dataframe(items, use_container_width=True)
-                    
-                    st.write("##### Justificativa")
-                    st.text(details['justification'] or "N/A")
-
-                    st.write("##### Status de Aprovação")
-                    approved, pending = get_approvers_status(order['id'])
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.success("**Aprovado por:**")
-                        st.write(", ".join(approved) or "Ninguém ainda")
-                    with col2:
-                        st.warning("**Pendente de:**")
-                        st.write(", ".join(pending) or "N/A")
+        return
+    pending_orders = keyset_pager(
+        "pending_details",
+        lambda after: load_page("dashboard_pending", after, **pending_filters),
+        signature=(tuple(pending_filters.items()), page_size),
+    )
+    # Só os cartões abertos são desenhados; detalhes, itens e aprovadores
+    # deles são buscados de uma só vez
+    cards = [
+        (order, st.expander(f"Pedido #{order['po_number']} - Solicitante: {order['requester']} - Valor: R$ {order['total_value']:,.2f}",
+                            key=f"pending_card_{order['id']}", on_change="rerun"))
+        for order in pending_orders
+    ]
+    bundles = fetch_order_bundles([order['id'] for order, card in cards if card.open])
+    for order, card in cards:
+        if not card.open:
+            continue
+        with card:
+            bundle = bundles.get(order['id'])
+            if bundle is not None:
+                details = bundle['details']
+                items = pd.DataFrame(bundle['items'], columns=ORDER_ITEM_COLUMNS)
+                st.write("##### Itens do Pedido")
+                st.dataframe(items, use_container_width=True)
+                
+                st.write("##### Justificativa")
+                st.text(details['justification'] or "N/A")
+
+                st.write("##### Status de Aprovação")
+                approved, pending = bundle['approved'], bundle['pending']
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.success("**Aprovado por:**")
+                    st.write(", ".join(approved) or "Ninguém ainda")
+                with col2:
+                    st.warning("**Pendente de:**")
+                    st.write(", ".join(pending) or "N/A")
+
+
+st.fragment(orders_overview, run_every=refresh_interval)()
 
 # --- Geração de Relatório ---
 st.divider()
 st.header("Relatórios")
 
-def generate_html_report(data_frame):
-    """Gera um relatório HTML aprimorado a partir de um DataFrame."""
-    report_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    
-    # Métricas de Resumo
-    total_orders = len(data_frame)
-    total_value = data_frame['total_value'].sum()
-    status_counts = data_frame['status'].value_counts()
-    
-    # Tabela de dados com estilo
-    df_html = data_frame.to_html(index=False, justify='center', border=0).replace(
-        '<table', '<table style="width:100%; border-collapse: collapse; font-family: Arial, sans-serif;"'
-    ).replace(
-        '<thead>', '<thead style="background-color: #f2f2f2;">'
-    ).replace(
-        '<th>', '<th style="padding: 12px; text-align: left; border-bottom: 2px solid #ddd;">'
-    ).replace(
-        '<td>', '<td style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">'
-    )
-
-    html = f"""
-    <html>
-    <head>
-        <title>Relatório de Pedidos de Compra</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 0; padding: 0; background-color: #f4f4f4; color: #333; }}
-            .container {{ max-width: 1200px; margin: 20px auto; padding: 20px; background-color: #fff; box-shadow: 0 0 10px rgba(0,0,0,0.1); border-radius: 8px; }}
-            h1, h2 {{ color: #0056b3; }}
-            h1 {{ text-align: center; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }}
-            .summary {{ display: flex; justify-content: space-around; text-align: center; margin: 20px 0; padding: 20px; background-color: #eef; border-radius: 8px; }}
-            .metric {{ flex: 1; }}
-            .metric h3 {{ margin: 0; font-size: 1.2em; color: #555; }}
-            .metric p {{ margin: 5px 0 0; font-size: 2em; font-weight: bold; color: #0056b3; }}
-            .footer {{ text-align: center; margin-top: 20px; font-size: 0.9em; color: #777; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Relatório de Pedidos de Compra</h1>
-            <p class="footer">Gerado em: {report_date}</p>
-
-            <h2>Resumo Geral</h2>
-            <div class="summary">
-                <div class="metric">
-                    <h3>Total de Pedidos</h3>
-                    <p>{total_orders}</p>
-                </div>
-                <div class="metric">
-                    <h3>Valor Total</h3>
-                    <p>R$ {total_value:,.2f}</p>
-                </div>
-                <div class="metric">
-                    <h3>Pedidos Pendentes</h3>
-                    <p>{status_counts.get('pendente', 0)}</p>
-                </div>
-                <div class="metric">
-                    <h3>Pedidos Aprovados</h3>
-                    <p>{status_counts.get('aprovado', 0)}</p>
-                </div>
-                 <div class="metric">
-                    <h3>Pedidos Rejeitados</h3>
-                    <p>{status_counts.get('rejeitado', 0)}</p>
-                </div>
-            </div>
-
-            <h2>Detalhes dos Pedidos</h2>
-            {df_html}
-            
-            <div class="footer">
-                <p>&copy; {datetime.now().year} - Sistema de Solicitação de Compras</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    return html
-
-if not df_orders.empty:
-    report_html = generate_html_report(df_orders)
-    st.download_button(
-        label="Baixar Relatório Detalhado (HTML)",
-        data=report_html,
-        file_name="relatorio_pedidos.html",
-        mime="text/html"
-    )
-else:
-    st.info("Não há dados para gerar um relatório.")
+r_col1, r_col2, r_col3 = st.columns(3)
+with r_col1:
+    report_format = st.selectbox("Formato", list(REPORT_FORMATS), format_func=str.upper)
+with r_col2:
+    report_period = st.date_input("Período", value=(), key="report_period")
+with r_col3:
+    report_status = st.selectbox("Status", STATUS_OPTIONS, key="report_status")
+include_items = st.checkbox("Incluir itens dos pedidos")
+
+report_filters = {
+    'status': None if report_status == 'Todos' else report_status,
+    'user_id': user_id if user_role == 'Solicitante' else None,
+    'date_from': report_period[0] if len(report_period) > 0 else None,
+    'date_to': report_period[1] if len(report_period) > 1 else None,
+}
+report_mime, report_extension = REPORT_FORMATS[report_format]
+
+# O relatório só é gerado quando o usuário clica em baixar
+st.download_button(
+    label="Baixar Relatório Detalhado",
+    data=partial(export_orders, report_format, report_filters, include_items),
+    file_name=f"relatorio_pedidos.{report_extension}",
+    mime=report_mime,
+    on_click="ignore"
+)
 
 
 # Botão de Sair na barra lateral
@@ -2,9 +2,20 @@ import streamlit as st
 import sqlite3
 from auth.auth import create_user, hash_password
 from auth.utils import handle_notifications
-from datetime import datetime
+from database.connection import fetch_all, fetch_one, write_transaction
+from database import queries
+from database.cache import cache_stats, get_all_users, invalidate_users
+from database.tracing import sql_tracer, trace_page_view
+from database.writer import write_queue
+from mailer.outbox import outbox_status_counts
+from mailer.worker import ensure_worker_started
+from database.backup import create_snapshot, latest_snapshot, list_snapshots, restore_snapshot
+from database import archive, retention
 import os
 
+# Instrumentação de SQL: as consultas deste rerun contam para esta página
+trace_page_view("Administrador do Sistema")
+
 # Proteção de acesso à página
 if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
     st.error("Você precisa estar logado para acessar esta página.")
@@ -23,15 +34,6 @@ st.set_page_config(page_title="Administração", layout="wide")
 st.title("Administrador do Sistema")
 st.write(f"Bem-vindo, {st.session_state.get('username')}!")
 
-# Conexão com o banco de dados
-conn = sqlite3.connect('database/compras.db', check_same_thread=False)
-cursor = conn.cursor()
-
-# Função para buscar todos os usuários
-def get_all_users():
-    cursor.execute("SELECT id, username, role, email, is_active FROM users")
-    return cursor.fetchall()
-
 # --- Exibir todos os usuários ---
 st.header("Usuários Cadastrados")
 users = get_all_users()
@@ -55,8 +57,7 @@ with col1:
 
         if st.button("Criar Usuário"):
             if new_username and new_password and new_role:
-                cursor.execute("SELECT * FROM users WHERE username = ?", (new_username,))
-                if cursor.fetchone():
+                if fetch_one("SELECT id FROM users WHERE username = ?", (new_username,)):
                     st.error("Este nome de usuário já existe.")
                 else:
                     create_user(new_username, new_password, new_role, new_email)
@@ -91,8 +92,9 @@ with col2:
                     query = f"UPDATE users SET {', '.join(updates)} WHERE username = ?"
                     params.append(user_to_edit)
                     
-                    cursor.execute(query, tuple(params))
-                    conn.commit()
+                    with write_transaction() as conn:
+                        conn.execute(query, tuple(params))
+                    invalidate_users()
                     st.success(f"Dados do usuário '{user_to_edit}' alterados com sucesso!")
                     st.rerun()
         else:
@@ -114,8 +116,9 @@ with st.expander("3. Gerenciar Status do Usuário"):
         
         if st.button(f"{action_text} Usuário '{user_to_manage_status}'", type="primary"):
             new_status = 0 if current_status == 1 else 1
-            cursor.execute("UPDATE users SET is_active = ? WHERE username = ?", (new_status, user_to_manage_status))
-            conn.commit()
+            with write_transaction() as conn:
+                conn.execute("UPDATE users SET is_active = ? WHERE username = ?", (new_status, user_to_manage_status))
+            invalidate_users()
             st.success(f"Usuário '{user_to_manage_status}' foi {'desativado' if new_status == 0 else 'reativado'}!")
             st.rerun()
     else:
@@ -125,22 +128,230 @@ with st.expander("3. Gerenciar Status do Usuário"):
 st.divider()
 st.header("Manutenção do Sistema")
 with st.expander("Backup do Banco de Dados"):
-    st.info("Clique no botão abaixo para fazer o download de uma cópia de segurança completa do banco de dados.")
-    
-    db_path = 'database/compras.db'
-    if os.path.exists(db_path):
-        with open(db_path, "rb") as fp:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_name = f"backup_compras_{timestamp}.db"
-            
+    st.info("Os backups são snapshots compactados criados automaticamente uma vez por dia, sem interromper o uso do sistema. O download entrega o snapshot mais recente.")
+
+    latest = latest_snapshot()
+    if latest:
+        st.write(f"Último snapshot: **{latest['name']}** ({latest['created_at'].strftime('%d/%m/%Y %H:%M:%S')}, {latest['size'] / 1024:,.1f} KB)")
+        try:
+            with open(latest['path'], 'rb') as snapshot_file:
+                snapshot_data = snapshot_file.read()
+        except FileNotFoundError:
+            # A rotação removeu o arquivo entre a listagem e a leitura
+            st.warning("Esse snapshot acabou de ser removido pela rotação. Recarregue a página para baixar o mais recente.")
+        else:
             st.download_button(
-                label="Gerar Backup do Banco de Dados",
-                data=fp,
-                file_name=file_name,
-                mime="application/octet-stream"
+                label="Baixar Último Backup",
+                data=snapshot_data,
+                file_name=latest['name'],
+                mime="application/gzip",
+                on_click="ignore"
+            )
+    else:
+        st.warning("Nenhum snapshot foi criado ainda.")
+
+    if st.button("Criar Snapshot Agora"):
+        try:
+            with st.spinner("Criando snapshot..."):
+                create_snapshot()
+            st.success("Snapshot criado com sucesso!")
+            st.rerun()
+        except (RuntimeError, OSError, sqlite3.Error) as e:
+            st.error(f"Falha ao criar o snapshot: {e}")
+
+    snapshots = list_snapshots()
+    if snapshots:
+        st.write("##### Restaurar Snapshot")
+        snapshot_to_restore = st.selectbox("Snapshot", [snapshot['path'] for snapshot in snapshots], format_func=os.path.basename)
+        confirm_restore = st.checkbox("Entendo que os dados atuais serão substituídos pelo snapshot selecionado.")
+        if st.button("Restaurar", type="primary", disabled=not confirm_restore):
+            try:
+                with st.spinner("Verificando e restaurando o snapshot..."):
+                    restore_snapshot(snapshot_to_restore)
+                st.success("Banco de dados restaurado com sucesso!")
+            except (ValueError, OSError, sqlite3.Error) as e:
+                st.error(f"Falha ao restaurar: {e}")
+
+# --- Retenção e Compactação ---
+with st.expander("Retenção e Compactação"):
+    st.info(f"A cada {retention.RETENTION_INTERVAL_SECONDS // 60} minutos são apagadas, em pequenos lotes, as notificações lidas "
+            f"com mais de {retention.NOTIFICATION_RETENTION_DAYS} dias, os eventos de pedidos com mais de "
+            f"{retention.EVENT_RETENTION_DAYS} dias e os e-mails enviados há mais de {retention.SENT_EMAIL_RETENTION_DAYS} dias; "
+            "em seguida o espaço liberado é devolvido ao disco.")
+    page_count, free_pages, page_size, _ = retention.database_pages()
+    r_cols = st.columns(3)
+    r_cols[0].metric("Tamanho do Banco", f"{page_count * page_size / 1024 / 1024:,.1f} MB")
+    r_cols[1].metric("Espaço Livre Interno", f"{free_pages * page_size / 1024 / 1024:,.1f} MB")
+    r_cols[2].metric("Páginas Livres", f"{free_pages / page_count:.0%}" if page_count else "0%")
+
+    retention_run = retention.last_run()
+    if retention_run:
+        st.caption(
+            f"Última execução neste processo: {retention_run['notifications']} notificação(ões), "
+            f"{retention_run['order_events']} evento(s) e {retention_run['sent_emails']} e-mail(s) apagados; "
+            f"{retention_run['size_before'] / 1024:,.0f} KB → {retention_run['size_after'] / 1024:,.0f} KB "
+            f"em {retention_run['seconds']:.1f} s."
+        )
+    if st.button("Executar Limpeza Agora"):
+        try:
+            with st.spinner("Limpando e compactando..."):
+                retention.run_retention()
+            st.rerun()
+        except (OSError, sqlite3.Error) as e:
+            st.error(f"Falha na limpeza: {e}")
+
+# --- Arquivamento de Pedidos ---
+with st.expander("Arquivamento de Pedidos"):
+    st.info(f"Uma vez por dia, os pedidos aprovados ou rejeitados há mais de {archive.ARCHIVE_AFTER_MONTHS} meses são "
+            "movidos, com itens e aprovações, para um arquivo separado. O banco principal e seus backups ficam menores; "
+            "as listagens, a busca e os relatórios consultam o arquivo quando o período escolhido alcança esses pedidos.")
+    archive_info = archive.archive_status()
+    a_cols = st.columns(3)
+    a_cols[0].metric("Pedidos Arquivados", archive_info['archived_orders'])
+    a_cols[1].metric("Banco Principal", f"{archive_info['hot_size'] / 1024 / 1024:,.1f} MB")
+    a_cols[2].metric("Arquivo", f"{archive_info['archive_size'] / 1024 / 1024:,.1f} MB")
+    if archive_info['newest_created_at']:
+        st.caption(f"Pedido arquivado mais recente criado em {archive_info['newest_created_at']}.")
+
+    archive_run = archive.last_run()
+    if archive_run:
+        st.caption(
+            f"Última execução neste processo: {archive_run['orders']} pedido(s), {archive_run['items']} item(ns) e "
+            f"{archive_run['approvals']} aprovação(ões) arquivados em {archive_run['seconds']:.1f} s."
+        )
+    if st.button("Arquivar Agora"):
+        try:
+            with st.spinner("Arquivando pedidos encerrados..."):
+                archive.run_archival()
+            st.rerun()
+        except (RuntimeError, OSError, sqlite3.Error) as e:
+            st.error(f"Falha no arquivamento: {e}")
+
+# --- Importação de Pedidos ---
+with st.expander("Importar Pedidos (CSV ou XLSX)"):
+    st.info("Uma linha por item. Linhas com o mesmo Nº Pedido formam um pedido, cujos dados vêm da primeira linha. "
+            "Colunas: Nº Pedido, Qtde, Unidade, Descrição, Valor Un. e, opcionalmente, Solicitante, Data, Status, "
+            "Fornecedor, CNPJ, Justificativa... (os títulos da exportação também são aceitos). "
+            "Pedidos importados não geram notificações nem e-mails.")
+    orders_file = st.file_uploader("Arquivo de pedidos", type=["csv", "xlsx"], key="orders_file")
+    if orders_file is not None and st.button("Importar"):
+        # O importador carrega o pandas; só é importado quando realmente usado
+        from importer.orders import errors_to_csv, import_orders
+        try:
+            with st.spinner("Importando..."):
+                import_result = import_orders(orders_file, orders_file.name, st.session_state.get('username'))
+        except (ValueError, UnicodeDecodeError, sqlite3.Error) as e:
+            st.error(f"Falha na importação: {e}")
+        else:
+            st.success(f"{import_result['orders']} pedido(s) e {import_result['items']} item(ns) importados de "
+                       f"{import_result['rows']} linha(s) em {import_result['seconds']:.1f} s.")
+            if import_result['error_count']:
+                st.warning(f"{import_result['error_count']} erro(s) encontrado(s); as linhas correspondentes não foram importadas.")
+                st.download_button(
+                    label="Baixar Relatório de Erros",
+                    data=errors_to_csv(import_result['errors']),
+                    file_name="erros_importacao.csv",
+                    mime="text/csv",
+                    on_click="ignore"
+                )
+
+# --- Fila de E-mails ---
+with st.expander("Fila de E-mails"):
+    counts = outbox_status_counts()
+    if not counts:
+        st.info("Nenhum e-mail registrado na fila.")
+    else:
+        e_cols = st.columns(4)
+        for col, (label, status) in zip(e_cols, [("Pendentes", 'pendente'), ("Enviando", 'enviando'), ("Enviados", 'enviado'), ("Falharam", 'falhou')]):
+            col.metric(label, counts.get(status, 0))
+
+        failed = fetch_all(queries.FAILED_EMAILS)
+        if failed:
+            st.dataframe(
+                [{"ID": row[0], "Pedido": row[1], "Assunto": row[2], "Tentativas": row[3], "Último Erro": row[4]} for row in failed],
+                use_container_width=True
             )
+            if st.button("Reenviar e-mails com falha"):
+                with write_transaction() as conn:
+                    conn.execute("UPDATE email_outbox SET status = 'pendente', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP WHERE status = 'falhou'")
+                ensure_worker_started()
+                st.rerun()
+
+# --- Cache de Dados de Referência ---
+with st.expander("Cache de Dados de Referência"):
+    st.caption("Usuários, aprovadores e e-mails de destinatários ficam em memória, compartilhados entre as sessões, e são relidos quando expiram ou quando um usuário é alterado.")
+    stats = cache_stats()
+    c_cols = st.columns(4)
+    c_cols[0].metric("Acertos", stats['hits'])
+    c_cols[1].metric("Faltas", stats['misses'])
+    c_cols[2].metric("Taxa de Acerto", f"{stats['hit_rate']:.0%}")
+    c_cols[3].metric("Invalidações", stats['invalidations'])
+    if st.button("Limpar Cache"):
+        invalidate_users()
+        st.rerun()
+
+# --- Desempenho das Consultas SQL ---
+with st.expander("Desempenho das Consultas SQL"):
+    st.caption("Tempo gasto no banco por consulta e por visualização de página, medido neste processo desde o último "
+               "reinício ou limpeza. Os parâmetros aparecem só pelo tipo, sem os valores.")
+    t_col1, t_col2 = st.columns(2)
+    with t_col1:
+        sql_tracer.enabled = st.toggle("Instrumentação ativa", value=sql_tracer.enabled)
+    with t_col2:
+        sql_tracer.slow_query_ms = st.number_input("Consulta lenta a partir de (ms)", min_value=0.0,
+                                                   value=float(sql_tracer.slow_query_ms), step=10.0)
+
+    sql_summary = sql_tracer.summary()
+    if not sql_summary['count']:
+        st.info("Nenhuma consulta registrada. Ative a instrumentação e navegue pelas páginas.")
     else:
-        st.error("Arquivo do banco de dados não encontrado.")
+        s_cols = st.columns(5)
+        s_cols[0].metric("Consultas", f"{sql_summary['count']:,}")
+        s_cols[1].metric("Tempo Total", f"{sql_summary['total_ms'] / 1000:,.2f} s")
+        s_cols[2].metric("p50", f"{sql_summary['p50_ms']:.2f} ms")
+        s_cols[3].metric("p95", f"{sql_summary['p95_ms']:.2f} ms")
+        s_cols[4].metric("Consultas por Visualização", f"{sql_summary['queries_per_view']:.1f}")
+
+        st.write("##### Consultas por Visualização de Página")
+        st.dataframe(
+            [{"Página": view['page'], "Visualizações": view['views'], "Consultas (média)": round(view['mean_queries'], 1),
+              "Consultas (máx.)": view['max_queries'], "Tempo SQL (ms, média)": round(view['mean_ms'], 2)}
+             for view in sql_tracer.page_views()],
+            use_container_width=True
+        )
+
+        st.write("##### Consultas com Maior Tempo Total")
+        st.dataframe(
+            [{"Consulta": query['sql'], "Execuções": query['count'], "Total (ms)": round(query['total_ms'], 1),
+              "Média (ms)": round(query['mean_ms'], 2), "p50 (ms)": round(query['p50_ms'], 2),
+              "p95 (ms)": round(query['p95_ms'], 2), "Máx. (ms)": round(query['max_ms'], 2),
+              "Linhas": query['rows'], "Parâmetros": query['params']}
+             for query in sql_tracer.top_queries()],
+            use_container_width=True
+        )
+
+        slow_queries = sql_tracer.slow_queries()
+        st.write(f"##### Consultas Lentas (acima de {sql_tracer.slow_query_ms:.0f} ms)")
+        if slow_queries:
+            st.dataframe(
+                [{"Quando": query['at'].strftime('%d/%m/%Y %H:%M:%S'), "Página": query['page'] or "Segundo plano",
+                  "Tempo (ms)": round(query['ms'], 1), "Linhas": query['rows'], "Consulta": query['sql'],
+                  "Parâmetros": query['params']}
+                 for query in slow_queries],
+                use_container_width=True
+            )
+        else:
+            st.success("Nenhuma consulta lenta registrada.")
+
+    write_stats = write_queue.stats()
+    if write_stats['batches']:
+        st.caption(f"Fila de escrita: {write_stats['jobs']:,} gravações em {write_stats['batches']:,} commits "
+                   f"(média de {write_stats['mean_batch']:.1f} por commit, no máximo {write_stats['largest_batch']}); "
+                   f"{write_stats['failed']:,} com erro.")
+
+    if st.button("Limpar Estatísticas"):
+        sql_tracer.reset()
+        st.rerun()
 
 # Botão de Sair na barra lateral
 if st.sidebar.button("Sair"):
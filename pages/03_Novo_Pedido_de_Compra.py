@@ -3,9 +3,21 @@ import sqlite3
 import pandas as pd
 from datetime import datetime
 from auth.utils import handle_notifications
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from database.connection import write_transaction
+from database import queries
+from database.cache import get_digest_recipient_ids, get_recipient_emails
+from database.notifications import notify_role
+from database.po_numbers import allocate_po_number, uses_cost_center
+from database.tracing import trace_page_view
+from database.writer import run_write
+from importer.orders import parse_items
+from mailer.digest import queue_digest_entries
+from mailer.outbox import enqueue_email
+from mailer.templates import render_new_order_email
+from mailer.worker import ensure_worker_started
+
+# Instrumentação de SQL: as consultas deste rerun contam para esta página
+trace_page_view("Novo Pedido de Compra")
 
 # Proteção de acesso à página
 if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
@@ -13,114 +25,59 @@ if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
     st.switch_page("app.py")
     st.stop()
 
-# --- FUNÇÃO DE ENVIO DE E-MAIL ---
-def send_email_notification(order_details, items_df, recipient_emails):
-    """Envia um e-mail de notificação detalhado e retorna True em sucesso, False em falha."""
-    if not recipient_emails:
-        st.warning("AVISO: Pedido salvo, mas não há e-mails de aprovadores/administradores cadastrados para enviar a notificação.")
-        return True
-
-    try:
-        # As credenciais de e-mail devem ser configuradas no st.secrets
-        creds = st.secrets["email_credentials"]
-        sender_email = creds["sender_email"]
-        password = creds["sender_password"]
-        smtp_server = creds["smtp_server"]
-        smtp_port = creds["smtp_port"]
-
-        message = MIMEMultipart("alternative")
-        message["Subject"] = f"Novo Pedido de Compra para Aprovação - Nº {order_details['po_number']}"
-        message["From"] = sender_email
-        message["To"] = ", ".join(recipient_emails)
-
-        # Formata o DataFrame de itens para uma tabela HTML bonita
-        items_html = items_df.to_html(index=False, justify='center', border=0).replace(
-            '<table', '<table style="width:100%; border-collapse: collapse; font-family: Arial, sans-serif;"'
-        ).replace(
-            '<thead>', '<thead style="background-color: #f2f2f2;">'
-        ).replace(
-            '<th>', '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">'
-        ).replace(
-            '<td>', '<td style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd;">'
-        )
-
-        # Template HTML do e-mail
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; line-height: 1.6; }}
-                .container {{ max-width: 800px; margin: auto; padding: 20px; border: 1px solid #eee; border-radius: 10px; background-color: #fdfdfd; }}
-                h2 {{ color: #0056b3; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }}
-                h3 {{ color: #444; border-bottom: 1px solid #ccc; padding-bottom: 5px; margin-top: 30px; }}
-                ul {{ list-style-type: none; padding: 0; }}
-                li {{ margin-bottom: 12px; background-color: #f9f9f9; padding: 15px; border-left: 5px solid #0056b3; border-radius: 5px; }}
-                strong {{ color: #333; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Novo Pedido de Compra para Aprovação</h2>
-                <p>Um novo pedido de compra foi enviado e requer sua atenção.</p>
-                
-                <h3>Detalhes Gerais</h3>
-                <ul>
-                    <li><strong>Pedido Nº:</strong> {order_details['po_number']}</li>
-                    <li><strong>Solicitante:</strong> {order_details['requester']}</li>
-                    <li><strong>Data do Pedido:</strong> {datetime.now().strftime('%d/%m/%Y')}</li>
-                    <li><strong>Valor Total:</strong> R$ {order_details['total_value']:,.2f}</li>
-                    <li><strong>Justificativa:</strong> {order_details['justification'] or 'Não informada'}</li>
-                </ul>
-
-                <h3>Itens do Pedido</h3>
-                {items_html}
-
-                <h3>Dados do Fornecedor</h3>
-                <ul>
-                    <li><strong>Razão Social:</strong> {order_details['supplier_name'] or 'Não informado'}</li>
-                    <li><strong>CNPJ:</strong> {order_details['supplier_cnpj'] or 'Não informado'}</li>
-                    <li><strong>Contato:</strong> {order_details['supplier_contact'] or 'Não informado'}</li>
-                    <li><strong>Forma de Pagamento:</strong> {order_details['payment_method'] or 'Não informada'}</li>
-                    <li><strong>Dados Bancários / PIX:</strong> {order_details['bank_details'] or 'Não informado'}</li>
-                </ul>
-
-                <h3>Informações de Entrega</h3>
-                <ul>
-                    <li><strong>Data de Entrega Prevista:</strong> {order_details['delivery_date']}</li>
-                    <li><strong>Endereço de Entrega:</strong> {order_details['delivery_address'].replace('\n', '<br>')}</li>
-                </ul>
-
-                <p style="margin-top: 30px; text-align: center; font-size: 1.1em;">
-                    Por favor, acesse o <strong>Sistema de Compras</strong> para revisar e aprovar o pedido.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        message.attach(MIMEText(html, "html"))
-        
-        with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-            server.login(sender_email, password)
-            server.sendmail(sender_email, recipient_emails, message.as_string())
-        
-        st.info("Notificação por e-mail enviada com sucesso para os aprovadores.")
-        return True
-    except KeyError as e:
-        st.error(f"FALHA NO ENVIO DE E-MAIL: Credenciais de e-mail não configuradas em 'st.secrets'. Verifique a chave: {e}")
-        return False
-    except Exception as e:
-        st.error(f"FALHA NO ENVIO DE E-MAIL: O pedido foi salvo, mas a notificação falhou. Causa: {e}")
-        return False
-
 # --- LÓGICA DE CONTROLE DE ESTADO DO FORMULÁRIO ---
 def create_new_order():
     """Limpa o estado para permitir um novo pedido."""
-    keys_to_delete = ['form_submitted', 'last_order_id', 'items_df']
+    keys_to_delete = ['form_submitted', 'last_order_id', 'last_po_number', 'items_df', 'email_notice']
     for key in keys_to_delete:
         if key in st.session_state:
             del st.session_state[key]
 
 
+def save_order(order_details, items_df, cost_center, recipient_emails, digest_recipient_ids=()):
+    """
+    Grava o pedido, os itens, a notificação dos aprovadores, o e-mail na
+    fila de saída e as entradas do resumo de quem prefere recebê-lo, tudo na
+    mesma transação. Roda na thread escritora (por
+    run_write), por isso recebe tudo por parâmetro e não usa st.session_state.
+
+    Retorna (order_id, po_number).
+    """
+    with write_transaction() as conn:
+        cursor = conn.cursor()
+        order_details = dict(
+            order_details,
+            po_number=allocate_po_number(conn, cost_center=cost_center),
+            # Quórum fixado na criação: todos os aprovadores ativos
+            required_approvals=cursor.execute(queries.REQUIRED_APPROVALS).fetchone()[0],
+        )
+
+        # Insere o pedido principal usando o dicionário
+        cursor.execute("""
+            INSERT INTO purchase_orders (user_id, requester, po_number, justification, spreadsheet_link, supplier_name, supplier_cnpj, supplier_contact, payment_method, bank_details, delivery_date, due_date, delivery_address, total_value, status, required_approvals)
+            VALUES (:user_id, :requester, :po_number, :justification, :spreadsheet_link, :supplier_name, :supplier_cnpj, :supplier_contact, :payment_method, :bank_details, :delivery_date, :due_date, :delivery_address, :total_value, :status, :required_approvals)
+        """, order_details)
+        order_id = cursor.lastrowid
+
+        # Insere todos os itens em um único executemany
+        cursor.executemany(
+            "INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, ?, ?, ?, ?, ?)",
+            zip([order_id] * len(items_df), items_df['Qtde'].tolist(), items_df['Unidade'].tolist(),
+                items_df['Descrição'].tolist(), items_df['Valor Un.'].tolist(), items_df['Valor Total'].tolist())
+        )
+
+        # Uma notificação para o papel: todos os aprovadores a recebem
+        notify_role(conn, 'aprovador', f"Novo pedido de compra #{order_id} (Total: R$ {order_details['total_value']:,.2f}) aguardando sua aprovação.")
+
+        # Enfileira o e-mail detalhado na mesma transação do pedido
+        if recipient_emails:
+            item_rows = items_df[['Qtde', 'Unidade', 'Descrição', 'Valor Un.', 'Valor Total']].itertuples(index=False, name=None)
+            subject, body_html = render_new_order_email(order_details, item_rows)
+            enqueue_email(conn, recipient_emails, subject, body_html, order_id=order_id)
+        # Quem prefere o resumo recebe o pedido no próximo e-mail periódico
+        if digest_recipient_ids:
+            queue_digest_entries(conn, digest_recipient_ids, order_id)
+    return order_id, order_details['po_number']
 
 
 handle_notifications()
@@ -128,36 +85,46 @@ st.set_page_config(page_title="Novo Pedido de Compra", layout="wide")
 
 # --- LÓGICA DE EXIBIÇÃO (FORMULÁRIO OU SUCESSO) ---
 if st.session_state.get('form_submitted', False):
-    st.success(f"Pedido de Compra #{st.session_state.get('last_order_id', '')} enviado para aprovação com sucesso!")
+    st.success(f"Pedido de Compra Nº {st.session_state.get('last_po_number', '')} (#{st.session_state.get('last_order_id', '')}) enviado para aprovação com sucesso!")
     st.balloons()
+    if st.session_state.get('email_notice'):
+        st.warning(st.session_state.email_notice)
     st.info("Você pode criar um novo pedido ou navegar para outra página.")
     st.button("Criar Novo Pedido", on_click=create_new_order)
 else:
     # --- EXIBE O FORMULÁRIO ---
     st.title("FORMULÁRIO DE PEDIDO DE COMPRA")
 
-    def get_next_po_number():
-        try:
-            with sqlite3.connect('database/compras.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT MAX(id) FROM purchase_orders")
-                last_id = cursor.fetchone()[0]
-                return (last_id or 0) + 1
-        except Exception:
-            return 1
-
     col1, col2, col3 = st.columns(3)
     with col1:
         st.text_input("Data", value=datetime.now().strftime("%d/%m/%Y"), disabled=True)
     with col2:
         requester = st.text_input("Solicitante", value=st.session_state.get('username', ''), disabled=True)
     with col3:
-        po_number = st.text_input("Nº Pedido", value=str(get_next_po_number()), disabled=True)
+        # O número só é reservado no envio, junto com a gravação do pedido
+        st.text_input("Nº Pedido", value="Gerado ao enviar", disabled=True)
+        cost_center = st.text_input("Centro de Custo") if uses_cost_center() else None
 
     st.header("DESCRIÇÃO DO PEDIDO")
     if 'items_df' not in st.session_state:
         st.session_state.items_df = pd.DataFrame([{"Qtde": 1, "Unidade": "UNI", "Descrição": "", "Valor Un.": 0.00}])
 
+    with st.expander("Importar itens de uma planilha (CSV ou XLSX)"):
+        st.caption("Colunas esperadas: Qtde, Unidade, Descrição e Valor Un. Os itens importados substituem os da tabela abaixo.")
+        items_file = st.file_uploader("Arquivo de itens", type=["csv", "xlsx"], key="items_file")
+        if items_file is not None and st.button("Carregar Itens"):
+            try:
+                imported_df, import_errors = parse_items(items_file, items_file.name)
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"Não foi possível ler o arquivo: {e}")
+            else:
+                if import_errors:
+                    st.warning(f"{len(import_errors)} problema(s) encontrado(s); as linhas inválidas foram ignoradas.")
+                    st.dataframe(pd.DataFrame(import_errors, columns=["Linha", "Coluna", "Erro"]), use_container_width=True)
+                if not imported_df.empty:
+                    st.session_state.items_df = imported_df
+                    st.success(f"{len(imported_df)} item(ns) carregado(s).")
+
     edited_df = st.data_editor(
         st.session_state.items_df,
         num_rows="dynamic",
@@ -199,67 +166,55 @@ else:
         if edited_df.empty or edited_df['Descrição'].iloc[0] == '':
             st.error("Adicione pelo menos um item ao pedido.")
         else:
-            email_sent_successfully = False
+            order_saved = False
             try:
-                with sqlite3.connect('database/compras.db') as conn:
-                    cursor = conn.cursor()
-                    
-                    # Coleta todos os detalhes do pedido em um dicionário para facilitar o uso
-                    order_details_dict = {
-                        'user_id': st.session_state['user_id'],
-                        'requester': st.session_state.get('username', ''),
-                        'po_number': po_number,
-                        'justification': justification,
-                        'spreadsheet_link': spreadsheet_link,
-                        'supplier_name': supplier_name,
-                        'supplier_cnpj': supplier_cnpj,
-                        'supplier_contact': supplier_contact,
-                        'payment_method': payment_method,
-                        'bank_details': bank_details,
-                        'delivery_date': str(delivery_date),
-                        'due_date': str(due_date),
-                        'delivery_address': delivery_address,
-                        'total_value': total_geral,
-                        'status': 'pendente'
-                    }
-
-                    # Insere o pedido principal usando o dicionário
-                    cursor.execute("""
-                        INSERT INTO purchase_orders (user_id, requester, po_number, justification, spreadsheet_link, supplier_name, supplier_cnpj, supplier_contact, payment_method, bank_details, delivery_date, due_date, delivery_address, total_value, status)
-                        VALUES (:user_id, :requester, :po_number, :justification, :spreadsheet_link, :supplier_name, :supplier_cnpj, :supplier_contact, :payment_method, :bank_details, :delivery_date, :due_date, :delivery_address, :total_value, :status)
-                    """, order_details_dict)
-                    
-                    order_id = cursor.lastrowid
-                    st.session_state.last_order_id = order_id
-
-                    # CORREÇÃO: Inserindo os itens um a um para evitar o erro.
-                    for index, row in edited_df.iterrows():
-                        cursor.execute("INSERT INTO order_items (order_id, quantity, unit, description, unit_value, total_value) VALUES (?, ?, ?, ?, ?, ?)",
-                                       (order_id, row['Qtde'], row['Unidade'], row['Descrição'], row['Valor Un.'], row['Valor Total']))
-                    
-                    # Cria notificações no sistema
-                    cursor.execute("SELECT id FROM users WHERE role = 'aprovador' AND is_active = 1")
-                    approvers = cursor.fetchall()
-                    for approver in approvers:
-                        message_popup = f"Novo pedido de compra #{order_id} (Total: R$ {total_geral:,.2f}) aguardando sua aprovação."
-                        cursor.execute("INSERT INTO notifications (user_id, message, is_read) VALUES (?, ?, ?)", (approver[0], message_popup, False))
-                    
-                    # Busca e-mails para notificação
-                    cursor.execute("SELECT email FROM users WHERE (role = 'aprovador' OR role = 'administrador') AND email IS NOT NULL AND email != '' AND is_active = 1")
-                    recipient_emails = [row[0] for row in cursor.fetchall()]
-                    
-                    conn.commit()
-                    st.success(f"Pedido #{order_id} salvo com sucesso no sistema!")
-
-                    # Envia o e-mail detalhado
-                    email_sent_successfully = send_email_notification(order_details_dict, edited_df, recipient_emails)
-
+                # Coleta todos os detalhes do pedido em um dicionário para facilitar o uso
+                order_details_dict = {
+                    'user_id': st.session_state['user_id'],
+                    'requester': st.session_state.get('username', ''),
+                    'justification': justification,
+                    'spreadsheet_link': spreadsheet_link,
+                    'supplier_name': supplier_name,
+                    'supplier_cnpj': supplier_cnpj,
+                    'supplier_contact': supplier_contact,
+                    'payment_method': payment_method,
+                    'bank_details': bank_details,
+                    'delivery_date': str(delivery_date),
+                    'due_date': str(due_date),
+                    'delivery_address': delivery_address,
+                    'total_value': total_geral,
+                    'status': 'pendente',
+                }
+                # E-mails para notificação (cache de dados de referência)
+                recipient_emails = list(get_recipient_emails())
+                digest_recipient_ids = get_digest_recipient_ids()
+
+                # A gravação passa pela fila de escrita e entra no próximo commit em grupo
+                order_id, po_number = run_write(
+                    save_order, order_details_dict, edited_df, cost_center,
+                    recipient_emails, digest_recipient_ids
+                )
+                st.session_state.last_order_id = order_id
+                st.session_state.last_po_number = po_number
+
+                order_saved = True
+                st.success(f"Pedido #{order_id} salvo com sucesso no sistema!")
+
+                # O envio acontece em segundo plano, sem prender o formulário
+                if not recipient_emails and not digest_recipient_ids:
+                    st.session_state.email_notice = "AVISO: Pedido salvo, mas não há e-mails de aprovadores/administradores cadastrados para enviar a notificação."
+                elif ensure_worker_started() is None:
+                    st.session_state.email_notice = "AVISO: Credenciais de e-mail não configuradas em 'st.secrets'. A notificação ficará na fila até a configuração ser feita."
+
+            except TimeoutError:
+                # O envio foi cancelado antes de começar: nada foi gravado
+                st.error("O sistema está ocupado e o pedido não foi salvo. Tente enviar novamente.")
             except sqlite3.Error as e:
                 st.error(f"Ocorreu um erro no banco de dados ao salvar o pedido: {e}")
             except Exception as e:
                 st.error(f"Ocorreu um erro CRÍTICO ao salvar o pedido: {e}")
 
-            if email_sent_successfully:
+            if order_saved:
                 st.session_state.form_submitted = True
                 st.rerun()
 
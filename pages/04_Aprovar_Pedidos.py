@@ -1,7 +1,17 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 from auth.utils import handle_notifications
+from database.approvals import record_decision, record_decisions
+from database.cache import get_order_items, get_requesters
+from database.events import patch_order_page, patch_order_rows
+from database.orders import list_orders
+from database.search import search_orders
+from database.tracing import trace_page_view
+from database.writer import run_write
+from ui.live import live_frame, live_refresh_interval
+from ui.pagination import keyset_pager, page_size_selector
+
+# Instrumentação de SQL: as consultas deste rerun contam para esta página
+trace_page_view("Aprovar Pedidos")
 
 # Proteção de acesso à página
 if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
@@ -20,80 +30,209 @@ handle_notifications()
 st.set_page_config(page_title="Aprovar Pedidos", layout="wide")
 st.title("APROVAÇÃO DE PEDIDOS DE COMPRA")
 
-def notify_requester(conn, order_id, new_status):
-    """Envia uma notificação para o usuário que criou o pedido."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM purchase_orders WHERE id = ?", (order_id,))
-    result = cursor.fetchone()
-    if result:
-        requester_id = result[0]
-        message = f"Seu pedido de compra #{order_id} foi {new_status}."
-        cursor.execute("INSERT INTO notifications (user_id, message, is_read) VALUES (?, ?, ?)", (requester_id, message, False))
-        conn.commit()
+# Colunas usadas nos cartões da fila de aprovação
+QUEUE_COLUMNS = ('id', 'requester', 'created_at', 'total_value', 'justification', 'supplier_name', 'supplier_cnpj', 'delivery_date')
+
+# Títulos das colunas da tabela de itens de um cartão
+ITEM_TITLES = ['Qtde', 'Unidade', 'Descrição', 'Valor Un.', 'Valor Total']
+
+# Decisão em lote: colunas, títulos e máximo de pedidos listados de uma vez
+BULK_COLUMNS = ('id', 'requester', 'created_at', 'supplier_name', 'total_value')
+BULK_TITLES = ['Pedido', 'Solicitante', 'Criado em', 'Fornecedor', 'Valor (R$)']
+BULK_LIMIT = 500
+
 
 def process_approval(order_id, user_id, approved):
-    """Processa a aprovação ou reprovação de um pedido."""
+    """
+    Processa a aprovação ou reprovação de um pedido e guarda, para o cartão do
+    pedido, a mensagem e se ele sai da fila (decisão registrada ou recusada).
+    """
     try:
-        with sqlite3.connect('database/compras.db') as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM approvals WHERE request_id = ? AND user_id = ?', (order_id, user_id))
-            if cursor.fetchone():
-                st.warning(f"Você já processou o pedido #{order_id}.")
-                return
-
-            cursor.execute('INSERT INTO approvals (request_id, user_id, approved) VALUES (?, ?, ?)', (order_id, user_id, approved))
-            
-            if approved:
-                cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'aprovador'")
-                total_approvers = cursor.fetchone()[0]
-                
-                cursor.execute('SELECT COUNT(*) FROM approvals WHERE request_id = ? AND approved = ?', (order_id, True))
-                approvals_count = cursor.fetchone()[0]
-                
-                if approvals_count >= total_approvers:
-                    cursor.execute("UPDATE purchase_orders SET status = 'aprovado' WHERE id = ?", (order_id,))
-                    notify_requester(conn, order_id, "APROVADO e liberado para compra")
-                
-                st.success(f"Pedido #{order_id} aprovado por você.")
-            else:
-                cursor.execute("UPDATE purchase_orders SET status = 'reprovado' WHERE id = ?", (order_id,))
-                notify_requester(conn, order_id, "REPROVADO")
-                st.error(f"Pedido #{order_id} reprovado por você.")
-            
-            conn.commit()
-            st.rerun()
+        # Pela fila de escrita: decisões simultâneas dividem o mesmo commit
+        new_status = run_write(record_decision, order_id, user_id, approved)
+    except ValueError as e:
+        result = (st.warning, str(e), True)
+    except Exception as e:
+        result = (st.error, f"Erro ao processar aprovação: {e}", False)
+    else:
+        if not approved:
+            result = (st.error, f"Pedido #{order_id} reprovado por você.", True)
+        elif new_status == 'aprovado':
+            result = (st.success, f"Pedido #{order_id} aprovado por você e liberado para compra.", True)
+        else:
+            result = (st.success, f"Pedido #{order_id} aprovado por você.", True)
+    st.session_state[f"approval_result_{order_id}"] = result
+
 
+@st.fragment
+def order_card(order, user_id):
+    """
+    Cartão de um pedido pendente. É um fragmento: abrir o cartão ou decidir
+    sobre o pedido reexecuta só este cartão, não a fila inteira.
+    """
+    result = st.session_state.get(f"approval_result_{order['id']}")
+    if result is not None:
+        show_message, message, closed = result
+        show_message(message)
+        if closed:
+            return
+        # Falha: a mensagem aparece uma vez e o cartão continua disponível
+        del st.session_state[f"approval_result_{order['id']}"]
+
+    card = st.expander(f"Pedido #{order['id']} - Solicitante: {order['requester']} - Valor: R$ {order['total_value']:,.2f}",
+                       key=f"order_card_{order['id']}", on_change="rerun")
+    with card:
+        # Os itens só são lidos quando o cartão está aberto
+        if not card.open:
+            return
+        import pandas as pd  # só quando algum cartão é aberto
+        st.subheader(f"Detalhes do Pedido #{order['id']}")
+        st.dataframe(pd.DataFrame(get_order_items(order['id']), columns=ITEM_TITLES), use_container_width=True)
+
+        st.markdown(f"**Justificativa:** {order['justification']}")
+        st.markdown(f"**Fornecedor:** {order['supplier_name']} (CNPJ: {order['supplier_cnpj']})")
+        st.markdown(f"**Data de Entrega:** {order['delivery_date']}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("✅ Aprovar", key=f"approve_{order['id']}", on_click=process_approval, args=(order['id'], user_id, True), use_container_width=True)
+        with col2:
+            st.button("❌ Reprovar", key=f"reject_{order['id']}", on_click=process_approval, args=(order['id'], user_id, False), use_container_width=True)
+
+def process_bulk_decision(order_ids, user_id, approved):
+    """
+    Registra a mesma decisão sobre vários pedidos em uma única transação e
+    guarda o resumo exibido no painel de decisão em lote.
+    """
+    try:
+        decided = run_write(record_decisions, order_ids, user_id, approved)
     except Exception as e:
-        st.error(f"Erro ao processar aprovação: {e}")
+        st.session_state['bulk_result'] = (st.error, f"Erro ao processar a decisão em lote: {e}")
+        return
+    if not approved:
+        message = f"{len(decided)} pedido(s) reprovado(s) por você."
+    else:
+        released = sum(1 for status in decided.values() if status == 'aprovado')
+        message = f"{len(decided)} pedido(s) aprovado(s) por você, {released} liberado(s) para compra."
+    skipped = len(order_ids) - len(decided)
+    if skipped:
+        message += f" {skipped} pedido(s) ignorado(s): já decididos por você ou fora da fila."
+    st.session_state['bulk_result'] = (st.success if approved else st.error, message)
 
-# --- Exibir Pedidos Pendentes ---
-try:
-    conn = sqlite3.connect('database/compras.db')
-    pending_orders = pd.read_sql_query("SELECT * FROM purchase_orders WHERE status = 'pendente'", conn)
 
-    if pending_orders.empty:
+@st.fragment
+def bulk_decision(user_id):
+    """
+    Decisão em lote: lista os pendentes filtrados por fornecedor, solicitante e
+    valor, e aprova ou reprova os selecionados de uma vez. É um fragmento:
+    filtrar e selecionar reexecutam só este painel.
+    """
+    result = st.session_state.pop('bulk_result', None)
+    if result is not None:
+        show_message, message = result
+        show_message(message)
+
+    panel = st.expander("Decisão em Lote", key="bulk_panel", on_change="rerun")
+    with panel:
+        # A lista só é lida quando o painel está aberto
+        if not panel.open:
+            return
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            supplier = st.text_input("Fornecedor (Razão Social ou CNPJ)", key="bulk_supplier")
+        with col2:
+            requesters = dict(get_requesters())
+            requester = st.selectbox(
+                "Solicitante", [None] + list(requesters), key="bulk_requester",
+                format_func=lambda uid: "Todos" if uid is None else requesters[uid]
+            )
+        with col3:
+            min_value = st.number_input("Valor mínimo (R$)", min_value=0.0, value=None, key="bulk_min_value")
+            max_value = st.number_input("Valor máximo (R$)", min_value=0.0, value=None, key="bulk_max_value")
+
+        orders, more = list_orders(
+            limit=BULK_LIMIT, columns=BULK_COLUMNS, newest_first=False, status='pendente',
+            supplier=supplier.strip() or None, user_id=requester, min_value=min_value, max_value=max_value,
+        )
+        if not orders:
+            st.info("Nenhum pedido pendente com esses filtros.")
+            return
+        if more:
+            st.caption(f"Mostrando os {BULK_LIMIT} pedidos mais antigos; use os filtros para ver os demais.")
+
+        import pandas as pd  # só quando o painel é aberto
+        # A seleção guarda posições de linhas: a chave muda junto com a lista,
+        # para que uma seleção antiga nunca aponte para outros pedidos
+        listed = tuple(order['id'] for order in orders)
+        table = st.dataframe(
+            pd.DataFrame([[order[column] for column in BULK_COLUMNS] for order in orders], columns=BULK_TITLES),
+            hide_index=True, use_container_width=True, key=f"bulk_table_{hash(listed)}",
+            on_select="rerun", selection_mode="multi-row",
+        )
+        if st.checkbox(f"Selecionar todos os {len(orders)} pedidos listados", key="bulk_select_all"):
+            selected = list(listed)
+        else:
+            selected = [listed[row] for row in table.selection.rows]
+        selected_ids = set(selected)
+        total = sum(order['total_value'] or 0 for order in orders if order['id'] in selected_ids)
+        st.markdown(f"**{len(selected)} pedido(s) selecionado(s)** - Valor total: R$ {total:,.2f}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            approve = st.button("✅ Aprovar selecionados", key="bulk_approve", disabled=not selected,
+                                use_container_width=True)
+        with col2:
+            reject = st.button("❌ Reprovar selecionados", key="bulk_reject", disabled=not selected,
+                               use_container_width=True)
+        if approve or reject:
+            process_bulk_decision(selected, user_id, approve)
+            # A próxima lista não começa toda selecionada
+            del st.session_state['bulk_select_all']
+            # A página inteira é refeita: a fila abaixo já sai sem os pedidos decididos
+            st.rerun()
+
+
+def load_queue_page(after, page_size):
+    """
+    Página da fila mantida em memória: os eventos retiram os pedidos decididos
+    e, na última página, acrescentam os recém-criados ao final.
+    """
+    return live_frame(
+        "approval_queue", (page_size, after),
+        load=lambda: list_orders(after=after, limit=page_size, columns=QUEUE_COLUMNS, newest_first=False, status='pendente'),
+        patch=lambda frame, events: patch_order_page(
+            frame, events, QUEUE_COLUMNS, page_size, newest_first=False, include_new=frame[1] is None, status='pendente'
+        ),
+    )
+
+
+def approval_queue(search_text, page_size):
+    """Fila de pendentes. É um fragmento com atualização automática pelos eventos de order_events."""
+    if search_text.strip():
+        # Pendentes que contêm o texto, do mais para o menos relevante
+        pending_orders = live_frame(
+            "approval_search", (page_size, search_text),
+            load=lambda: search_orders(search_text, limit=page_size, columns=QUEUE_COLUMNS, status='pendente'),
+            patch=lambda frame, events: patch_order_rows(frame, events, QUEUE_COLUMNS, include_new=False, status='pendente'),
+        )
+    else:
+        # Fila em ordem de chegada: os pedidos mais antigos aparecem primeiro
+        pending_orders = keyset_pager("approval_queue", lambda after: load_queue_page(after, page_size), signature=page_size)
+
+    if not pending_orders:
         st.info("Nenhum pedido pendente de aprovação no momento.")
     else:
-        for index, order in pending_orders.iterrows():
-            with st.expander(f"Pedido #{order['id']} - Solicitante: {order['requester']} - Valor: R$ {order['total_value']:,.2f}"):
-                st.subheader(f"Detalhes do Pedido #{order['id']}")
-                
-                items_df = pd.read_sql_query(f"SELECT quantity as Qtde, unit as Unidade, description as Descrição, unit_value as 'Valor Un.', total_value as 'Valor Total' FROM order_items WHERE order_id = {order['id']}", conn)
-                st.dataframe(items_df, use_container_width=True)
-                
-                st.markdown(f"**Justificativa:** {order['justification']}")
-                st.markdown(f"**Fornecedor:** {order['supplier_name']} (CNPJ: {order['supplier_cnpj']})")
-                st.markdown(f"**Data de Entrega:** {order['delivery_date']}")
-
-                col1, col2 = st.columns(2)
-                user_id = st.session_state['user_id']
-                with col1:
-                    st.button("✅ Aprovar", key=f"approve_{order['id']}", on_click=process_approval, args=(order['id'], user_id, True), use_container_width=True)
-                with col2:
-                    st.button("❌ Reprovar", key=f"reject_{order['id']}", on_click=process_approval, args=(order['id'], user_id, False), use_container_width=True)
-
-    conn.close()
+        for order in pending_orders:
+            order_card(order, st.session_state['user_id'])
+
+
+# --- Exibir Pedidos Pendentes ---
+try:
+    refresh_interval = live_refresh_interval("approval_queue")
+    search_text = st.text_input("Buscar na fila", placeholder="Ex.: toner, razão social, CNPJ ou descrição de um item")
+    page_size = page_size_selector("approval_queue", default=25)
+    bulk_decision(st.session_state['user_id'])
+    st.fragment(approval_queue, run_every=refresh_interval)(search_text, page_size)
 except Exception as e:
     st.error(f"Erro ao carregar pedidos: {e}")
 
@@ -1,6 +1,12 @@
 import streamlit as st
-import sqlite3
 from auth.utils import handle_notifications
+from database.notifications import fetch_history
+from database.tracing import trace_page_view
+from mailer.digest import DELIVERY_MODES, DIGEST_WINDOW_OPTIONS, get_delivery_preference, set_delivery_preference
+from ui.pagination import keyset_pager, page_size_selector
+
+# Instrumentação de SQL: as consultas deste rerun contam para esta página
+trace_page_view("Notificações")
 
 # Proteção de acesso à página
 if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
@@ -13,26 +19,41 @@ handle_notifications()
 st.set_page_config(page_title="Minhas Notificações", layout="centered")
 st.title("Histórico de Notificações")
 
+# Aprovadores e administradores escolhem como recebem os e-mails de novos pedidos
+if st.session_state.get('role') in ['aprovador', 'administrador']:
+    with st.expander("Preferências de e-mail"):
+        current_mode, current_minutes = get_delivery_preference(st.session_state.get('user_id'))
+        modes = list(DELIVERY_MODES)
+        with st.form("email_preferences"):
+            mode = st.radio("Novos pedidos", modes, index=modes.index(current_mode), format_func=DELIVERY_MODES.get)
+            windows = sorted(set(DIGEST_WINDOW_OPTIONS) | {current_minutes})
+            minutes = st.selectbox(
+                "Intervalo do resumo", windows, index=windows.index(current_minutes),
+                format_func=lambda m: f"{m // 60} h" if m % 60 == 0 else f"{m} min",
+                help="O resumo reúne os pedidos que chegaram no intervalo e ainda aguardam sua decisão."
+            )
+            if st.form_submit_button("Salvar preferências"):
+                set_delivery_preference(st.session_state.get('user_id'), mode, minutes)
+                st.success("Preferências de e-mail salvas.")
+
 try:
-    conn = sqlite3.connect('database/compras.db')
-    cursor = conn.cursor()
-    
     user_id = st.session_state.get('user_id')
     
-    # Mostra todas as notificações, lidas ou não, como um histórico
-    cursor.execute("SELECT message, is_read FROM notifications WHERE user_id = ? ORDER BY id DESC", (user_id,))
-    notifications = cursor.fetchall()
-    
+    # Histórico paginado pelo id, lidas e não lidas, do mais recente ao mais antigo
+    role = st.session_state.get('role')
+    page_size = page_size_selector("notification_history", default=25)
+    notifications = keyset_pager(
+        "notification_history", lambda before: fetch_history(user_id, role, before, page_size), signature=page_size
+    )
+
     if not notifications:
         st.info("Você não tem nenhuma notificação no seu histórico.")
     else:
-        for message, is_read in notifications:
+        for _, message, is_read in notifications:
             if is_read:
                 st.success(message, icon="✅") # Notificações já vistas
             else:
                 st.warning(message, icon="🔔") # Notificações novas
-
-    conn.close()
 except Exception as e:
     st.error(f"Erro ao carregar histórico de notificações: {e}")
 
@@ -0,0 +1,2 @@
+# Pacote de relatórios do sistema de compras.
+# Os relatórios são gerados sob demanda, lendo os pedidos do banco em blocos.
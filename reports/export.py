@@ -0,0 +1,220 @@
+"""
+Exportação de pedidos em HTML, CSV e XLSX.
+
+As linhas são lidas do banco em blocos (fetchmany) por um gerador e escritas
+diretamente no arquivo de saída, de modo que o uso de memória não depende da
+quantidade de pedidos. A saída vai para um SpooledTemporaryFile, que só passa
+para o disco quando fica grande. Os pedidos arquivados entram quando o
+período do relatório os alcança (database/archive.py).
+"""
+import csv
+import html
+import io
+import tempfile
+from datetime import datetime
+
+from database.archive import order_sources
+from database.connection import get_connection
+from database.orders import build_order_filters, select_orders
+from database.summary import get_filtered_summary
+
+# Tamanho dos blocos lidos do banco
+CHUNK_SIZE = 1000
+
+# Acima disso (bytes) o arquivo temporário do relatório vai para o disco
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# (coluna no banco, título no relatório)
+ORDER_COLUMNS = [
+    ('id', 'ID'),
+    ('po_number', 'Nº Pedido'),
+    ('requester', 'Solicitante'),
+    ('created_at', 'Data'),
+    ('status', 'Status'),
+    ('total_value', 'Valor Total'),
+    ('supplier_name', 'Fornecedor'),
+    ('supplier_cnpj', 'CNPJ'),
+]
+
+ITEM_COLUMNS = [
+    ('item_quantity', 'Qtde'),
+    ('item_unit', 'Unidade'),
+    ('item_description', 'Descrição do Item'),
+    ('item_unit_value', 'Valor Un.'),
+    ('item_total_value', 'Valor Total do Item'),
+]
+
+FORMATS = {
+    'html': ('text/html', 'html'),
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def report_columns(include_items=False):
+    return ORDER_COLUMNS + (ITEM_COLUMNS if include_items else [])
+
+
+def iter_order_rows(filters, include_items=False, chunk_size=CHUNK_SIZE):
+    """
+    Gera as linhas do relatório (tuplas na ordem de report_columns), lendo o
+    banco em blocos de chunk_size. Com include_items, cada item do pedido
+    vira uma linha (pedidos sem itens aparecem uma vez, com colunas vazias).
+    """
+    clauses, params = build_order_filters(**filters)
+    sources = order_sources(filters.get('date_from'))
+    order_columns = [column for column, _ in ORDER_COLUMNS]
+
+    if include_items:
+        # Cada pedido com os itens do seu próprio esquema; item_id só ordena e sai da linha
+        selects = []
+        for schema in sources:
+            orders, _ = select_orders(order_columns, clauses, [], (schema,))
+            selects.append(f"""
+                SELECT {', '.join(f'o.{column} AS {column}' for column in order_columns)},
+                       i.quantity, i.unit, i.description, i.unit_value, i.total_value, i.id AS item_id
+                FROM ({orders}) o
+                LEFT JOIN {schema}.order_items i ON i.order_id = o.id
+            """)
+        sql = f"{' UNION ALL '.join(selects)} ORDER BY created_at DESC, id DESC, item_id"
+        params = params * len(sources)
+    else:
+        sql, params = select_orders(order_columns, clauses, params, sources)
+        sql += " ORDER BY created_at DESC, id DESC"
+
+    cursor = get_connection().execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if include_items:
+                rows = [row[:-1] for row in rows]
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def write_csv(rows, fp, columns):
+    """Escreve as linhas em CSV (UTF-8 com BOM, separador ';', como o Excel em pt-BR espera)."""
+    text = io.TextIOWrapper(fp, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text, delimiter=';')
+    writer.writerow([title for _, title in columns])
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def write_xlsx(rows, fp, columns):
+    """Escreve as linhas em XLSX no modo write-only do openpyxl (sem manter a planilha em memória)."""
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise RuntimeError("A exportação em XLSX requer o pacote 'openpyxl'.") from e
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Pedidos")
+    sheet.append([title for _, title in columns])
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(fp)
+
+
+_HTML_HEAD = """<html>
+<head>
+    <meta charset="utf-8">
+    <title>Relatório de Pedidos de Compra</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 0; background-color: #f4f4f4; color: #333; }}
+        .container {{ max-width: 1200px; margin: 20px auto; padding: 20px; background-color: #fff; box-shadow: 0 0 10px rgba(0,0,0,0.1); border-radius: 8px; }}
+        h1, h2 {{ color: #0056b3; }}
+        h1 {{ text-align: center; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }}
+        .summary {{ display: flex; justify-content: space-around; text-align: center; margin: 20px 0; padding: 20px; background-color: #eef; border-radius: 8px; }}
+        .metric {{ flex: 1; }}
+        .metric h3 {{ margin: 0; font-size: 1.2em; color: #555; }}
+        .metric p {{ margin: 5px 0 0; font-size: 2em; font-weight: bold; color: #0056b3; }}
+        .footer {{ text-align: center; margin-top: 20px; font-size: 0.9em; color: #777; }}
+        table {{ width: 100%; border-collapse: collapse; font-family: Arial, sans-serif; }}
+        thead {{ background-color: #f2f2f2; }}
+        th {{ padding: 12px; text-align: left; border-bottom: 2px solid #ddd; }}
+        td {{ padding: 12px; text-align: left; border-bottom: 1px solid #ddd; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Relatório de Pedidos de Compra</h1>
+        <p class="footer">Gerado em: {report_date}</p>
+
+        <h2>Resumo Geral</h2>
+        <div class="summary">
+            <div class="metric"><h3>Total de Pedidos</h3><p>{total_orders}</p></div>
+            <div class="metric"><h3>Valor Total</h3><p>R$ {total_value:,.2f}</p></div>
+            <div class="metric"><h3>Pedidos Pendentes</h3><p>{pending}</p></div>
+            <div class="metric"><h3>Pedidos Aprovados</h3><p>{approved}</p></div>
+            <div class="metric"><h3>Pedidos Rejeitados</h3><p>{rejected}</p></div>
+        </div>
+
+        <h2>Detalhes dos Pedidos</h2>
+        <table>
+            <thead><tr>{header_cells}</tr></thead>
+            <tbody>
+"""
+
+_HTML_FOOT = """            </tbody>
+        </table>
+
+        <div class="footer">
+            <p>&copy; {year} - Sistema de Solicitação de Compras</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def _html_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return html.escape(str(value))
+
+
+def write_html(rows, fp, columns, summary):
+    """Escreve o relatório HTML: cabeçalho com os agregados e a tabela linha a linha."""
+    status_counts = {status: values['count'] for status, values in summary.items()}
+    text = io.TextIOWrapper(fp, encoding='utf-8', newline='')
+    text.write(_HTML_HEAD.format(
+        report_date=datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        total_orders=sum(status_counts.values()),
+        total_value=sum(values['total_value'] for values in summary.values()),
+        pending=status_counts.get('pendente', 0),
+        approved=status_counts.get('aprovado', 0),
+        rejected=status_counts.get('reprovado', 0) + status_counts.get('rejeitado', 0),
+        header_cells=''.join(f"<th>{html.escape(title)}</th>" for _, title in columns),
+    ))
+    for row in rows:
+        text.write("<tr>" + ''.join(f"<td>{_html_cell(value)}</td>" for value in row) + "</tr>\n")
+    text.write(_HTML_FOOT.format(year=datetime.now().year))
+    text.flush()
+    text.detach()
+
+
+def export_orders(fmt, filters, include_items=False):
+    """
+    Gera o relatório no formato pedido ('html', 'csv' ou 'xlsx') e retorna um
+    arquivo temporário binário posicionado no início, pronto para download.
+    """
+    columns = report_columns(include_items)
+    rows = iter_order_rows(filters, include_items)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    if fmt == 'html':
+        write_html(rows, output, columns, get_filtered_summary(filters))
+    elif fmt == 'csv':
+        write_csv(rows, output, columns)
+    elif fmt == 'xlsx':
+        write_xlsx(rows, output, columns)
+    else:
+        raise ValueError(f"Formato de relatório desconhecido: {fmt}")
+    output.seek(0)
+    return output
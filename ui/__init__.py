@@ -0,0 +1 @@
+# Componentes de interface compartilhados entre as páginas do Streamlit.
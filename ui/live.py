@@ -0,0 +1,52 @@
+import streamlit as st
+
+from database.connection import read_snapshot
+from database.events import MAX_EVENTS_PER_READ, fetch_events_since, latest_event_id
+
+# Intervalo (segundos) entre as verificações de mudanças nas páginas com atualização automática
+LIVE_REFRESH_SECONDS = 10
+
+
+def live_refresh_interval(key, label="Atualização automática"):
+    """
+    Exibe a chave liga/desliga da atualização automática e retorna o intervalo
+    para st.fragment(run_every=...), ou None se estiver desligada.
+    """
+    enabled = st.toggle(label, value=True, key=f"{key}_live",
+                        help=f"A cada {LIVE_REFRESH_SECONDS} s busca só as mudanças novas e atualiza o que mudou.")
+    return LIVE_REFRESH_SECONDS if enabled else None
+
+
+def live_frame(key, signature, load, patch):
+    """
+    Mantém no session_state um conjunto de dados da página (frame) e o id do
+    último evento de order_events já aplicado a ele.
+
+    load() carrega o frame do zero: na primeira vez, quando 'signature'
+    (filtros, página) muda, quando chegam eventos demais de uma vez, quando
+    faltam eventos já apagados pela limpeza periódica ou quando o registro
+    volta atrás (restauração de backup). Nas demais execuções só
+    os eventos novos são lidos e patch(frame, eventos) devolve o frame
+    atualizado, ou None para forçar a recarga. Sem mudanças, nada é relido.
+    """
+    state_key = f"{key}_live_frame"
+    state = st.session_state.get(state_key)
+    if state is not None and state['signature'] == signature:
+        events = fetch_events_since(state['last_event_id'])
+        if not events:
+            if latest_event_id() >= state['last_event_id']:
+                return state['frame']
+        # Os ids dos eventos são contíguos; um salto quer dizer que a limpeza
+        # periódica (database/retention.py) já apagou eventos que este frame não viu
+        elif len(events) < MAX_EVENTS_PER_READ and events[0]['id'] == state['last_event_id'] + 1:
+            frame = patch(state['frame'], events)
+            if frame is not None:
+                state['frame'], state['last_event_id'] = frame, events[-1]['id']
+                return frame
+
+    # O frame e o id do último evento precisam vir do mesmo estado do banco
+    with read_snapshot():
+        last_event_id = latest_event_id()
+        frame = load()
+    st.session_state[state_key] = {'signature': signature, 'last_event_id': last_event_id, 'frame': frame}
+    return frame
@@ -0,0 +1,47 @@
+import streamlit as st
+
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
+
+
+def _go_next(state_key, cursor):
+    st.session_state[state_key]['cursors'].append(cursor)
+
+
+def _go_previous(state_key):
+    cursors = st.session_state[state_key]['cursors']
+    if len(cursors) > 1:
+        cursors.pop()
+
+
+def page_size_selector(key, label="Itens por página", default=50):
+    """Exibe o seletor de tamanho de página e retorna o valor escolhido."""
+    return st.selectbox(label, PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(default), key=f"{key}_page_size")
+
+
+def keyset_pager(key, fetch_page, signature):
+    """
+    Controla a navegação de uma listagem paginada por cursor (keyset).
+
+    fetch_page(after) deve retornar (linhas, proximo_cursor). O histórico de
+    cursores fica no session_state e é reiniciado sempre que 'signature'
+    (filtros e tamanho da página) muda. Retorna as linhas da página atual.
+    """
+    state_key = f"{key}_pager"
+    state = st.session_state.get(state_key)
+    if state is None or state['signature'] != signature:
+        state = {'signature': signature, 'cursors': [None]}
+        st.session_state[state_key] = state
+
+    rows, next_cursor = fetch_page(state['cursors'][-1])
+    page_number = len(state['cursors'])
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("◀ Anterior", key=f"{key}_prev", on_click=_go_previous, args=(state_key,),
+                  disabled=page_number == 1, use_container_width=True)
+    with col_info:
+        st.caption(f"Página {page_number}")
+    with col_next:
+        st.button("Próxima ▶", key=f"{key}_next", on_click=_go_next, args=(state_key, next_cursor),
+                  disabled=next_cursor is None, use_container_width=True)
+    return rows